@@ -1,7 +1,13 @@
 
 import random
 import math
-import matplotlib.pyplot as plt
+import heapq
+import numpy as np
+import render
+import instrument
+from distance_engine import to_coords, point_distances
+from spatial_index import GridIndex
+from instance_gen import load_instance
 
 num_inf = math.inf
 num_ninf = -math.inf
@@ -28,6 +34,10 @@ class Node:
         self.group_size = 1
         self.ListConnect = []
 
+        # Khi node thuộc một GroupUnionFind, thông tin nhóm được đọc từ gốc tập của nó
+        self.group_uf = None
+        self.uf_index = 0
+
     def create_name(self, name):
         self.name = name
         self.group_node_to_center = name
@@ -43,29 +53,139 @@ class Node:
     def get_list_connect(self): return self.ListConnect
     def get_thoahiep(self): return self.thoa_hiep
     def get_next_connect(self): return self.next_connect
-    def get_group_node_to_center(self): return self.group_node_to_center
-    def get_weight_of_group(self): return self.weight_of_group
-    def get_group_size(self): return self.group_size
-    def get_cost_to_center(self): return self.cost_to_center
 
-    def set_cost_to_center(self, c): self.cost_to_center = c
+    # Các getter/setter nhóm giữ nguyên giao diện cũ: khi node đang gắn với union-find thì
+    # getter hỏi gốc tập, setter chép giá trị hiện tại về node rồi tách node ra trước khi ghi
+    def get_group_node_to_center(self):
+        if self.group_uf is not None: return self.group_uf.label_of(self.uf_index)
+        return self.group_node_to_center
+    def get_weight_of_group(self):
+        if self.group_uf is not None: return self.group_uf.weight_of(self.uf_index)
+        return self.weight_of_group
+    def get_group_size(self):
+        if self.group_uf is not None: return self.group_uf.size_of(self.uf_index)
+        return self.group_size
+    def get_cost_to_center(self):
+        if self.group_uf is not None: return self.group_uf.cost_of(self.uf_index)
+        return self.cost_to_center
+
+    def detach_group(self):
+        if self.group_uf is not None:
+            uf, i = self.group_uf, self.uf_index
+            self.group_uf = None
+            self.group_node_to_center = uf.label_of(i)
+            self.weight_of_group = uf.weight_of(i)
+            self.group_size = uf.size_of(i)
+            self.cost_to_center = uf.cost_of(i)
+
+    def set_cost_to_center(self, c): self.detach_group(); self.cost_to_center = c
     def set_next_connect(self, index): self.next_connect = index
     def set_thoahiep(self, t): self.thoa_hiep = t
-    def set_group_node_to_center(self, index): self.group_node_to_center = index
-    def set_weight_of_group(self, w): self.weight_of_group = w
-    def set_group_size(self, s): self.group_size = s
+    def set_group_node_to_center(self, index): self.detach_group(); self.group_node_to_center = index
+    def set_weight_of_group(self, w): self.detach_group(); self.weight_of_group = w
+    def set_group_size(self, s): self.detach_group(); self.group_size = s
 
     def set_connect(self, i): self.ListConnect.append(i)
     def reset_list_connect(self): self.ListConnect.clear()
 
     def set_weight(self, w):
+        self.detach_group()
         self.weight = w
         self.weight_of_group = w
 
+# ---------------------------
+# UNION-FIND CHO CAC NHOM
+# ---------------------------
+class GroupUnionFind:
+    """
+    Union-find theo chỉ số node (union by size + nén đường đi). Gốc của mỗi tập giữ nhãn nhóm,
+    trọng số nhóm, kích thước nhóm và chi phí về trung tâm, nên gộp nhóm không phải ghi lại
+    từng node. Một nhãn có thể ứng với nhiều tập (vd. nodes[68] và nodes[69] dùng chung nhãn),
+    khi gộp nhãn thì mọi tập mang nhãn đó được hợp lại như cách gán nhãn cũ.
+    """
+
+    def __init__(self, nodes):
+        n = len(nodes)
+        self.parent = np.arange(n)
+        self.count = np.ones(n, dtype=np.int64)  # Số node của tập (chỉ đúng ở gốc)
+        self.label = np.array([node.get_group_node_to_center() for node in nodes])
+        self.weight = np.array([node.get_weight_of_group() for node in nodes])
+        self.size = np.array([node.get_group_size() for node in nodes])
+        self.cost = np.array([node.get_cost_to_center() for node in nodes], dtype=np.float64)
+        self.members = [[i] for i in range(n)]
+        self.roots_by_label = {}
+        for i, g in enumerate(self.label.tolist()):
+            self.roots_by_label.setdefault(g, []).append(i)
+        for i, node in enumerate(nodes):
+            node.group_uf = self
+            node.uf_index = i
+
+    def find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:  # Nén đường đi
+            parent[i], i = root, parent[i]
+        return int(root)
+
+    def find_many(self, idx):
+        """Gốc của nhiều node cùng lúc (nhảy con trỏ vector hóa, nén luôn đường đi)."""
+        roots = self.parent[idx]
+        while True:
+            up = self.parent[roots]
+            if (up == roots).all():
+                break
+            roots = up
+        self.parent[idx] = roots
+        return roots
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.count[ra] < self.count[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.count[ra] += self.count[rb]
+        self.members[ra].extend(self.members[rb])
+        self.members[rb] = []
+        return ra
+
+    def merge_labels(self, src, dst, weight, size, cost):
+        """Gộp mọi tập mang nhãn src hoặc dst thành một tập nhãn dst với thông tin nhóm mới."""
+        roots = self.roots_by_label.pop(dst)
+        if src != dst:
+            roots = self.roots_by_label.pop(src) + roots
+        root = roots[0]
+        for r in roots[1:]:
+            root = self.union(root, r)
+        self.label[root] = dst
+        self.weight[root] = weight
+        self.size[root] = size
+        self.cost[root] = cost
+        self.roots_by_label[dst] = [root]
+        return root
+
+    def label_of(self, i): return self.label[self.find(i)].item()
+    def weight_of(self, i): return self.weight[self.find(i)].item()
+    def size_of(self, i): return self.size[self.find(i)].item()
+    def cost_of(self, i): return self.cost[self.find(i)].item()
+
 # ---------------------------
 # KHOI TAO DANH SACH NODES THEO DE BAI
 # ---------------------------
-def initialize_nodes_de6(num_nodes=100, max_coord=1000):
+def initialize_nodes_de6(num_nodes=100, max_coord=1000, seed=None):
+    if seed is not None:
+        # Mạng tái lập được theo seed (instance_gen, bộ trọng số "de6")
+        nodes = []
+        for v in load_instance(seed, num_nodes, max_coord):
+            node = Node()
+            node.create_name(v.id)
+            node.set_position(v.x, v.y)
+            node.set_weight(v.weight)
+            nodes.append(node)
+        return nodes
     nodes = []
     special_weights = {
         3: 30, 12: 30, 69: 30, 29: 30,
@@ -92,18 +212,17 @@ def calc_distance_2Dpoint(a, b):
 # ---------------------------
 # GIAI THUAT ESAU-WILLIAMS
 # ---------------------------
-def esau_williams_subtree(nodes, w_ew=15, hop_limit=4, debug=False):
+@instrument.traced("EsauWilliam.esau_williams_subtree")
+def esau_williams_subtree(nodes, w_ew=15, hop_limit=4, debug=False, stats=None):
+    # stats: dict (tùy chọn) nhận số lần gộp, số liên kết bị loại và số lần tính lại thoả hiệp
     N = len(nodes)
-    link_cost = [[num_inf]*N for _ in range(N)]
-
-    for i in range(N):
-        for j in range(i+1, N):
-            c = calc_distance_2Dpoint(nodes[i], nodes[j])
-            link_cost[i][j] = link_cost[j][i] = c
+    coords = to_coords(nodes)
+    # Chi phí liên kết được làm tròn 4 chữ số như calc_distance_2Dpoint
+    cost_from_0 = np.round(point_distances(coords, coords[0, 0], coords[0, 1]), 4).tolist()
 
     center = nodes[68]
     for i in range(1, N):
-        nodes[i].set_cost_to_center(link_cost[0][i])
+        nodes[i].set_cost_to_center(cost_from_0[i])
         nodes[i].set_next_connect(0)
         nodes[i].set_thoahiep(num_inf)
         nodes[i].set_group_node_to_center(i)
@@ -117,84 +236,139 @@ def esau_williams_subtree(nodes, w_ew=15, hop_limit=4, debug=False):
     center.set_group_size(1)
     center.reset_list_connect()
 
-    def cap_nhat_thoa_hiep():
-        for i in range(1, N):
-            min_th = num_inf
-            best_j = None
-            for j in range(1, N):
-                if nodes[i].get_group_node_to_center() == nodes[j].get_group_node_to_center():
-                    continue
-                th = link_cost[i][j] - nodes[i].get_cost_to_center()
-                if th < min_th:
-                    min_th = th
-                    best_j = j
-            nodes[i].set_thoahiep(min_th)
+    # Tra chỉ số theo tên; nhãn, trọng số, kích thước nhóm và chi phí về trung tâm nằm ở gốc union-find
+    index_of = {node.get_name(): idx for idx, node in enumerate(nodes)}
+    uf = GroupUnionFind(nodes)
+    blocked = {}  # Các liên kết bị loại do vi phạm ràng buộc (link_cost = vô cùng)
+
+    # Khi trọng số/kích thước nhóm chỉ tăng, cặp vi phạm ràng buộc sẽ vi phạm mãi nên được
+    # loại ngay lúc tính thoả hiệp. Riêng các node dùng chung nhãn nhóm với node khác nhưng
+    # khác trọng số nhóm (vd. nodes[68] và nodes[69]) thì trọng số có thể giảm sau khi gộp,
+    # nên cặp có chúng được xử lý như cũ: chọn, kiểm tra rồi mới loại liên kết.
+    unstable = np.zeros(N, dtype=bool)
+    for roots in uf.roots_by_label.values():
+        roots = [r for r in roots if uf.members[r] != [0]]
+        if len(set((uf.weight[r], uf.size[r]) for r in roots)) > 1:
+            for r in roots:
+                unstable[uf.members[r]] = True
+    unstable_idx = np.flatnonzero(unstable).tolist()
+
+    # Thoả hiệp của i với j là link_cost[i][j] - cost_to_center(i): ứng viên tốt nhất là node gần i
+    # nhất còn hợp lệ, và chỉ có ích khi link_cost < cost_to_center. Vì vậy chỉ cần tìm lân cận
+    # tăng dần quanh i bằng lưới không gian, dừng ở bán kính cost_to_center.
+    grid = GridIndex(coords)
+    min_w = uf.weight[1:].min() if N > 1 else 0
+    min_s = uf.size[1:].min() if N > 1 else 0
+
+    def chon_ung_vien(i, cand, dist):
+        ri, rc = uf.find(i), uf.find_many(cand)
+        ok = (cand != 0) & (uf.label[rc] != uf.label[ri])
+        if not unstable[i]:
+            ok &= (((uf.weight[ri] + uf.weight[rc] <= w_ew) & (uf.size[ri] + uf.size[rc] <= hop_limit))
+                   | unstable[cand])
+        cand = cand[ok]
+        link = np.round(dist[ok], 4)
+        # Duyệt theo (link, chỉ số) tăng dần - hòa thì lấy chỉ số nhỏ hơn như khi duyệt j tăng dần
+        skip = blocked.get(i, ())
+        for k in np.lexsort((cand, link)).tolist():
+            if cand[k] not in skip:
+                return int(cand[k]), float(link[k])
+        return None, num_inf
+
+    # Heap (thoả hiệp, chỉ số, phiên bản): mỗi node chỉ có một mục hợp lệ là mục có phiên bản mới nhất
+    heap = []
+    version = [0] * N
+
+    merges = rejected = recomputes = 0
+
+    def cap_nhat_thoa_hiep(i):
+        nonlocal recomputes
+        recomputes += 1
+        x, y = coords[i]
+        ri = uf.find(i)
+        cost_i = uf.cost[ri].item()
+        if not unstable[i] and (uf.weight[ri] + min_w > w_ew or uf.size[ri] + min_s > hop_limit):
+            # Nhóm của i đã đầy: chỉ còn các node không ổn định là có thể ghép
+            best_j, link = None, num_inf
+            if unstable_idx:
+                cand = np.array(unstable_idx)
+                best_j, link = chon_ung_vien(i, cand, point_distances(coords[cand], x, y))
+        else:
+            limit = cost_i + 1e-3  # Xa hơn thì link_cost (đã làm tròn) không thể nhỏ hơn cost_i
+            r = 2 * grid.cell_size
+            while True:
+                r = min(r, limit)
+                cand, dist = grid.query_radius(x, y, r, sort=False)
+                best_j, link = chon_ung_vien(i, cand, dist)
+                # Node ngoài bán kính r có link >= round(r), nên kết quả chỉ chắc chắn khi link < round(r)
+                if (best_j is not None and link < np.round(r, 4)) or r >= limit:
+                    break
+                r *= 2
+
+        min_th = link - cost_i
+        nodes[i].set_thoahiep(min_th)
+        if best_j is not None:
             nodes[i].set_next_connect(nodes[best_j].get_name())
 
-    cap_nhat_thoa_hiep()
+        version[i] += 1
+        if min_th < 0:
+            heapq.heappush(heap, (min_th, i, version[i]))
 
-    while True:
-        min_th = 0
-        u_idx = -1
+    with instrument.phase("tradeoff_init"):
         for i in range(1, N):
-            if nodes[i].get_thoahiep() < min_th:
-                min_th = nodes[i].get_thoahiep()
-                u_idx = i
-
-        if u_idx == -1:
-            break
-
-        u = nodes[u_idx]
-        v_name = u.get_next_connect()
-        v_idx = next(idx for idx in range(N) if nodes[idx].get_name() == v_name)
-        v = nodes[v_idx]
-
-        total_w = u.get_weight_of_group() + v.get_weight_of_group()
-        total_size = u.get_group_size() + v.get_group_size()
-
-        if total_w <= w_ew and total_size <= hop_limit:
-            u.reset_list_connect()
-            u.set_connect(v.get_name())
-
-            gid_src = u.get_group_node_to_center()
-            gid_dst = v.get_group_node_to_center()
-
-            for i in range(N):
-                if nodes[i].get_group_node_to_center() == gid_src:
-                    nodes[i].set_group_node_to_center(gid_dst)
-
-            for i in range(N):
-                if nodes[i].get_group_node_to_center() == gid_dst:
-                    nodes[i].set_weight_of_group(total_w)
-                    nodes[i].set_group_size(total_size)
-                    nodes[i].set_cost_to_center(v.get_cost_to_center())
-        else:
-            link_cost[u_idx][v_idx] = link_cost[v_idx][u_idx] = num_inf
-
-        cap_nhat_thoa_hiep()
-
+            cap_nhat_thoa_hiep(i)
+
+    with instrument.phase("merge_loop"):
+        while heap:
+            min_th, u_idx, ver = heapq.heappop(heap)
+            if ver != version[u_idx]:
+                continue  # Mục cũ, thoả hiệp của node đã được tính lại
+
+            u = nodes[u_idx]
+            v_idx = index_of[u.get_next_connect()]
+            v = nodes[v_idx]
+
+            total_w = u.get_weight_of_group() + v.get_weight_of_group()
+            total_size = u.get_group_size() + v.get_group_size()
+
+            if total_w <= w_ew and total_size <= hop_limit:
+                u.reset_list_connect()
+                u.set_connect(v.get_name())
+
+                # Gộp tập nhãn của u vào nhãn của v: chỉ ghi thông tin nhóm mới ở gốc
+                root = uf.merge_labels(u.get_group_node_to_center(), v.get_group_node_to_center(),
+                                       total_w, total_size, v.get_cost_to_center())
+                group = uf.members[root]
+                if unstable[group].any():
+                    unstable[group] = False  # Nhãn giờ chỉ còn một tập nên thông tin nhóm đã đồng nhất
+                    unstable_idx[:] = np.flatnonzero(unstable).tolist()
+
+                # Chỉ các node trong nhóm vừa gộp thay đổi chi phí và tập ứng viên
+                affected = [i for i in group if i != 0]
+                merges += 1
+            else:
+                blocked.setdefault(u_idx, set()).add(v_idx)
+                blocked.setdefault(v_idx, set()).add(u_idx)
+                affected = [u_idx, v_idx]
+                rejected += 1
+
+            for i in affected:
+                cap_nhat_thoa_hiep(i)
+
+    instrument.count("merges", merges)
+    instrument.count("rejected_merges", rejected)
+    instrument.count("tradeoff_recomputes", recomputes)
+    if stats is not None:
+        stats["merges"] = merges
+        stats["rejected"] = rejected
+        stats["recomputes"] = recomputes
     return nodes
 
 # ---------------------------
 # VE CAY ESAU-WILLIAMS
 # ---------------------------
-def draw_esau_tree(subnet_nodes, MAX):
-    xpos = [n.get_position_x() for n in subnet_nodes]
-    ypos = [n.get_position_y() for n in subnet_nodes]
-
-    for node in subnet_nodes:
-        plt.text(node.get_position_x(), node.get_position_y(), str(node.get_name()), fontsize=8,
-                 bbox=dict(facecolor='yellow' if node == subnet_nodes[0] else 'white', edgecolor='black', boxstyle='round'))
-        for conn_id in node.get_list_connect():
-            conn_node = next(n for n in subnet_nodes if n.get_name() == conn_id)
-            plt.plot([node.get_position_x(), conn_node.get_position_x()],
-                     [node.get_position_y(), conn_node.get_position_y()], 'k-')
-
-    plt.plot(xpos, ypos, 'ro')
-    plt.title(f"Cay Esau-Williams: Backbone {subnet_nodes[0].get_name()}")
-    plt.axis([-0.05*MAX, 1.05*MAX, -0.05*MAX, 1.05*MAX])
-    plt.grid(True)
-    plt.show()
+def draw_esau_tree(subnet_nodes, MAX, out=None):
+    return render.draw_esau_tree(subnet_nodes, MAX, out)
 
 # ---------------------------
 # TINH CHI PHI CUA CAY
@@ -1,27 +1,148 @@
-import random
 import math
-import csv
+import random
+import sys
+import time
+import numpy as np
+from distance_engine import pair_distances
+import edge_store
+from sparse_graph import MODES, DEFAULT_K, build_sparse_graph
+from instance_gen import load_instance
 
 # Số nút
 n_nodes = 100
+# Đặt số nguyên để sinh tọa độ tái lập được (instance_gen)
+SEED = None
+# Số cạnh tối đa sinh ra và ghi trong một khối (giới hạn bộ nhớ tạm, ít nhất một hàng i)
+BLOCK_EDGES = 1 << 18
+HEADER = "Node1,Node2,Distance\r\n"
+
 
 # Tạo vị trí ngẫu nhiên cho mỗi nút trên mặt phẳng 1000x1000
-positions = [(random.randint(0, 1000), random.randint(0, 1000)) for _ in range(n_nodes)]
+def generate_positions(n_nodes, max_coord=1000, seed=None):
+    if seed is not None:
+        # Tọa độ tái lập được theo seed, sinh vector hóa (mảng (N, 2))
+        table = load_instance(seed, n_nodes, max_coord, "uniform")
+        return np.column_stack((table.x, table.y))
+    return [(random.randint(0, max_coord), random.randint(0, max_coord)) for _ in range(n_nodes)]
+
+
+# Sinh danh sách cạnh (i, j, distance), i < j, theo từng khối hàng i liên tiếp
+def iter_edge_blocks(positions, metric="manhattan", block_edges=BLOCK_EDGES):
+    """
+    Mỗi khối là 3 mảng (i, j, distance) theo đúng thứ tự của hai vòng lặp lồng nhau
+    for i / for j > i; chỉ một khối nằm trong bộ nhớ tại một thời điểm.
+    """
+    pts = np.asarray(positions)
+    n = len(pts)
+    start = 0
+    while start < n - 1:
+        # Lấy các hàng i liên tiếp tới khi đủ block_edges cạnh (hàng i có n - 1 - i cạnh)
+        stop, count = start, 0
+        while stop < n - 1 and (count == 0 or count + n - 1 - stop <= block_edges):
+            count += n - 1 - stop
+            stop += 1
+        rows = np.arange(start, stop)
+        per_row = n - 1 - rows
+        ii = np.repeat(rows, per_row)
+        # j chạy từ i + 1 trong mỗi hàng: vị trí trong khối trừ vị trí đầu hàng
+        first = np.repeat(np.cumsum(per_row) - per_row, per_row)
+        jj = np.arange(count) - first + ii + 1
+        yield ii, jj, pair_distances(pts[ii], pts[jj], metric)
+        start = stop
+
+
+# Định dạng một khối thành văn bản CSV giống csv.writer (dấu phẩy, xuống dòng \r\n)
+def format_edge_block(ii, jj, dist):
+    row = "%d,%d,%d\r\n" if dist.dtype.kind in "iu" else "%d,%d,%r\r\n"
+    values = [None] * (3 * len(ii))
+    values[0::3] = ii.tolist()
+    values[1::3] = jj.tolist()
+    values[2::3] = dist.tolist()
+    return (row * len(ii)) % tuple(values)
+
+
+# Ghi danh sách cạnh ra file CSV theo từng khối, trả về (số dòng, thời gian)
+def write_edge_list(positions, filename="edge_list.csv", metric="manhattan", block_edges=BLOCK_EDGES,
+                    progress=False):
+    start = time.perf_counter()
+    rows = 0
+    with open(filename, "w", newline="", encoding="ascii", buffering=1 << 20) as f:
+        f.write(HEADER)
+        for ii, jj, dist in iter_edge_blocks(positions, metric, block_edges):
+            f.write(format_edge_block(ii, jj, dist))
+            rows += len(ii)
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f"  {rows} dòng, {rows / elapsed:,.0f} dòng/s", end="\r")
+    if progress:
+        print()
+    return rows, time.perf_counter() - start
+
+
+# Ghi danh sách cạnh ra file nhị phân dạng rút gọn (xem edge_store), trả về (số cạnh, thời gian)
+def write_edge_binary(positions, filename="edge_list.bin", metric="manhattan", dist_dtype=None,
+                      block_edges=BLOCK_EDGES):
+    """
+    dist_dtype mặc định: uint32 khi khoảng cách manhattan trên tọa độ nguyên (chính xác),
+    float32 cho các trường hợp còn lại; có thể chọn float64 để giữ nguyên độ chính xác.
+    """
+    start = time.perf_counter()
+    pts = np.asarray(positions)
+    n = len(pts)
+    if dist_dtype is None:
+        span = int((pts.max(axis=0) - pts.min(axis=0)).sum()) if n else 0
+        exact_int = metric == "manhattan" and pts.dtype.kind in "iu" and span < 2 ** 32
+        dist_dtype = "<u4" if exact_int else "<f4"
+    id_dtype = np.dtype("<u4") if n < 2 ** 32 else np.dtype("<u8")
+
+    rows = 0
+    with open(filename, "wb", buffering=1 << 20) as f:
+        f.write(edge_store.pack_header(n, metric, id_dtype, dist_dtype))
+        f.write(np.arange(n, dtype=id_dtype).tobytes())
+        f.write(b"\0" * (edge_store.dist_offset(n, id_dtype) - edge_store.HEADER_SIZE - n * id_dtype.itemsize))
+        for ii, jj, dist in iter_edge_blocks(pts, metric, block_edges):
+            f.write(dist.astype(dist_dtype).tobytes())
+            rows += len(ii)
+    return rows, time.perf_counter() - start
+
 
+# Ghi các cạnh (i < j) của đồ thị thưa CSR ra file CSV cùng định dạng, trả về (số dòng, thời gian)
+def write_sparse_edge_list(graph, filename="edge_list.csv", block_edges=BLOCK_EDGES):
+    start = time.perf_counter()
+    ii, jj, dist = graph.edges()
+    # Tọa độ nguyên + manhattan cho khoảng cách nguyên: ghi dạng số nguyên như danh sách đầy đủ
+    if graph.metric == "manhattan" and np.all(dist == np.round(dist)):
+        dist = dist.astype(np.int64)
+    with open(filename, "w", newline="", encoding="ascii", buffering=1 << 20) as f:
+        f.write(HEADER)
+        for lo in range(0, len(ii), block_edges):
+            hi = lo + block_edges
+            f.write(format_edge_block(ii[lo:hi], jj[lo:hi], dist[lo:hi]))
+    return len(ii), time.perf_counter() - start
 
-# Tính khoảng cách giữa mọi cặp nút và lưu theo danh sách cạnh
-edges = []
-for i in range(n_nodes):
-    for j in range(i + 1, n_nodes):
-        x1, y1 = positions[i]
-        x2, y2 = positions[j]
-        distance = abs(x2 - x1) + abs(y2 - y1)
-        edges.append((i, j, distance))
 
-# Xuất ra file CSV
-with open("edge_list.csv", "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["Node1", "Node2", "Distance"])
-    writer.writerows(edges)
+if __name__ == "__main__":
+    # Ví dụ: python Kieudanhsach.py 2000 euclidean      (CSV)
+    #        python Kieudanhsach.py 2000 manhattan bin  (file nhị phân edge_list.bin)
+    #        python Kieudanhsach.py 1000000 euclidean knn  (đồ thị thưa: knn / radius / delaunay)
+    #        python Kieudanhsach.py 100000 euclidean radius 5  (bán kính tùy chọn)
+    if len(sys.argv) > 1:
+        n_nodes = int(sys.argv[1])
+    metric = sys.argv[2] if len(sys.argv) > 2 else "manhattan"
+    mode = sys.argv[3] if len(sys.argv) > 3 else None
+    positions = generate_positions(n_nodes, seed=SEED)
 
-print("Đã lưu danh sách cạnh vào file 'edge_list.csv'.")
+    # Tính khoảng cách giữa mọi cặp nút và xuất ra file theo từng khối
+    if mode in MODES:
+        # Bán kính mặc định: trung bình khoảng DEFAULT_K láng giềng mỗi nút trên mặt phẳng 1000x1000
+        radius = float(sys.argv[4]) if len(sys.argv) > 4 else 1000 * math.sqrt(DEFAULT_K / (math.pi * n_nodes))
+        graph = build_sparse_graph(positions, mode, radius=radius, metric=metric)
+        rows, elapsed = write_sparse_edge_list(graph)
+        print(f"Đã lưu danh sách cạnh ({mode}) vào file 'edge_list.csv'.")
+    elif mode == "bin":
+        rows, elapsed = write_edge_binary(positions, metric=metric)
+        print("Đã lưu danh sách cạnh vào file 'edge_list.bin'.")
+    else:
+        rows, elapsed = write_edge_list(positions, metric=metric, progress=n_nodes > 2000)
+        print("Đã lưu danh sách cạnh vào file 'edge_list.csv'.")
+    print(f"{rows} dòng trong {elapsed:.3f}s ({rows / max(elapsed, 1e-9):,.0f} dòng/s)")
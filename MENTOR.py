@@ -1,6 +1,12 @@
 import random
 import math
-import matplotlib.pyplot as plt
+import numpy as np
+import render
+import instrument
+from distance_engine import diameter, to_coords, point_distances, pairwise_block, weighted_moments, geometric_median
+from spatial_index import GridIndex
+from reward import RewardPool
+from instance_gen import load_instance
 
 # ==================== Cài đặt mặc định ====================
 W_THRESHOLD = 2
@@ -8,7 +14,14 @@ RADIUS_RATIO = 0.3
 C = 14
 NUM_NODES = 100
 MAX_COORD = 1000
+SEED = None  # Đặt số nguyên để sinh mạng tái lập được (instance_gen)
 OUTPUT_FILE = "mentor_output.txt"
+# Chọn backbone trung tâm: "exact" - moment của mọi backbone (vector hóa, O(B²) phép tính);
+# "weiszfeld" - chỉ tính moment của CENTRAL_CANDIDATES backbone gần trung vị hình học nhất;
+# "auto" - weiszfeld khi số backbone vượt CENTRAL_EXACT_LIMIT
+CENTRAL_MODE = "exact"
+CENTRAL_EXACT_LIMIT = 20000
+CENTRAL_CANDIDATES = 32
 
 # ==================== Lớp Node ====================
 class Node:
@@ -23,14 +36,9 @@ class Node:
 def calculate_distance(n1, n2):
     return math.sqrt((n1.x - n2.x) ** 2 + (n1.y - n2.y) ** 2)
 
-def calculate_max_distance(nodes):
-    max_dist = 0
-    for i in range(len(nodes)):
-        for j in range(i +1, len(nodes)):
-            dist = calculate_distance(nodes[i], nodes[j])
-            if dist > max_dist:
-                max_dist = dist
-    return max_dist
+def calculate_max_distance(nodes, metric="euclidean"):
+    # Đường kính mạng qua bao lồi + rotating calipers (O(N log N)) thay cho duyệt mọi cặp
+    return diameter(to_coords(nodes), metric)
 
 def calculate_award(node, center_x, center_y, max_dist, max_weight):
     dc = math.sqrt((node.x - center_x) ** 2 + (node.y - center_y) ** 2)
@@ -39,7 +47,12 @@ def calculate_award(node, center_x, center_y, max_dist, max_weight):
     return 0.5 * norm_dist + 0.5 * norm_weight
 
 # ==================== Khởi tạo mạng ====================
-def initialize_network():
+def initialize_network(seed=None):
+    seed = SEED if seed is None else seed
+    if seed is not None:
+        # Sinh vector hóa theo seed (mạng lớn được cache trên đĩa), cùng số node như vòng lặp dưới
+        table = load_instance(seed, NUM_NODES - 1, MAX_COORD)
+        return table.to_objects(lambda v: Node(v.id, v.x, v.y, v.weight))
     nodes = []
     special_weights = {
         3: 30, 12: 30, 69: 30, 29: 30,
@@ -56,24 +69,40 @@ def initialize_network():
     return nodes
 
 # ==================== Gán access node ====================
-def assign_access_nodes(all_nodes, backbones, threshold_distance, assigned_ids):
-    access_map = {bb.id: [] for bb in backbones}
+def build_access_index(all_nodes, assigned_ids):
+    # Chỉ mục không gian chỉ chứa các node chưa được gán
+    index = GridIndex(to_coords(all_nodes))
+    index.remove([k for k, node in enumerate(all_nodes) if node.id in assigned_ids])
+    return index
 
-    for node in all_nodes:
+def assign_access_nodes(all_nodes, backbones, threshold_distance, assigned_ids, index=None):
+    access_map = {bb.id: [] for bb in backbones}
+    if not backbones:
+        return access_map
+    if index is None:
+        index = build_access_index(all_nodes, assigned_ids)
+
+    # Các node chưa gán nằm trong bán kính của từng backbone
+    found = [index.query_radius(bb.x, bb.y, threshold_distance) for bb in backbones]
+    idx = np.concatenate([f[0] for f in found])
+    dist = np.concatenate([f[1] for f in found])
+    bb_k = np.concatenate([np.full(len(f[0]), k) for k, f in enumerate(found)])
+
+    # Mỗi node về backbone gần nhất, hòa thì lấy backbone đứng trước; duyệt theo thứ tự node
+    order = np.lexsort((bb_k, dist, idx))
+    idx, bb_k = idx[order], bb_k[order]
+    first = np.ones(len(idx), dtype=bool)
+    first[1:] = idx[1:] != idx[:-1]
+
+    newly_assigned = []
+    for k, b in zip(idx[first].tolist(), bb_k[first].tolist()):
+        node = all_nodes[k]
         if node.id in assigned_ids:
             continue  # Đã được gán trước đó
-
-        nearest_bb = None
-        min_dist = float('inf')
-        for bb in backbones:
-            dist = calculate_distance(node, bb)
-            if dist <= threshold_distance and dist < min_dist:
-                min_dist = dist
-                nearest_bb = bb
-
-        if nearest_bb is not None:
-            access_map[nearest_bb.id].append(node.id)
-            assigned_ids.add(node.id)
+        access_map[backbones[b].id].append(node.id)
+        assigned_ids.add(node.id)
+        newly_assigned.append(k)
+    index.remove(newly_assigned)
 
     return access_map
 
@@ -87,42 +116,81 @@ def find_initial_backbones(nodes):
     return backbones
 
 # ==================== Tìm backbone trung tâm ====================
-def find_central_backbone(backbones):
+def find_central_backbone(backbones, mode=None):
+    """Backbone có moment Σ weight · khoảng cách tới các backbone khác nhỏ nhất (mode: xem CENTRAL_MODE)."""
     def moment(bb):
         return sum(calculate_distance(bb, other) * other.weight for other in backbones if other.id != bb.id)
-    return min(backbones, key=moment)
+
+    mode = mode or CENTRAL_MODE
+    if mode == "auto":
+        mode = "weiszfeld" if len(backbones) > CENTRAL_EXACT_LIMIT else "exact"
+    coords = to_coords(backbones)
+    weights = np.array([bb.weight for bb in backbones], dtype=np.float64)
+    if mode == "exact":
+        cand = np.arange(len(backbones))
+        m = weighted_moments(coords, weights)
+    elif mode == "weiszfeld":
+        # Moment là hàm lồi của vị trí: backbone tốt nhất nằm quanh điểm cực tiểu liên tục
+        x, y = geometric_median(coords, weights)
+        k = min(CENTRAL_CANDIDATES, len(backbones))
+        cand = np.sort(np.argpartition(point_distances(coords, x, y), k - 1)[:k])
+        m = pairwise_block(coords[cand], coords) @ weights
+    else:
+        raise ValueError(f"CENTRAL_MODE không hợp lệ: {mode!r}")
+
+    # Tổng vector hóa có thể lệch vài ulp so với cộng tuần tự: các backbone sát giá trị nhỏ nhất
+    # được tính lại đúng như cũ để kết quả (kể cả khi hòa) không đổi
+    best = m.min()
+    near = cand[m <= best + 1e-9 * max(abs(best), 1.0)]
+    return min((backbones[k] for k in near.tolist()), key=moment)
 
 # ==================== Thuật toán MENTOR đầy đủ ====================
+@instrument.traced("MENTOR.mentor_algorithm")
 def mentor_algorithm():
     nodes = initialize_network()
-    backbones = find_initial_backbones(nodes)
+    with instrument.phase("backbone_threshold"):
+        backbones = find_initial_backbones(nodes)
     print("Backbone ban đầu:", [n.id for n in backbones])
 
-    max_cost = calculate_max_distance(nodes)
+    with instrument.phase("max_cost"):
+        max_cost = calculate_max_distance(nodes)
     threshold_distance = RADIUS_RATIO * max_cost
     print(f"Bán kính truy nhập = R * MaxCost = {threshold_distance:.2f}")
 
-    assigned_ids = set(bb.id for bb in backbones)
-    access_map = assign_access_nodes(nodes, backbones, threshold_distance, assigned_ids)
-
-    while len(assigned_ids) < len(nodes):
-        unassigned = [n for n in nodes if n.id not in assigned_ids]
-        total_weight = sum(n.weight for n in unassigned)
-        center_x = sum(n.x * n.weight for n in unassigned) / total_weight
-        center_y = sum(n.y * n.weight for n in unassigned) / total_weight
-
-        max_dist = max(calculate_distance(Node(-1, center_x, center_y, 0), n) for n in unassigned)
-        max_weight = max(n.weight for n in unassigned)
-
-        best_node = max(unassigned, key=lambda n: calculate_award(n, center_x, center_y, max_dist, max_weight))
-        best_node.is_backbone = True
-        backbones.append(best_node)
-        print(f"→ Chọn node {best_node.id} làm backbone theo thưởng")
-
-        new_map = assign_access_nodes(nodes, [best_node], threshold_distance, assigned_ids)
-        access_map[best_node.id] = new_map.get(best_node.id, [])
-
-    central_bb = find_central_backbone(backbones)
+    with instrument.phase("radius_assignment"):
+        assigned_ids = set(bb.id for bb in backbones)
+        index = build_access_index(nodes, assigned_ids)
+        access_map = assign_access_nodes(nodes, backbones, threshold_distance, assigned_ids, index)
+
+    # Tập node chưa gán dạng mặt nạ trên mảng tọa độ / trọng số, cùng tập với chỉ mục không gian
+    weights = np.array([n.weight for n in nodes], dtype=np.float64)
+    pool = RewardPool(nodes, weights, active=index.alive)
+    with instrument.phase("reward_rounds"):
+        while len(assigned_ids) < len(nodes):
+            # Trọng tâm lấy từ các tổng chạy, maxdc từ bao lồi; giá trị thưởng (như calculate_award) tính trên cả mảng
+            unassigned = pool.indices()
+            center_x, center_y = pool.center()
+            dc = pool.distances(unassigned, center_x, center_y)
+            w = weights[unassigned]
+            max_dist, max_weight = pool.farthest(center_x, center_y)[1], w.max()
+            norm_dist = (max_dist - dc) / max_dist if max_dist > 0 else 0
+            norm_weight = w / max_weight if max_weight > 0 else 0
+            award = 0.5 * norm_dist + 0.5 * norm_weight
+
+            best_node = nodes[unassigned[np.argmax(award)]]
+            best_node.is_backbone = True
+            backbones.append(best_node)
+            print(f"→ Chọn node {best_node.id} làm backbone theo thưởng")
+            instrument.count("reward_rounds")
+
+            with instrument.phase("radius_assignment"):
+                new_map = assign_access_nodes(nodes, [best_node], threshold_distance, assigned_ids, index)
+            access_map[best_node.id] = new_map.get(best_node.id, [])
+            pool.sync(index.alive)
+    instrument.count("backbones", len(backbones))
+
+    with instrument.phase("central_backbone"):
+        central_bb = find_central_backbone(backbones)
     print(f"Backbone trung tâm: {central_bb.id}")
 
     # ===== Ghi ra file =====
@@ -135,17 +203,8 @@ def mentor_algorithm():
     return nodes, backbones, access_map
 
 # ==================== Vẽ topology ====================
-def draw_topology(nodes, backbones, access_map):
-    for node in nodes:
-        color = "red" if node.is_backbone else "blue"
-        plt.scatter(node.x, node.y, c=color)
-        plt.text(node.x, node.y, str(node.id), fontsize=8)
-    for bb in backbones:
-        for acc_id in access_map.get(bb.id, []):
-            acc = next(n for n in nodes if n.id == acc_id)
-            plt.plot([bb.x, acc.x], [bb.y, acc.y], 'gray', linestyle="--", linewidth=0.5)
-    plt.title("Backbone and Access Nodes")
-    plt.show()
+def draw_topology(nodes, backbones, access_map, out=None):
+    return render.draw_topology(nodes, backbones, access_map, out)
 
 # ==================== Thực thi ====================
 if __name__ == "__main__":
@@ -1,5 +1,13 @@
 import random
 import math
+from sparse_graph import build_sparse_graph
+from instance_gen import load_instance
+
+# Chế độ dựng cạnh: "day_du" (mọi cặp, O(N^2)) hoặc đồ thị thưa "knn" / "radius" / "delaunay"
+CHE_DO_CANH = "day_du"
+K_LANG_GIENG = 8    # Số láng giềng gần nhất (chế độ knn)
+BAN_KINH = 150      # Bán kính nối cạnh (chế độ radius)
+SEED = None         # Đặt số nguyên để sinh điểm tái lập được (instance_gen)
 
 class Node:
   def __init__(self, ten, x, y):
@@ -13,25 +21,39 @@ class Node:
 def distance_formula(x1, y1, x2, y2):
   return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
-# Tạo danh sách chứa 5 điểm (để dễ theo dõi, bạn có thể thay đổi thành 100)
-danh_sach_diem = []
-for i in range(1, 100):  # Thay đổi thành range(1, 100) để tạo 100 điểm
-  ten_diem = f"P{i}"
-  toa_do_x = random.randint(0, 1000)  # Phạm vi nhỏ hơn để dễ theo dõi
-  toa_do_y = random.randint(0, 1000)
-  diem = Node(ten_diem, toa_do_x, toa_do_y)
-  danh_sach_diem.append(diem)
+if __name__ == "__main__":
+  # Tạo danh sách chứa 5 điểm (để dễ theo dõi, bạn có thể thay đổi thành 100)
+  danh_sach_diem = []
+  if SEED is not None:
+    # Điểm tái lập được theo seed (instance_gen)
+    bang = load_instance(SEED, 99, 1000, "uniform")
+    danh_sach_diem = bang.to_objects(lambda v: Node(f"P{v.id}", v.x, v.y))
+  else:
+    for i in range(1, 100):  # Thay đổi thành range(1, 100) để tạo 100 điểm
+      ten_diem = f"P{i}"
+      toa_do_x = random.randint(0, 1000)  # Phạm vi nhỏ hơn để dễ theo dõi
+      toa_do_y = random.randint(0, 1000)
+      diem = Node(ten_diem, toa_do_x, toa_do_y)
+      danh_sach_diem.append(diem)
 
-# Tạo danh sách cạnh đầy đủ
-danh_sach_canh_day_du = []
-for i in range(len(danh_sach_diem)):
-  for j in range(i + 1, len(danh_sach_diem)):
-    diem1 = danh_sach_diem[i]
-    diem2 = danh_sach_diem[j]
-    khoang_cach = distance_formula(diem1.x, diem1.y, diem2.x, diem2.y)
-    danh_sach_canh_day_du.append(((diem1.ten, diem2.ten), khoang_cach))
+  if CHE_DO_CANH == "day_du":
+    # Tạo danh sách cạnh đầy đủ
+    danh_sach_canh_day_du = []
+    for i in range(len(danh_sach_diem)):
+      for j in range(i + 1, len(danh_sach_diem)):
+        diem1 = danh_sach_diem[i]
+        diem2 = danh_sach_diem[j]
+        khoang_cach = distance_formula(diem1.x, diem1.y, diem2.x, diem2.y)
+        danh_sach_canh_day_du.append(((diem1.ten, diem2.ten), khoang_cach))
 
-# Hiển thị danh sách cạnh đầy đủ
-print("\nDanh sách cạnh đầy đủ:")
-for canh, khoang_cach in danh_sach_canh_day_du:
-  print(f"Cạnh giữa {canh[0]} và {canh[1]}: Khoảng cách = {khoang_cach:.2f}")
\ No newline at end of file
+    # Hiển thị danh sách cạnh đầy đủ
+    print("\nDanh sách cạnh đầy đủ:")
+    for canh, khoang_cach in danh_sach_canh_day_du:
+      print(f"Cạnh giữa {canh[0]} và {canh[1]}: Khoảng cách = {khoang_cach:.2f}")
+  else:
+    # Đồ thị thưa dạng CSR: chỉ giữ cạnh giữa các điểm gần nhau, đủ nhẹ cho hàng triệu điểm
+    do_thi = build_sparse_graph(danh_sach_diem, CHE_DO_CANH, k=K_LANG_GIENG, radius=BAN_KINH)
+    nguon, dich, khoang_cach = do_thi.edges()
+    print(f"\nDanh sách cạnh ({CHE_DO_CANH}, {len(nguon)} cạnh):")
+    for i, j, d in zip(nguon.tolist(), dich.tolist(), khoang_cach.tolist()):
+      print(f"Cạnh giữa {danh_sach_diem[i].ten} và {danh_sach_diem[j].ten}: Khoảng cách = {d:.2f}")
\ No newline at end of file
@@ -1,7 +1,12 @@
 import random
-import math
-import matplotlib.pyplot as plt
+import render
+import instrument
 import json
+import numpy as np
+from distance_engine import diameter, to_coords
+from spatial_index import GridIndex
+from reward import RewardPool
+from instance_gen import load_instance
 
 # ==================== Cấu hình tham số ====================
 W_THRESHOLD = 2
@@ -9,7 +14,8 @@ RADIUS_RATIO = 0.3
 C = 14
 NUM_NODES = 100
 MAX_COORD = 1000
-DEBUG = True  # Bật/tắt chế độ debug
+SEED = None  # Đặt số nguyên để sinh mạng tái lập được (instance_gen)
+DEBUG = False  # Bật/tắt chế độ debug (in toàn bộ danh sách nút, rất chậm với mạng lớn)
 
 
 # ==================== Lớp Node ====================
@@ -47,42 +53,18 @@ def print_mentor_groups(groups):
         print(f"  Access nodes ({len(access_nodes)}): {', '.join(str(n.id) for n in access_nodes)}")
 
 
-def visualize_mentor(groups, max_coord):
-    plt.figure(figsize=(12, 12))
-    colors = plt.cm.tab20.colors
-
-    for i, group in enumerate(groups):
-        if not group:
-            continue
-
-        backbone = group[0]
-        color = colors[i % len(colors)]
-
-        # Vẽ backbone node
-        plt.scatter(backbone.x, backbone.y, s=400, c=[color], marker="s", edgecolors="black", zorder=5)
-        plt.text(backbone.x, backbone.y, f"B{backbone.id}", fontsize=10, ha="center", va="center", fontweight="bold")
-
-        # Vẽ access nodes và đường kết nối
-        for node in group[1:]:
-            plt.scatter(node.x, node.y, s=200, c=[color], marker="o", edgecolors="black", alpha=0.8)
-            plt.text(node.x, node.y, f"A{node.id}", fontsize=9, ha="center", va="center")
-            plt.plot([backbone.x, node.x], [backbone.y, node.y], color=color, linestyle="--", alpha=0.6)
-
-    plt.title("MENTOR ALGORITHM RESULTS", fontsize=14)
-    plt.xlabel("X Coordinate")
-    plt.ylabel("Y Coordinate")
-    plt.grid(True, linestyle="--", alpha=0.7)
-    plt.xlim(0, max_coord)
-    plt.ylim(0, max_coord)
-    plt.tight_layout()
-    plt.show()
+def visualize_mentor(groups, max_coord, out=None):
+    return render.visualize_mentor(groups, max_coord, out)
 
 
 # ==================== Thuật toán MENTOR ====================
+@instrument.traced("Test.mentor_algorithm")
 def mentor_algorithm():
     # Khởi tạo mạng với các nút có trọng số đặc biệt
     nodes = initialize_network()
     all_nodes = nodes.copy()  # Lưu toàn bộ các nút để tính MaxCost
+    index_of = {node.id: k for k, node in enumerate(all_nodes)}
+    access_index = GridIndex(to_coords(all_nodes))  # Chỉ giữ các nút chưa được gán
 
     if DEBUG:
         print_node_list(nodes, "DANH SÁCH NÚT BAN ĐẦU")
@@ -91,26 +73,23 @@ def mentor_algorithm():
     backbone_nodes = []
     remaining_nodes = []
 
-    for node in nodes:
-        normalized_weight = node.weight / C
-        if normalized_weight > W_THRESHOLD:
-            node.is_backbone = True
-            backbone_nodes.append(node)
-        else:
-            remaining_nodes.append(node)
+    with instrument.phase("backbone_threshold"):
+        for node in nodes:
+            normalized_weight = node.weight / C
+            if normalized_weight > W_THRESHOLD:
+                node.is_backbone = True
+                backbone_nodes.append(node)
+                access_index.remove(index_of[node.id])
+            else:
+                remaining_nodes.append(node)
 
     if DEBUG:
         print_node_list(backbone_nodes, "NÚT BACKBONE (BƯỚC 1)")
         print_node_list(remaining_nodes, "NÚT CÒN LẠI SAU BƯỚC 1")
 
     # Bước 2: Tính MaxCost (trên TẤT CẢ các nút)
-    max_cost = 0
-    for i in range(len(all_nodes)):
-        for j in range(i + 1, len(all_nodes)):
-            distance = math.sqrt((all_nodes[i].x - all_nodes[j].x) ** 2 +
-                                 (all_nodes[i].y - all_nodes[j].y) ** 2)
-            if distance > max_cost:
-                max_cost = distance
+    with instrument.phase("max_cost"):
+        max_cost = diameter(to_coords(all_nodes))
 
     radius = RADIUS_RATIO * max_cost
 
@@ -121,84 +100,75 @@ def mentor_algorithm():
     # Bước 3: Gán access nodes cho backbone nodes
     mentor_groups = []
 
-    for backbone in backbone_nodes:
-        group = [backbone]
-        access_nodes = []
+    with instrument.phase("radius_assignment"):
+        for backbone in backbone_nodes:
+            group = [backbone]
+            in_range, _ = access_index.query_radius(backbone.x, backbone.y, radius)
+            access_index.remove(in_range)
+            access_nodes = [all_nodes[k] for k in in_range.tolist()]
+            # remaining_nodes chỉ dùng để in debug, không lọc lại khi tắt DEBUG
+            if access_nodes and DEBUG:
+                taken = {node.id for node in access_nodes}
+                remaining_nodes = [node for node in remaining_nodes if node.id not in taken]
 
-        for node in list(remaining_nodes):
-            distance = math.sqrt((node.x - backbone.x) ** 2 +
-                                 (node.y - backbone.y) ** 2)
-            if distance <= radius:
-                access_nodes.append(node)
-                remaining_nodes.remove(node)
-
-        group.extend(access_nodes)
-        mentor_groups.append(group)
+            group.extend(access_nodes)
+            mentor_groups.append(group)
 
     if DEBUG:
         print_node_list(remaining_nodes, "NÚT CÒN LẠI SAU BƯỚC 3")
 
     # Bước 4: Xử lý các nút còn lại dựa trên giá trị thưởng
-    while remaining_nodes:
-        # Tính trọng tâm
-        total_x = sum(node.x * node.weight for node in remaining_nodes)
-        total_y = sum(node.y * node.weight for node in remaining_nodes)
-        total_weight = sum(node.weight for node in remaining_nodes)
-
-        if total_weight == 0:  # Tránh chia cho 0
-            center_x, center_y = 0, 0
-        else:
-            center_x = total_x / total_weight
-            center_y = total_y / total_weight
-
-        # Tính maxdc và maxw
-        max_dc = 0
-        max_w = max(node.weight for node in remaining_nodes) if remaining_nodes else 0
-
-        for node in remaining_nodes:
-            dc = math.sqrt((node.x - center_x) ** 2 + (node.y - center_y) ** 2)
-            node.distance_to_center = dc
-            if dc > max_dc:
-                max_dc = dc
-
-        # Tính giá trị thưởng (theo công thức chính xác)
-        best_node = None
-        best_award = -1
-
-        for node in remaining_nodes:
+    # Các nút chưa gán dạng mặt nạ trên mảng tọa độ / trọng số, cùng tập với access_index
+    weights = np.array([node.weight for node in all_nodes])
+    pool = RewardPool(all_nodes, weights, active=access_index.alive)
+    with instrument.phase("reward_rounds"):
+        while len(pool):
+            instrument.count("reward_rounds")
+            # Tính trọng tâm (các tổng được trừ dần khi nút được gán)
+            center = pool.center()
+            center_x, center_y = (0, 0) if center is None else center  # Tránh chia cho 0
+
+            # Tính maxdc (node xa nhất là một đỉnh bao lồi) và maxw
+            unassigned = pool.indices()
+            dc = pool.distances(unassigned, center_x, center_y)
+            w = weights[unassigned]
+            max_dc = max(0, pool.farthest(center_x, center_y)[1])
+            max_w = w.max()
+
+            # Tính giá trị thưởng (theo công thức chính xác), cả mảng cùng lúc
             # Công thức: GTT(i) = [1/(maxdc)]*(maxdc - dci) + [1/(maxw)]*wi
-            term1 = (max_dc - node.distance_to_center) / max_dc if max_dc > 0 else 0
-            term2 = node.weight / max_w if max_w > 0 else 0
+            term1 = (max_dc - dc) / max_dc if max_dc > 0 else 0
+            term2 = w / max_w if max_w > 0 else 0
             award = term1 + term2
 
-            node.award_point = award
-
-            if award > best_award:
-                best_award = award
-                best_node = node
+            k = int(np.argmax(award))
+            best_node = all_nodes[unassigned[k]]
+            best_award = float(np.broadcast_to(award, dc.shape)[k])
+            best_node.distance_to_center = float(dc[k])
+            best_node.award_point = best_award
 
-        if best_node:
             best_node.is_backbone = True
             new_group = [best_node]
-            remaining_nodes.remove(best_node)
+            access_index.remove(index_of[best_node.id])
 
             # Tìm access nodes cho backbone mới
-            access_nodes = []
-            for node in list(remaining_nodes):
-                distance = math.sqrt((node.x - best_node.x) ** 2 +
-                                     (node.y - best_node.y) ** 2)
-                if distance <= radius:
-                    access_nodes.append(node)
-                    remaining_nodes.remove(node)
+            with instrument.phase("radius_assignment"):
+                in_range, _ = access_index.query_radius(best_node.x, best_node.y, radius)
+                access_index.remove(in_range)
+                access_nodes = [all_nodes[k] for k in in_range.tolist()]
 
             new_group.extend(access_nodes)
             mentor_groups.append(new_group)
 
+            pool.sync(access_index.alive)
+
             if DEBUG:
                 print(f"\nTạo backbone mới: Node {best_node.id}")
                 print(f"  Giá trị thưởng: {best_award:.4f}")
                 print(f"  Số access nodes: {len(access_nodes)}")
 
+    instrument.count("backbones", len(mentor_groups))
+
     # Kết quả cuối cùng
     if DEBUG:
         print_mentor_groups(mentor_groups)
@@ -206,9 +176,6 @@ def mentor_algorithm():
     # Xuất kết quả ra file
     save_results(mentor_groups)
 
-    # Visualize kết quả
-    visualize_mentor(mentor_groups, MAX_COORD)
-
     # Chuẩn bị dữ liệu cho các bước tiếp theo
     mentor_groups_json = prepare_for_esau_williams(mentor_groups)
     with open("mentor_groups.json", "w", encoding="utf-8") as f:
@@ -217,7 +184,12 @@ def mentor_algorithm():
     return mentor_groups
 
 
-def initialize_network():
+def initialize_network(seed=None):
+    seed = SEED if seed is None else seed
+    if seed is not None:
+        # Sinh vector hóa theo seed (mạng lớn được cache trên đĩa)
+        table = load_instance(seed, NUM_NODES, MAX_COORD)
+        return table.to_objects(lambda v: Node(v.id, v.x, v.y, v.weight))
     nodes = []
     special_weights = {
         3: 30, 12: 30, 69: 30, 29: 30,
@@ -293,6 +265,7 @@ if __name__ == "__main__":
     print("=" * 50)
 
     results = mentor_algorithm()
+    visualize_mentor(results, MAX_COORD)
 
     print("\n" + "=" * 50)
     print("KẾT THÚC THUẬT TOÁN")
@@ -1,6 +1,12 @@
 import random
 import math
-import matplotlib.pyplot as plt
+import numpy as np
+import render
+import instrument
+from distance_engine import diameter, to_coords
+from spatial_index import GridIndex, assign_balanced
+from reward import RewardPool
+from instance_gen import load_instance
 
 # ==================== Cài đặt mặc định ====================
 W_THRESHOLD = 2
@@ -8,9 +14,13 @@ RADIUS_RATIO = 0.3
 C = 14
 NUM_NODES = 100
 MAX_COORD = 1000
+SEED = None  # Đặt số nguyên để sinh mạng tái lập được (instance_gen)
 OUTPUT_FILE = "mentor_output.txt"
 DEBUG = False  # Thêm biến DEBUG để điều khiển in ấn gỡ lỗi
 LIMIT_ACCESS_NODES = 0 # Thêm giới hạn cho số lượng access nodes
+# Khi có giới hạn: các backbone do ngưỡng lưu lượng nhận node cùng một lượt, mỗi node về backbone
+# gần nhất còn chỗ (thay vì backbone đứng trước lấy hết các node gần nó)
+BALANCED_ASSIGN = False
 
 # ==================== Lớp Node ====================
 class Node:
@@ -49,26 +59,8 @@ def printList2D(list_of_lists):
             print(node.get_id(), end=' ')
         print()
 
-def matplot_mentor(mentor_list, max_coord):
-    plt.figure(figsize=(10, 10))
-    for group in mentor_list:
-        if group:
-            backbone = group[0]
-            plt.scatter(backbone.x, backbone.y, color='red', s=100, label='Backbone' if group == mentor_list[0] else "")
-            plt.text(backbone.x, backbone.y, str(backbone.id), fontsize=9)
-            for i in range(1, len(group)):
-                terminal_node = group[i]
-                plt.scatter(terminal_node.x, terminal_node.y, color='blue', s=50, label='Access Node' if group == mentor_list[0] and i == 1 else "")
-                plt.plot([backbone.x, terminal_node.x], [backbone.y, terminal_node.y], 'gray', linestyle='--')
-                plt.text(terminal_node.x, terminal_node.y, str(terminal_node.id), fontsize=8)
-    plt.xlim(0, max_coord)
-    plt.ylim(0, max_coord)
-    plt.xlabel("X Coordinate")
-    plt.ylabel("Y Coordinate")
-    plt.title("MENTOR Algorithm Result")
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+def matplot_mentor(mentor_list, max_coord, out=None):
+    return render.matplot_mentor(mentor_list, max_coord, out)
 
 class CenterNode:
     def __init__(self):
@@ -90,14 +82,9 @@ def copyNode(source_node):
 def calculate_distance(n1, n2):
     return math.sqrt((n1.x - n2.x) ** 2 + (n1.y - n2.y) ** 2)
 
-def calculate_max_distance(nodes):
-    max_dist = 0
-    for i in range(len(nodes)):
-        for j in range(i + 1, len(nodes)):
-            dist = calculate_distance(nodes[i], nodes[j])
-            if dist > max_dist:
-                max_dist = dist
-    return max_dist
+def calculate_max_distance(nodes, metric="euclidean"):
+    # Đường kính mạng qua bao lồi + rotating calipers (O(N log N)) thay cho duyệt mọi cặp
+    return diameter(to_coords(nodes), metric)
 
 def calculate_award(node, center_x, center_y, max_dist, max_weight):
     dc = math.sqrt((node.x - center_x) ** 2 + (node.y - center_y) ** 2)
@@ -106,7 +93,12 @@ def calculate_award(node, center_x, center_y, max_dist, max_weight):
     return 0.5 * norm_dist + 0.5 * norm_weight
 
 # ==================== Khởi tạo mạng (sửa để có traffic) ====================
-def initialize_network():
+def initialize_network(seed=None):
+    seed = SEED if seed is None else seed
+    if seed is not None:
+        # Sinh vector hóa theo seed (mạng lớn được cache trên đĩa), traffic bằng weight
+        table = load_instance(seed, NUM_NODES, MAX_COORD)
+        return table.to_objects(lambda v: Node(v.id, v.x, v.y, v.weight, v.traffic))
     nodes = []
     special_weights = {
         3: 30, 12: 30, 69: 30, 29: 30,
@@ -125,8 +117,18 @@ def initialize_network():
     return nodes
 
 # ==================== Thuật toán MENTOR (đã sửa đổi và tích hợp vẽ + xuất file) ====================
+@instrument.traced("Y2.mentor_algorithm")
 def mentor_algorithm():
-    ListPosition = initialize_network()
+    network = initialize_network()
+    # Các node chưa gán: dict id -> node (giữ thứ tự ban đầu, xóa O(1)); id đã vào cây truy nhập nằm trong assigned
+    ListPosition = {node.get_id(): node for node in network}
+    assigned = set()
+    # Chỉ mục không gian dựng một lần trên toàn mạng, chỉ giữ các node chưa được gán
+    index_of = {node.get_id(): k for k, node in enumerate(network)}
+    access_index = GridIndex(to_coords(network))
+    # Tập node chưa gán cho vòng chọn theo thưởng (trọng tâm theo traffic), cùng tập với access_index
+    traffic = np.array([node.get_traffic() for node in network])
+    reward_pool = RewardPool(network, traffic)
     ListMentor = []
     w = W_THRESHOLD
     RadiusRatio = RADIUS_RATIO
@@ -146,10 +148,13 @@ def mentor_algorithm():
 
     ListBackboneType1 = []
 
-    for i in list(ListPosition): # Iterate over a copy to allow removal
-        if i.get_traffic() / C_param > w:
-            ListBackboneType1.append(i)
-            ListPosition.remove(i)
+    with instrument.phase("backbone_threshold"):
+        for i in network:
+            if i.get_traffic() / C_param > w:
+                ListBackboneType1.append(i)
+                del ListPosition[i.get_id()]
+                access_index.remove(index_of[i.get_id()])
+        reward_pool.sync(access_index.alive)
 
     if DeBug:
         print("2.1. List Backbone do lưu lượng chuẩn hóa lớn hơn ngưỡng")
@@ -159,13 +164,8 @@ def mentor_algorithm():
     # Tìm MaxCost
     if DeBug:
         print("Tìm MaxCost và R*MaxCost")
-    MaxCost = 0
-    for i in range(len(ListPosition)):
-        for j in range(i + 1, len(ListPosition)):
-            dc = math.sqrt((ListPosition[i].get_position_x() - ListPosition[j].get_position_x()) ** 2 + (
-                    ListPosition[i].get_position_y() - ListPosition[j].get_position_y()) ** 2)
-            if dc > MaxCost:
-                MaxCost = dc
+    with instrument.phase("max_cost"):
+        MaxCost = calculate_max_distance(ListPosition.values())
 
     RM = RadiusRatio * MaxCost
     if DeBug:
@@ -185,33 +185,32 @@ def mentor_algorithm():
         ListBackbone = []
         ListBackbone.append(_centerNode)
 
-        def check_non_exist(index,listbackbone,listmentor):
-            if DEBUG_UpdateTerminalNode:
-                for i in listbackbone:
-                    print(i.get_id(),end =' ')
-                print()
-                for i in listmentor:
-                    for j in i:
-                        print(j.get_id(), end=' ')
-                print()
-            for i in listbackbone:
-                if i.get_id() == index:
-                    if DEBUG_UpdateTerminalNode:
-                        print("in list backbone. no check any more")
-                    return False
-            for i in listmentor:
-                for j in i:
-                    if j.get_id() == index:
-                        if DEBUG_UpdateTerminalNode:
-                            print("in list mentor. no check any more")
-                        return False
+        center_id = _centerNode.get_id()
+
+        def check_non_exist(index):
+            # O(1): bỏ chính node backbone và các node đã thuộc một cây truy nhập (tập assigned)
+            if index == center_id:
+                if DEBUG_UpdateTerminalNode:
+                    print("in list backbone. no check any more")
+                return False
+            if index in assigned:
+                if DEBUG_UpdateTerminalNode:
+                    print("in list mentor. no check any more")
+                return False
             return True
 
-        for i in list(_ListPosition): # Iterate over a copy
-            i.set_distance(_centerNode)
+        # Chỉ duyệt các node chưa gán nằm trong bán kính RM (theo thứ tự ban đầu của mạng); khi có
+        # giới hạn chỉ lấy Limit + 1 node gần nhất (có thể gồm chính backbone) thay vì cả hình tròn
+        if Limit > 0:
+            in_range, dist_in_range = access_index.query_knn(_centerNode.x, _centerNode.y, Limit + 1, max_dist=RM)
+        else:
+            in_range, dist_in_range = access_index.query_radius(_centerNode.x, _centerNode.y, RM)
+        for k, dist in zip(in_range.tolist(), dist_in_range.tolist()):
+            i = network[k]
+            i.distance_to_center = dist
             if DEBUG_UpdateTerminalNode:
                 print("Check Distance Node", i.get_id(), " : ", i.get_distance())
-            if check_non_exist(i.get_id(),ListBackbone,_ListMentor):
+            if check_non_exist(i.get_id()):
                 if i.get_distance() <= RM:
                     if DEBUG_UpdateTerminalNode:
                         print("Node", i.get_id(), "is terminal node of Node center", _centerNode.get_id())
@@ -237,25 +236,44 @@ def mentor_algorithm():
                 print()
 
         _ListMentor.append(ListBackbone)
+        access_index.remove([index_of[i.get_id()] for i in ListBackbone])
+        reward_pool.sync(access_index.alive)
 
-        for i in list(ListBackbone): # Iterate over a copy
-            for j in list(_ListPosition): # Iterate over a copy
-                if i.get_id() == j.get_id() and j in _ListPosition:
-                    _ListPosition.remove(j)
+        for i in ListBackbone:
+            assigned.add(i.get_id())
+            _ListPosition.pop(i.get_id(), None)
 
         if DEBUG_UpdateTerminalNode:
             print("Exit Update Terminal Node Function! ")
 
-
-    for i in ListBackboneType1:
-        updateTerminalNode(ListPosition, ListMentor, i)
+    def updateTerminalNodeBalanced(_ListPosition, _ListMentor, _centerNodes):
+        # Mỗi node trong bán kính RM về backbone gần nhất còn chưa đủ Limit node (hàng đợi ưu tiên)
+        found = assign_balanced(access_index, to_coords(_centerNodes), Limit, RM)
+        for centerNode, (members, dist) in zip(_centerNodes, found):
+            ListBackbone = [centerNode]
+            for k, d in zip(members.tolist(), dist.tolist()):
+                network[k].distance_to_center = d
+                ListBackbone.append(network[k])
+            _ListMentor.append(ListBackbone)
+            for i in ListBackbone:
+                assigned.add(i.get_id())
+                _ListPosition.pop(i.get_id(), None)
+        reward_pool.sync(access_index.alive)
+
+
+    with instrument.phase("radius_assignment"):
+        if BALANCED_ASSIGN and Limit > 0:
+            updateTerminalNodeBalanced(ListPosition, ListMentor, ListBackboneType1)
+        else:
+            for i in ListBackboneType1:
+                updateTerminalNode(ListPosition, ListMentor, i)
 
     del ListBackboneType1
     if DeBug:
         print("-----------Danh sách các nút Backbone và cây truy nhập đi kèm sau khi tìm Backbone dựa trên ngưỡng lưu lượng -----------")
         printList2D(ListMentor)
         print("-----------Dach sách các nút còn lại chưa được phân cây truy nhập-----------")
-        printMentorList(ListPosition)
+        printMentorList(ListPosition.values())
 
 
     '''
@@ -270,66 +288,49 @@ def mentor_algorithm():
         print()
     center = CenterNode()
     iloop = 1
-    while len(ListPosition) > 0:
-        if DeBug:
-            print("Vòng lặp tìm giá trị thưởng lần", iloop)
-        iloop = iloop + 1
-        # Tìm trung tâm trọng lực
-        sumx = 0
-        sumy = 0
-        sumw = 0
-        xtt = 0
-        ytt = 0
-        maxw = 1
-        maxdc = 1
-        maxaward = 0
-        indexBB = 0
-
-        for i in ListPosition:
-            sumx = sumx + (i.get_position_x()) * i.get_traffic()
-            sumy = sumy + (i.get_position_y()) * i.get_traffic()
-            sumw = sumw + i.get_traffic()
-            if i.get_traffic() > maxw:
-                maxw = i.get_traffic()
-        xtt = sumx / sumw
-        ytt = sumy / sumw
-
-        center.set_position(xtt, ytt)
-
-        if DeBug:
-            center.printCenterPress()
-
-        for i in ListPosition:
-            i.set_distance(center)
-            if i.get_distance() > maxdc:
-                maxdc = i.get_distance()
-        if DeBug:
-            print("MaxDistance = {:<6} & Max Weight: {:<3}".format(round(maxdc,2), maxw))
-        for i in ListPosition:
-            i.set_award((0.5 * (maxdc - i.get_distance() / maxdc)) + (0.5 * i.get_traffic() / maxw))
-            if i.get_award() > maxaward:
-                maxaward = i.get_award()
-
-        best_node_to_become_bb = None
-        for i in ListPosition:
-            if i.get_award() >= maxaward:
-                best_node_to_become_bb = copyNode(i)
-                if DeBug:
-                    print("Nút Thưởng được chọn làm backbone: {:<3}".format(best_node_to_become_bb.get_id()))
-                ListPosition.remove(i)
-                if DeBug:
-                    print("--- Danh sách các nút còn lại sau khi bỏ nút backbone ---")
-                    printMentorList(ListPosition)
-                if DeBug:
-                    print("---------------------")
-                    print("Cập nhật cây truy nhập cho nút backbone mới")
+    with instrument.phase("reward_rounds"):
+        while len(ListPosition) > 0:
+            if DeBug:
+                print("Vòng lặp tìm giá trị thưởng lần", iloop)
+            iloop = iloop + 1
+            instrument.count("reward_rounds")
+            # Tìm trung tâm trọng lực (tổng Σtraffic·x, Σtraffic·y, Σtraffic được reward_pool trừ dần)
+            unassigned = reward_pool.indices()
+            xtt, ytt = reward_pool.center()
+
+            center.set_position(xtt, ytt)
+
+            if DeBug:
+                center.printCenterPress()
+
+            # maxdc lấy từ bao lồi các nút còn lại; maxw (tối thiểu 1) và giá trị thưởng tính trên cả mảng
+            dc = reward_pool.distances(unassigned, xtt, ytt)
+            tr = traffic[unassigned]
+            maxw = max(1, tr.max())
+            maxdc = max(1, reward_pool.farthest(xtt, ytt)[1])
+            if DeBug:
+                print("MaxDistance = {:<6} & Max Weight: {:<3}".format(round(maxdc,2), maxw))
+            award = (0.5 * (maxdc - dc / maxdc)) + (0.5 * tr / maxw)
+            best = int(unassigned[np.argmax(award)])
+
+            i = network[best]
+            best_node_to_become_bb = copyNode(i)
+            if DeBug:
+                print("Nút Thưởng được chọn làm backbone: {:<3}".format(best_node_to_become_bb.get_id()))
+            del ListPosition[i.get_id()]
+            if DeBug:
+                print("--- Danh sách các nút còn lại sau khi bỏ nút backbone ---")
+                printMentorList(ListPosition.values())
+            if DeBug:
+                print("---------------------")
+                print("Cập nhật cây truy nhập cho nút backbone mới")
+            with instrument.phase("radius_assignment"):
                 updateTerminalNode(ListPosition, ListMentor, best_node_to_become_bb)
-                if DeBug:
-                    print("---------------------")
-                    print("--- Danh sách các nút còn lại sau khi cập nhật cây truy nhập cho nút backbone mới ---")
-                    printMentorList(ListPosition)
-                    print("---------------------")
-                break
+            if DeBug:
+                print("---------------------")
+                print("--- Danh sách các nút còn lại sau khi cập nhật cây truy nhập cho nút backbone mới ---")
+                printMentorList(ListPosition.values())
+                print("---------------------")
 
     '''
 
@@ -337,12 +338,11 @@ def mentor_algorithm():
 
     '''
 
+    instrument.count("backbones", len(ListMentor))
     if DeBug:
         print("-------Kết quả thuật toán Mentor-------")
         printList2D(ListMentor)
 
-    matplot_mentor(ListMentor,MAX)
-
     # Ghi kết quả ra file
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         f.write("Kết quả thuật toán MENTOR:\n")
@@ -395,6 +395,7 @@ if __name__ == "__main__":
     mentor_result, mentor_groups = mentor_algorithm()
     print("\nKết quả thuật toán Mentor (danh sách các cây truy nhập):")
     printList2D(mentor_result)
+    matplot_mentor(mentor_result, MAX_COORD)
 
     # Ghi mentor_groups ra file JSON sau khi thuật toán Mentor hoàn thành
     import json
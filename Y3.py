@@ -1,7 +1,10 @@
 import json
 import math
-import matplotlib.pyplot as plt
-import networkx as nx  # Thêm thư viện networkx để vẽ đồ thị
+import numpy as np
+import render
+import instrument
+from distance_engine import DistanceEngine
+from spatial_index import NeighborSearch
 
 
 class Cluster:
@@ -24,7 +27,13 @@ def euclidean_distance(n1, n2):
     return math.sqrt((n1['x'] - n2['x']) ** 2 + (n1['y'] - n2['y']) ** 2)
 
 
-def build_access_tree(backbone, access_nodes, W):
+@instrument.traced("Y3.build_access_tree")
+def build_access_tree(backbone, access_nodes, W, candidate_k=None, stats=None):
+    """
+    candidate_k: nếu đặt, tradeoff chỉ xét k láng giềng gần nhất của node, rồi mới quét các node
+    gần node hơn hub khi cần (xem NeighborSearch) - kết quả trùng với quét mọi active node.
+    stats: dict (tùy chọn) nhận chế độ tìm ứng viên, số lần dùng mỗi nhánh, số lần gộp và số lần tính tradeoff.
+    """
     nodes = {node['id']: node for node in [backbone] + access_nodes}
     hub_id = backbone['id']
 
@@ -35,7 +44,22 @@ def build_access_tree(backbone, access_nodes, W):
     clusters = {nid: Cluster(nodes[nid]) for nid in nodes if nid != hub_id}
     parent = {nid: hub_id for nid in clusters}  # ban đầu nối trực tiếp hub
     active_nodes = set(clusters.keys())
-    cost_i_hub = {nid: euclidean_distance(nodes[nid], backbone) for nid in clusters}
+
+    # Khoảng cách lấy từ DistanceEngine: vị trí k trong engine <-> id order[k]
+    order = list(nodes)
+    pos = {nid: k for k, nid in enumerate(order)}
+    engine = DistanceEngine.from_nodes([nodes[nid] for nid in order])
+    hub_row = engine.row(pos[hub_id])
+    cost_i_hub = {nid: float(hub_row[pos[nid]]) for nid in clusters}
+
+    # Root và trọng số cụm theo vị trí, dùng cho tính tradeoff vector hóa
+    root_of = np.arange(len(order))
+    cluster_weight = np.zeros(len(order))
+    for nid, cluster in clusters.items():
+        cluster_weight[pos[nid]] = cluster.weight
+    is_active = np.zeros(len(order), dtype=bool)
+    is_active[[pos[nid] for nid in active_nodes]] = True
+    search = NeighborSearch(engine.coords, candidate_k) if candidate_k else None
 
     def find_cluster_root(nid):
         return nodes[nid]['cluster_root']
@@ -55,78 +79,100 @@ def build_access_tree(backbone, access_nodes, W):
         # Cập nhật root cho tất cả các node trong cluster cũ
         for node_id in clusters[root_j].nodes:
             nodes[node_id]['cluster_root'] = root_j
+            root_of[pos[node_id]] = pos[root_j]
+        cluster_weight[pos[root_j]] = clusters[root_j].weight
 
         return True
 
-    def compute_tradeoff(i, active_nodes):
-        best_tradeoff = -math.inf
-        best_j = None
-        root_i = find_cluster_root(i)
+    def first_active(ties):
+        # Node đứng trước theo thứ tự duyệt active_nodes (như argmax của cách quét đầy đủ)
+        ties = set(ties.tolist())
+        return next(pos[j] for j in active_nodes if pos[j] in ties)
 
-        for j in active_nodes:
-            if j == i:
-                continue
+    recomputes = 0
 
-            root_j = find_cluster_root(j)
-            if root_i == root_j:
-                continue
+    def compute_tradeoff(i, active_nodes):
+        nonlocal recomputes
+        recomputes += 1
+        if search is not None:
+            pi = pos[i]
+            ri = root_of[pi]
+
+            def feasible(cand):
+                rj = root_of[cand]
+                return (is_active[cand] & (cand != pi) & (rj != ri)
+                        & (cluster_weight[ri] + cluster_weight[rj] <= W))
+
+            val, k = search.best(pi, cost_i_hub[i], feasible, first_active)
+            return (val, None if k is None else order[k])
+
+        # Duyệt active_nodes theo đúng thứ tự của set để giữ nguyên cách chọn khi hòa
+        act = np.fromiter((pos[j] for j in active_nodes), dtype=np.intp, count=len(active_nodes))
+        if len(act) == 0:
+            return None, None
+        pi = pos[i]
+        ri = root_of[pi]
+        rj = root_of[act]
+
+        tradeoff_val = cost_i_hub[i] - engine.row(pi)[act]
+        new_weight = cluster_weight[ri] + cluster_weight[rj]
+        ok = (act != pi) & (rj != ri) & (tradeoff_val > 0) & (new_weight <= W)
+        if not ok.any():
+            return None, None
 
-            dist_i_j = euclidean_distance(nodes[i], nodes[j])
-            tradeoff_val = cost_i_hub[i] - dist_i_j
+        k = int(np.argmax(np.where(ok, tradeoff_val, -math.inf)))
+        return float(tradeoff_val[k]), order[act[k]]
 
-            if tradeoff_val > 0:
-                new_weight = clusters[root_i].weight + clusters[root_j].weight
-                if new_weight <= W and tradeoff_val > best_tradeoff:
-                    best_tradeoff = tradeoff_val
-                    best_j = j
+    with instrument.phase("tradeoff_init"):
+        tradeoffs = {nid: compute_tradeoff(nid, active_nodes) for nid in active_nodes}
+    edges = []
 
-        if best_j is None:
-            return None, None
-        return best_tradeoff, best_j
+    with instrument.phase("merge_loop"):
+        while True:
+            candidates = []
+            for nid in active_nodes:
+                if tradeoffs[nid][0] is not None:
+                    candidates.append((tradeoffs[nid][0], nid, tradeoffs[nid][1]))
 
-    tradeoffs = {nid: compute_tradeoff(nid, active_nodes) for nid in active_nodes}
-    edges = []
+            if not candidates:
+                break
 
-    while True:
-        candidates = []
-        for nid in active_nodes:
-            if tradeoffs[nid][0] is not None:
-                candidates.append((tradeoffs[nid][0], nid, tradeoffs[nid][1]))
+            max_tradeoff, i, j = max(candidates, key=lambda x: x[0])
 
-        if not candidates:
-            break
+            if max_tradeoff <= 0:
+                break
 
-        max_tradeoff, i, j = max(candidates, key=lambda x: x[0])
+            root_i = find_cluster_root(i)
+            root_j = find_cluster_root(j)
 
-        if max_tradeoff <= 0:
-            break
+            if root_i == root_j:
+                tradeoffs[i] = (None, None)
+                continue
 
-        root_i = find_cluster_root(i)
-        root_j = find_cluster_root(j)
+            new_weight = clusters[root_i].weight + clusters[root_j].weight
+            if new_weight > W:
+                tradeoffs[i] = (None, None)
+                continue
 
-        if root_i == root_j:
-            tradeoffs[i] = (None, None)
-            continue
+            # Thực hiện gộp cluster
+            if not union_clusters(i, j):
+                tradeoffs[i] = (None, None)
+                continue
 
-        new_weight = clusters[root_i].weight + clusters[root_j].weight
-        if new_weight > W:
-            tradeoffs[i] = (None, None)
-            continue
+            # Cập nhật parent
+            parent[i] = j
+            dist = engine.dist(pos[i], pos[j])
+            edges.append((i, j, dist))
 
-        # Thực hiện gộp cluster
-        if not union_clusters(i, j):
+            # Cập nhật active nodes và tradeoffs
+            active_nodes.remove(i)
+            is_active[pos[i]] = False
             tradeoffs[i] = (None, None)
-            continue
+            tradeoffs[j] = compute_tradeoff(j, active_nodes)
 
-        # Cập nhật parent
-        parent[i] = j
-        dist = euclidean_distance(nodes[i], nodes[j])
-        edges.append((i, j, dist))
-
-        # Cập nhật active nodes và tradeoffs
-        active_nodes.remove(i)
-        tradeoffs[i] = (None, None)
-        tradeoffs[j] = compute_tradeoff(j, active_nodes)
+    merges = len(edges)
+    instrument.count("merges", merges)
+    instrument.count("tradeoff_recomputes", recomputes)
 
     # Kết nối các cluster còn lại trực tiếp vào backbone
     for root_id, cluster in clusters.items():
@@ -135,53 +181,31 @@ def build_access_tree(backbone, access_nodes, W):
             edges.append((root_id, hub_id, dist))
             parent[root_id] = hub_id
 
+    if stats is not None:
+        stats["mode"] = f"knn (k={candidate_k})" if search is not None else "exact"
+        stats["exact"] = True  # Chế độ k-NN luôn cho cùng kết quả với quét đầy đủ
+        stats["merges"] = merges
+        stats["recomputes"] = recomputes
+        if search is not None:
+            stats.update(search.stats)
+
     total_cost = sum(e[2] for e in edges)
     return total_cost, edges, parent, nodes
 
 
-def plot_tree(edges, nodes, hub_id):
-    G = nx.DiGraph()
-    pos = {nid: (node['x'], node['y']) for nid, node in nodes.items()}
+def plot_tree(edges, nodes, hub_id, out=None):
+    return render.plot_tree(edges, nodes, hub_id, out)
 
-    # Thêm node vào đồ thị với thuộc tính màu
-    for nid, node in nodes.items():
-        G.add_node(nid)
 
-    # Thêm các cạnh vào đồ thị
-    for src, dst, cost in edges:
-        G.add_edge(src, dst, weight=round(cost, 2))
 
-    plt.figure(figsize=(10, 8))
-    ax = plt.gca()
-    ax.set_title("Cây truy nhập Esau-Williams", fontsize=14, fontweight='bold')
-    ax.set_xlabel("X")
-    ax.set_ylabel("Y")
-    ax.grid(True, linestyle='--', alpha=0.5)
-
-    # Màu và kích cỡ node
-    node_colors = ['red' if nid == hub_id else 'skyblue' for nid in G.nodes()]
-    node_sizes = [200 if nid == hub_id else 200 for nid in G.nodes()]
-    node_border_colors = ['black' if nid == hub_id else 'gray' for nid in G.nodes()]
-
-    # Vẽ nodes
-    nx.draw_networkx_nodes(G, pos, node_size=node_sizes, node_color=node_colors, edgecolors=node_border_colors, linewidths=1.5)
-    nx.draw_networkx_labels(G, pos, font_size=9, font_weight='bold')
-
-    # Vẽ edges
-    nx.draw_networkx_edges(G, pos, edge_color='gray', arrows=False, width=2, alpha=0.7)
-
-    # Vẽ trọng số cạnh
-    edge_labels = nx.get_edge_attributes(G, 'weight')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8)
-
-    plt.tight_layout()
-    plt.show()
-
-
-
-def run_esau_williams(filename, W=15):
+def run_esau_williams(filename, W=15, candidate_k=None, plot=True, out_dir=None):
+    """
+    plot: hiện cây của từng nhóm (False để chạy không vẽ, không nạp matplotlib)
+    out_dir: nếu đặt, ghi hình từng nhóm ra file trong thư mục này ở luồng nền thay vì hiện cửa sổ
+    """
     with open(filename, "r", encoding="utf-8") as f:
         mentor_groups = json.load(f)
+    writer = render.FigureWriter(out_dir) if out_dir else None
 
     for i, group in enumerate(mentor_groups, 1):
         backbone = group['backbone']
@@ -191,7 +215,8 @@ def run_esau_williams(filename, W=15):
             print(f"Nhóm {i}: Không có access nodes, bỏ qua.")
             continue
 
-        total_cost, edges, parent, nodes = build_access_tree(backbone, access_nodes, W)
+        stats = {}
+        total_cost, edges, parent, nodes = build_access_tree(backbone, access_nodes, W, candidate_k, stats)
 
         # Sắp xếp edges để in ra theo thứ tự dễ đọc
         sorted_edges = sorted(edges, key=lambda e: (e[1], e[0]))
@@ -199,9 +224,19 @@ def run_esau_williams(filename, W=15):
         print(f"\nNhóm {i}: Backbone={backbone['id']}, Tổng chi phí = {round(total_cost, 2)}")
         for e in sorted_edges:
             print(f"    {e[1]} -> {e[0]} (Chi phí={round(e[2], 2)})")
+        if candidate_k:
+            print(f"    Tìm ứng viên: {stats['mode']}, khớp quét đầy đủ; "
+                  f"k-NN={stats['knn']}, quét hình tròn={stats['disc']}, hòa={stats['ties']}")
+
+        if writer is not None:
+            writer.submit(render.plot_tree, edges, nodes, backbone['id'], filename=f"esau_group_{i}.png")
+        elif plot:
+            plot_tree(edges, nodes, backbone['id'])
 
-        plot_tree(edges, nodes, backbone['id'])
+    if writer is not None:
+        writer.close()
 
 
 # Ví dụ chạy:
-run_esau_williams("mentor_groups.json", W=15)
\ No newline at end of file
+if __name__ == "__main__":
+    run_esau_williams("mentor_groups.json", W=15)
\ No newline at end of file
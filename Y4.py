@@ -1,7 +1,11 @@
 import json
 import math
-import matplotlib.pyplot as plt
-import networkx as nx
+import heapq
+import numpy as np
+import render
+import instrument
+from distance_engine import DistanceEngine
+from spatial_index import NeighborSearch
 
 
 # --- Định nghĩa Cluster để lưu thông tin mỗi “cụm” (cluster) --- #
@@ -37,12 +41,20 @@ def euclidean_distance(n1, n2):
 
 
 # --- Xây dựng “cây truy nhập” với thuật toán Esau-Williams + giới hạn hop --- #
-def build_access_tree(backbone, access_nodes, W, max_hop=4):
+@instrument.traced("Y4.build_access_tree")
+def build_access_tree(backbone, access_nodes, W, max_hop=4, candidate_k=None, stats=None, legacy_scan=False,
+                      verify_hops=False):
     """
     backbone: dict {id, x, y, weight}
     access_nodes: list of dicts mỗi dict {id, x, y, weight}
     W: ngưỡng tổng trọng số (max total weight khi gộp)
     max_hop: giới hạn hop count tối đa so với backbone
+    candidate_k: nếu đặt, tradeoff chỉ xét k láng giềng gần nhất rồi mới quét các node gần hơn hub
+                 khi cần (xem NeighborSearch) - kết quả trùng với quét mọi active root
+    stats: dict (tùy chọn) nhận chế độ tìm ứng viên, số lần dùng mỗi nhánh, số vòng lặp chính,
+           số lần gộp và số lần tính tradeoff
+    legacy_scan: dùng vòng lặp cũ (quét lại mọi tradeoff mỗi vòng, bỏ tradeoff cũ thay vì tính lại)
+    verify_hops: kiểm tra hop_count theo dõi trong lúc gộp với BFS trên cây kết quả (cần networkx)
 
     Trả về:
     - total_cost: tổng chi phí (sum of Euclidean edges)
@@ -62,6 +74,16 @@ def build_access_tree(backbone, access_nodes, W, max_hop=4):
     for node in nodes.values():
         node['hop_count'] = 0 if node['id'] == hub_id else 1
 
+    # Khoảng cách lấy từ DistanceEngine: vị trí k trong engine <-> id order[k]
+    order = list(nodes)
+    pos = {nid: k for k, nid in enumerate(order)}
+    engine = DistanceEngine.from_nodes([nodes[nid] for nid in order])
+    hub_row = engine.row(pos[hub_id])
+    # hop_count, trọng số và max_hop của cụm theo vị trí (đồng bộ với nodes/clusters)
+    hop = np.array([nodes[nid]['hop_count'] for nid in order], dtype=np.int64)
+    cluster_weight = np.zeros(len(order))
+    cluster_max_hop = np.zeros(len(order), dtype=np.int64)
+
     # 3) Khởi tạo Union-Find (parent_uf) chỉ cho access_nodes
     parent_uf = {node['id']: node['id'] for node in access_nodes}
     def find_uf(x):
@@ -73,8 +95,14 @@ def build_access_tree(backbone, access_nodes, W, max_hop=4):
 
     # 4) Khởi tạo Cluster cho mỗi access node (ban đầu mỗi node là 1 cụm)
     clusters = {node['id']: Cluster(node) for node in access_nodes}
+    for nid, cluster in clusters.items():
+        cluster_weight[pos[nid]] = cluster.weight
+        cluster_max_hop[pos[nid]] = cluster.max_hop
     # active_roots: tập các IDs hiện đang là root của một cluster
     active_roots = set(clusters.keys())
+    is_active = np.zeros(len(order), dtype=bool)
+    is_active[[pos[nid] for nid in active_roots]] = True
+    search = NeighborSearch(engine.coords, candidate_k) if candidate_k else None
 
     # parent dict chỉ để in ra kết quả, mapping “mỗi root cũ” → nơi nó gộp vào
     parent = {nid: hub_id for nid in clusters}
@@ -94,10 +122,13 @@ def build_access_tree(backbone, access_nodes, W, max_hop=4):
         hop_j_before = nodes[j]['hop_count']
         hop_increment = (hop_j_before + 1) - hop_i_before
 
-        # b) Gộp cluster root_i vào root_j
+        # b) Gộp cluster root_i vào root_j: mọi node của cụm i (kể cả root_i) sâu thêm hop_increment,
+        #    nên hop_count luôn bằng độ sâu thật của node trên cây
+        for node_id in clusters[root_i].nodes:
+            hop[pos[node_id]] += hop_increment
         clusters[root_j].merge(clusters[root_i], hop_increment, nodes)
-        # c) Cập nhật hop_count cho chính root_i (sau khi merge)
-        nodes[root_i]['hop_count'] += hop_increment
+        cluster_weight[pos[root_j]] = clusters[root_j].weight
+        cluster_max_hop[pos[root_j]] = clusters[root_j].max_hop
 
         # d) Union-Find union
         parent_uf[root_i] = root_j
@@ -105,6 +136,7 @@ def build_access_tree(backbone, access_nodes, W, max_hop=4):
         # e) Xóa cụm root_i khỏi clusters (vì root_i giờ đã thuộc root_j)
         del clusters[root_i]
         active_roots.discard(root_i)
+        is_active[pos[root_i]] = False
 
         # f) Cập nhật parent map
         parent[root_i] = root_j
@@ -112,100 +144,154 @@ def build_access_tree(backbone, access_nodes, W, max_hop=4):
         return True
 
     # 6) Tính tradeoff cho một node i (i phải là “active root” hoặc bản thân i là một node chưa gộp)
+    recomputes = 0
+
     def compute_tradeoff(i):
+        nonlocal recomputes
+        recomputes += 1
         root_i = find_uf(i)
         # Nếu root_i không còn là key trong clusters (đã từng gộp)
         if root_i not in clusters:
             return (None, None)
 
-        best_t = -math.inf
-        best_j = None
         curr_max_hop_i = clusters[root_i].max_hop
         weight_i = clusters[root_i].weight
 
-        for j in list(active_roots):
-            if j == i:
-                continue
-            root_j = find_uf(j)
-            # Bỏ qua nếu root_j không còn tồn tại trong clusters hoặc bằng root_i
-            if root_j not in clusters or root_j == root_i:
-                continue
+        if search is not None:
+            pi, pr = pos[i], pos[root_i]
+
+            def feasible(cand):
+                overall = np.maximum(cluster_max_hop[cand], curr_max_hop_i + (hop[cand] + 1) - hop[pr])
+                return (is_active[cand] & (cand != pi) & (cand != pr)
+                        & (overall <= max_hop) & (weight_i + cluster_weight[cand] <= W))
+
+            def first_active(ties):
+                # Root đứng trước theo thứ tự duyệt active_roots (như argmax của cách quét đầy đủ)
+                ties = set(ties.tolist())
+                return next(pos[j] for j in active_roots if pos[j] in ties)
+
+            val, k = search.best(pi, hub_row[pi], feasible, first_active)
+            return (val, None if k is None else order[k])
+
+        # Các active root luôn là root của chính nó (find_uf(j) == j), nên ràng buộc
+        # được kiểm tra trên cả mảng; giữ thứ tự duyệt của set để chọn giống nhau khi hòa
+        act = np.fromiter((pos[j] for j in active_roots), dtype=np.intp, count=len(active_roots))
+        if len(act) == 0:
+            return (None, None)
+        pi = pos[i]
+
+        # i → hub minus i → j
+        tradeoff_val = hub_row[pi] - engine.row(pi)[act]
+
+        # Tính nếu gộp i vào j, hop mới cho cụm i là gì
+        hop_inc = (hop[act] + 1) - hop[pos[root_i]]
+        new_max_hop_i = curr_max_hop_i + hop_inc
+        overall_max_hop = np.maximum(cluster_max_hop[act], new_max_hop_i)
 
-            # i → hub minus i → j
-            dist_i_hub = euclidean_distance(nodes[i], nodes[hub_id])
-            dist_i_j = euclidean_distance(nodes[i], nodes[j])
-            tradeoff_val = dist_i_hub - dist_i_j
-            if tradeoff_val <= 0:
+        # Kiểm ràng buộc hop ≤ max_hop và tổng weight ≤ W
+        ok = ((act != pi) & (act != pos[root_i]) & (tradeoff_val > 0)
+              & (overall_max_hop <= max_hop) & (weight_i + cluster_weight[act] <= W))
+        if not ok.any():
+            return (None, None)
+
+        k = int(np.argmax(np.where(ok, tradeoff_val, -math.inf)))
+        return (float(tradeoff_val[k]), order[act[k]])
+
+    # 7) Khởi tạo tradeoffs cho mỗi active root
+    with instrument.phase("tradeoff_init"):
+        tradeoffs = {nid: compute_tradeoff(nid) for nid in active_roots}
+
+    iterations = 0
+
+    with instrument.phase("merge_loop"):
+        # 8) Vòng lặp chính: tìm cặp (i, j) có tradeoff lớn nhất để gộp
+        while legacy_scan:
+            iterations += 1
+            # a) Tập hợp các (tradeoff, i, j) hợp lệ
+            candidates = [
+                (tup[0], i, tup[1])
+                for i, tup in tradeoffs.items()
+                if tup[0] is not None and i in active_roots
+            ]
+            if not candidates:
+                break
+            # b) Lấy cặp có tradeoff lớn nhất
+            max_t, i, j = max(candidates, key=lambda x: x[0])
+            if max_t <= 0:
+                break
+
+            root_i = find_uf(i)
+            root_j = find_uf(j)
+            # Bỏ nếu cùng root hoặc không còn tồn tại
+            if root_i == root_j or root_i not in clusters or root_j not in clusters:
+                tradeoffs[i] = (None, None)
                 continue
 
-            # Tính nếu gộp i vào j, hop mới cho cụm i là gì
+            # Kiểm ràng buộc lần cuối trước khi gộp
             hop_i = nodes[root_i]['hop_count']
             hop_j = nodes[j]['hop_count']
             hop_inc = (hop_j + 1) - hop_i
-            new_max_hop_i = curr_max_hop_i + hop_inc
+            new_max_hop_i = clusters[root_i].max_hop + hop_inc
             curr_max_hop_j = clusters[root_j].max_hop
-            overall_max_hop = max(curr_max_hop_j, new_max_hop_i)
-
-            # Kiểm ràng buộc hop ≤ max_hop và tổng weight ≤ W
-            if overall_max_hop > max_hop:
+            if max(curr_max_hop_j, new_max_hop_i) > max_hop:
+                tradeoffs[i] = (None, None)
                 continue
-            if weight_i + clusters[root_j].weight > W:
+            if clusters[root_i].weight + clusters[root_j].weight > W:
+                tradeoffs[i] = (None, None)
                 continue
 
-            if tradeoff_val > best_t:
-                best_t = tradeoff_val
-                best_j = j
+            # Thực hiện nối i → j
+            dist = engine.dist(pos[i], pos[j])
+            edges.append((i, j, dist))
 
-        return (best_t, best_j) if best_j is not None else (None, None)
+            # Gộp cluster
+            union_clusters(i, j)
 
-    # 7) Khởi tạo tradeoffs cho mỗi active root
-    tradeoffs = {nid: compute_tradeoff(nid) for nid in active_roots}
-
-    # 8) Vòng lặp chính: tìm cặp (i, j) có tradeoff lớn nhất để gộp
-    while True:
-        # a) Tập hợp các (tradeoff, i, j) hợp lệ
-        candidates = [
-            (tup[0], i, tup[1])
-            for i, tup in tradeoffs.items()
-            if tup[0] is not None and i in active_roots
-        ]
-        if not candidates:
-            break
-        # b) Lấy cặp có tradeoff lớn nhất
-        max_t, i, j = max(candidates, key=lambda x: x[0])
-        if max_t <= 0:
-            break
-
-        root_i = find_uf(i)
-        root_j = find_uf(j)
-        # Bỏ nếu cùng root hoặc không còn tồn tại
-        if root_i == root_j or root_i not in clusters or root_j not in clusters:
+            # Cập nhật lại tradeoffs
             tradeoffs[i] = (None, None)
-            continue
-
-        # Kiểm ràng buộc lần cuối trước khi gộp
-        hop_i = nodes[root_i]['hop_count']
-        hop_j = nodes[j]['hop_count']
-        hop_inc = (hop_j + 1) - hop_i
-        new_max_hop_i = clusters[root_i].max_hop + hop_inc
-        curr_max_hop_j = clusters[root_j].max_hop
-        if max(curr_max_hop_j, new_max_hop_i) > max_hop:
-            tradeoffs[i] = (None, None)
-            continue
-        if clusters[root_i].weight + clusters[root_j].weight > W:
-            tradeoffs[i] = (None, None)
-            continue
-
-        # Thực hiện nối i → j
-        dist = euclidean_distance(nodes[i], nodes[j])
-        edges.append((i, j, dist))
-
-        # Gộp cluster
-        union_clusters(i, j)
-
-        # Cập nhật lại tradeoffs
-        tradeoffs[i] = (None, None)
-        tradeoffs[j] = compute_tradeoff(j)
+            tradeoffs[j] = compute_tradeoff(j)
+
+        # 8') Heap (-tradeoff, thứ tự, i, j, phiên bản cụm i, phiên bản cụm j). Phiên bản của một cụm
+        #     tăng khi cụm bị gộp đi hoặc nhận thêm cụm khác, nên mục có phiên bản cũ của j nghĩa là
+        #     đối tác tốt nhất của i đã thay đổi: chỉ tính lại tradeoff của i khi lấy mục đó ra.
+        #     Ràng buộc chỉ chặt thêm khi cụm lớn lên, nên giá trị tính lại không vượt giá trị cũ và
+        #     mục hợp lệ đầu heap luôn là tradeoff lớn nhất (hòa thì theo thứ tự duyệt như bản cũ).
+        if not legacy_scan:
+            rank = {nid: r for r, nid in enumerate(tradeoffs)}
+            version = dict.fromkeys(tradeoffs, 0)
+            heap = []
+
+            def push(i):
+                t, j = tradeoffs[i]
+                if t is not None:
+                    heapq.heappush(heap, (-t, rank[i], i, j, version[i], version[j]))
+
+            for nid in tradeoffs:
+                push(nid)
+
+            while heap:
+                iterations += 1
+                _, _, i, j, ver_i, ver_j = heapq.heappop(heap)
+                if ver_i != version[i]:
+                    continue  # i đã bị gộp hoặc đã có mục mới hơn
+                if ver_j != version[j]:
+                    tradeoffs[i] = compute_tradeoff(i)
+                    push(i)
+                    continue
+
+                dist = engine.dist(pos[i], pos[j])
+                edges.append((i, j, dist))
+                union_clusters(i, j)
+
+                version[i] += 1
+                version[j] += 1
+                tradeoffs[i] = (None, None)
+                tradeoffs[j] = compute_tradeoff(j)
+                push(j)
+
+    merges = len(edges)
+    instrument.count("merges", merges)
+    instrument.count("tradeoff_recomputes", recomputes)
 
     # 9) Cuối cùng, nối tất cả “root còn lại” (active_roots) về backbone
     connected_roots = set()
@@ -214,69 +300,62 @@ def build_access_tree(backbone, access_nodes, W, max_hop=4):
         if find_uf(root) != root:
             continue
         # Nối root → hub
-        dist_hub = euclidean_distance(nodes[root], nodes[hub_id])
+        dist_hub = float(hub_row[pos[root]])
         edges.append((root, hub_id, dist_hub))
         parent[root] = hub_id
         connected_roots.add(root)
 
-    # 10) Tính lại hop_count bằng BFS (đảm bảo chính xác)
-    G = nx.Graph()
-    for src, dst, _ in edges:
-        G.add_edge(src, dst)
-    if hub_id in G:
-        # Nếu hub có trong graph
-        hops = nx.single_source_shortest_path_length(G, hub_id)
-        for nid, h in hops.items():
-            if nid in nodes:
-                nodes[nid]['hop_count'] = h
-    else:
-        # Không có cạnh nào nối về hub
-        for nid in nodes:
-            nodes[nid]['hop_count'] = 0 if nid == hub_id else float('inf')
+    # 10) hop_count đã đúng sau các lần gộp (mọi root cuối cùng nối thẳng về hub với hop = 1);
+    #     chỉ tính lại bằng BFS để đối chiếu khi bật verify_hops
+    if verify_hops:
+        expected = bfs_hop_count(nodes, edges, hub_id)
+        wrong = {nid: (nodes[nid]['hop_count'], h) for nid, h in expected.items() if nodes[nid]['hop_count'] != h}
+        if wrong:
+            raise RuntimeError(f"hop_count lệch với BFS (node: (theo dõi, BFS)): {wrong}")
+
+    if stats is not None:
+        stats["mode"] = f"knn (k={candidate_k})" if search is not None else "exact"
+        stats["exact"] = True  # Chế độ k-NN luôn cho cùng kết quả với quét đầy đủ
+        stats["loop"] = "scan" if legacy_scan else "heap"
+        stats["iterations"] = iterations
+        stats["merges"] = merges
+        stats["recomputes"] = recomputes
+        if search is not None:
+            stats.update(search.stats)
 
     total_cost = sum(e[2] for e in edges)
     hop_count = {nid: nodes[nid]['hop_count'] for nid in nodes if nid != hub_id}
     return total_cost, edges, parent, nodes, hop_count
 
 
-# --- Hàm vẽ “cây truy nhập” sau khi tính toán --- #
-def draw_access_tree(nodes, edges, hop_count, hub_id, max_hop=4):
+# --- Tính hop_count bằng BFS trên cây kết quả (chỉ dùng để kiểm tra) --- #
+def bfs_hop_count(nodes, edges, hub_id):
+    import networkx as nx
+
     G = nx.Graph()
-    pos = {}
-    node_colors = []
-    labels = {}
-
-    for node_id, node in nodes.items():
-        G.add_node(node_id)
-        pos[node_id] = (node['x'], node['y'])
-        if node_id == hub_id:
-            node_colors.append('red')
-            labels[node_id] = f"Hub {node_id}"
-        else:
-            hop = hop_count.get(node_id, '?')
-            labels[node_id] = f"{node_id} (h={hop})"
-            node_colors.append('lightgreen' if hop <= max_hop else 'salmon')
-
-    for src, dst, cost in edges:
-        G.add_edge(src, dst, weight=round(cost, 2))
-
-    plt.figure(figsize=(8, 6))
-    nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=500)
-    nx.draw_networkx_labels(G, pos, labels=labels, font_size=9)
-    nx.draw_networkx_edges(G, pos, width=1.5, alpha=0.7, edge_color='gray')
-    edge_labels = nx.get_edge_attributes(G, 'weight')
-    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8)
-
-    plt.title(f"Cây truy nhập (giới hạn hop = {max_hop})")
-    plt.xlabel("X"); plt.ylabel("Y")
-    plt.axis('equal'); plt.grid(True)
-    plt.show()
+    for src, dst, _ in edges:
+        G.add_edge(src, dst)
+    if hub_id not in G:
+        # Không có cạnh nào nối về hub
+        return {nid: 0 if nid == hub_id else float('inf') for nid in nodes}
+    hops = nx.single_source_shortest_path_length(G, hub_id)
+    return {nid: h for nid, h in hops.items() if nid in nodes}
+
+
+# --- Hàm vẽ “cây truy nhập” sau khi tính toán --- #
+def draw_access_tree(nodes, edges, hop_count, hub_id, max_hop=4, out=None):
+    return render.draw_access_tree(nodes, edges, hop_count, hub_id, max_hop, out)
 
 
 # --- Hàm chính: đọc file JSON, duyệt qua từng group, in kết quả và vẽ đồ thị --- #
-def run_esau_williams_with_hop_limit(filename, W=15, max_hop=4):
+def run_esau_williams_with_hop_limit(filename, W=15, max_hop=4, candidate_k=None, plot=True, out_dir=None):
+    """
+    plot: hiện cây của từng nhóm (False để chạy không vẽ, không nạp matplotlib/networkx)
+    out_dir: nếu đặt, ghi hình từng nhóm ra file trong thư mục này ở luồng nền thay vì hiện cửa sổ
+    """
     with open(filename, "r", encoding="utf-8") as f:
         mentor_groups = json.load(f)
+    writer = render.FigureWriter(out_dir) if out_dir else None
 
     for i, group in enumerate(mentor_groups, 1):
         backbone = group['backbone']
@@ -288,8 +367,9 @@ def run_esau_williams_with_hop_limit(filename, W=15, max_hop=4):
 
         print(f"\n--- Xử lý Nhóm {i}: Backbone={backbone['id']}, Số access nodes={len(access_nodes)} ---")
         try:
+            stats = {}
             total_cost, edges, parent, nodes, hop_count = build_access_tree(
-                backbone, access_nodes, W, max_hop
+                backbone, access_nodes, W, max_hop, candidate_k, stats
             )
 
             # In kết quả
@@ -297,6 +377,10 @@ def run_esau_williams_with_hop_limit(filename, W=15, max_hop=4):
             for src, dst, cost in sorted(edges, key=lambda e: (e[1], e[0])):
                 print(f"    {src} -> {dst}  (Chi phí={round(cost, 2)}, Hop={nodes[src]['hop_count']})")
 
+            if candidate_k:
+                print(f"  Tìm ứng viên: {stats['mode']}, khớp quét đầy đủ; "
+                      f"k-NN={stats['knn']}, quét hình tròn={stats['disc']}, hòa={stats['ties']}")
+
             # Kiểm tra có node nào vi phạm hop không
             violations = [nid for nid, h in hop_count.items() if h > max_hop]
             if violations:
@@ -311,7 +395,11 @@ def run_esau_williams_with_hop_limit(filename, W=15, max_hop=4):
                 print(f"  CẢNH BÁO: Các node sau chưa được kết nối: {disconnected}")
 
             # Vẽ đồ thị
-            draw_access_tree(nodes, edges, hop_count, backbone['id'], max_hop)
+            if writer is not None:
+                writer.submit(render.draw_access_tree, nodes, edges, hop_count, backbone['id'], max_hop,
+                              filename=f"esau_hop_group_{i}.png")
+            elif plot:
+                draw_access_tree(nodes, edges, hop_count, backbone['id'], max_hop)
 
         except Exception as e:
             import traceback
@@ -319,6 +407,9 @@ def run_esau_williams_with_hop_limit(filename, W=15, max_hop=4):
             traceback.print_exc()
             continue
 
+    if writer is not None:
+        writer.close()
+
 
 # --- CHẠY THẬT với file mentor_groups.json --- #
 if __name__ == "__main__":
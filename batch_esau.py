@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+from multiprocessing import Pool
+
+# ==================== Cấu hình tham số ====================
+INPUT_FILE = "mentor_groups.json"
+OUTPUT_FILE = "esau_results.jsonl"
+W = 15
+MAX_HOP = 4
+VARIANT = "y4"      # "y3": Esau-Williams thường, "y4": có giới hạn hop
+WORKERS = None      # None: dùng mọi nhân CPU
+CHUNKSIZE = 1       # Số nhóm gửi cho worker mỗi lần
+
+
+# ==================== Đóng gói nhóm MENTOR ====================
+def pack_group(index, group):
+    """
+    Chuyển một nhóm MENTOR thành mảng gọn để gửi sang worker:
+    (chỉ số nhóm, id, tọa độ (N, 2), trọng số) với backbone ở vị trí 0.
+    """
+    nodes = [group['backbone']] + group['access_nodes']
+    ids = np.array([n['id'] for n in nodes], dtype=np.int64)
+    xy = np.array([(n['x'], n['y']) for n in nodes], dtype=np.float64)
+    weight = np.array([n.get('weight', 1) for n in nodes], dtype=np.float64)
+    return index, ids, xy, weight
+
+
+def unpack_nodes(ids, xy, weight):
+    return [{'id': i, 'x': x, 'y': y, 'weight': w}
+            for i, (x, y), w in zip(ids.tolist(), xy.tolist(), weight.tolist())]
+
+
+# ==================== Worker ====================
+def solve_group(task, variant=VARIANT, W=W, max_hop=MAX_HOP, candidate_k=None):
+    """Dựng cây truy nhập cho một nhóm đã đóng gói, trả về kết quả dạng mảng gọn."""
+    index, ids, xy, weight = task
+    nodes = unpack_nodes(ids, xy, weight)
+    backbone, access_nodes = nodes[0], nodes[1:]
+
+    start = time.perf_counter()
+    if variant == "y3":
+        from Y3 import build_access_tree
+        total_cost, edges, _, _ = build_access_tree(backbone, access_nodes, W, candidate_k)
+        hops = None
+    else:
+        from Y4 import build_access_tree
+        total_cost, edges, _, _, hop_count = build_access_tree(backbone, access_nodes, W, max_hop, candidate_k)
+        hops = (np.array(list(hop_count), dtype=np.int64), np.array(list(hop_count.values()), dtype=np.int64))
+    elapsed = time.perf_counter() - start
+
+    src = np.array([e[0] for e in edges], dtype=np.int64)
+    dst = np.array([e[1] for e in edges], dtype=np.int64)
+    cost = np.array([e[2] for e in edges], dtype=np.float64)
+    return index, int(ids[0]), total_cost, (src, dst, cost), hops, elapsed
+
+
+def _solve_star(args):
+    task, options = args
+    return solve_group(task, **options)
+
+
+# ==================== Chạy hàng loạt ====================
+def run_batch(filename=INPUT_FILE, output=OUTPUT_FILE, variant=VARIANT, W=W, max_hop=MAX_HOP,
+              workers=WORKERS, chunksize=CHUNKSIZE, candidate_k=None):
+    """
+    Chia các nhóm MENTOR cho một process pool; kết quả được nhận theo thứ tự hoàn thành và
+    ghi ngay vào một file JSON Lines (mỗi dòng một nhóm, có trường "group" là số thứ tự nhóm).
+    Trả về số nhóm đã xử lý.
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        mentor_groups = json.load(f)
+
+    options = dict(variant=variant, W=W, max_hop=max_hop, candidate_k=candidate_k)
+    tasks = [(pack_group(i, g), options) for i, g in enumerate(mentor_groups, 1) if g['access_nodes']]
+    skipped = len(mentor_groups) - len(tasks)
+    workers = workers or os.cpu_count() or 1
+    print(f"{len(tasks)} nhóm, {workers} worker, chunksize={chunksize}"
+          + (f", bỏ qua {skipped} nhóm không có access node" if skipped else ""))
+
+    start = time.perf_counter()
+    done = 0
+    with open(output, "w", encoding="utf-8") as out, Pool(workers) as pool:
+        for index, backbone_id, total_cost, (src, dst, cost), hops, elapsed in \
+                pool.imap_unordered(_solve_star, tasks, chunksize):
+            record = {
+                'group': index,
+                'backbone': backbone_id,
+                'total_cost': total_cost,
+                'edges': [[s, d, c] for s, d, c in zip(src.tolist(), dst.tolist(), cost.tolist())],
+                'time': round(elapsed, 6),
+            }
+            if hops is not None:
+                record['hop_count'] = dict(zip(hops[0].tolist(), hops[1].tolist()))
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            done += 1
+            print(f"  [{done}/{len(tasks)}] Nhóm {index}: Backbone={backbone_id}, "
+                  f"Tổng chi phí = {round(total_cost, 2)} ({elapsed:.3f}s)")
+
+    print(f"Xong {done} nhóm trong {time.perf_counter() - start:.2f}s, kết quả ghi vào {output}")
+    return done
+
+
+if __name__ == "__main__":
+    # Ví dụ: python batch_esau.py mentor_groups.json y4 8
+    args = sys.argv[1:]
+    run_batch(filename=args[0] if len(args) > 0 else INPUT_FILE,
+              variant=args[1] if len(args) > 1 else VARIANT,
+              workers=int(args[2]) if len(args) > 2 else WORKERS)
@@ -0,0 +1,54 @@
+import sys
+import time
+import random
+from Y4 import build_access_tree
+
+# ==================== Cấu hình tham số ====================
+SIZES = [100, 500, 1000, 2000, 5000, 10000, 20000]
+W = 15
+MAX_HOP = 4
+MAX_COORD = 1000
+CANDIDATE_K = 8
+SEED = 1
+# Vòng lặp cũ là O(N) mỗi vòng, bỏ qua ở nhóm lớn hơn ngưỡng này (đặt None để chạy hết)
+LEGACY_LIMIT = 10000
+
+
+# ==================== Sinh nhóm MENTOR ====================
+def generate_group(n, seed=SEED, max_coord=MAX_COORD):
+    rng = random.Random(seed * 100003 + n)
+    nodes = [{'id': i, 'x': rng.randint(0, max_coord), 'y': rng.randint(0, max_coord),
+              'weight': rng.choice([1, 1, 1, 2, 3])} for i in range(1, n + 2)]
+    return nodes[0], nodes[1:]
+
+
+def run_once(backbone, access_nodes, **kwargs):
+    stats = {}
+    start = time.perf_counter()
+    total_cost, edges, _, _, _ = build_access_tree(backbone, access_nodes, W, MAX_HOP, stats=stats, **kwargs)
+    return time.perf_counter() - start, stats['iterations'], total_cost
+
+
+# ==================== Chạy benchmark ====================
+def benchmark(sizes=SIZES, legacy_limit=LEGACY_LIMIT):
+    modes = [
+        ("scan (cũ)", dict(legacy_scan=True)),
+        ("heap", dict()),
+        (f"heap + k-NN (k={CANDIDATE_K})", dict(candidate_k=CANDIDATE_K)),
+    ]
+    print(f"{'N':>7} {'chế độ':<22} {'vòng lặp':>10} {'thời gian (s)':>14} {'tổng chi phí':>14}")
+    for n in sizes:
+        backbone, access_nodes = generate_group(n)
+        for name, kwargs in modes:
+            if kwargs.get('legacy_scan') and legacy_limit is not None and n > legacy_limit:
+                print(f"{n:>7} {name:<22} {'-':>10} {'(bỏ qua)':>14} {'-':>14}")
+                continue
+            elapsed, iterations, total_cost = run_once(backbone, access_nodes, **kwargs)
+            print(f"{n:>7} {name:<22} {iterations:>10} {elapsed:>14.3f} {total_cost:>14.2f}")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    # Ví dụ: python bench_Y4.py 100 1000 5000
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    benchmark(sizes)
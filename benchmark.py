@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import resource
+import platform
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+# ==================== Cấu hình tham số ====================
+SIZES = [100, 1000, 10000, 100000]
+SEED = 1
+OUTPUT_FILE = "bench_results.json"
+BASELINE_FILE = "bench_baseline.json"
+# Chậm hơn baseline quá tỉ lệ này (và quá MIN_DELTA giây) thì coi là hồi quy
+TOLERANCE = 1.25
+MIN_DELTA = 0.05
+# Bộ nhớ đỉnh vượt baseline quá tỉ lệ này (và quá MIN_DELTA_MB) cũng là hồi quy
+MEM_TOLERANCE = 1.25
+MIN_DELTA_MB = 5.0
+# Số đếm thao tác lệch khỏi baseline quá tỉ lệ này cũng được báo
+COUNT_TOLERANCE = 1.10
+W = 15
+MAX_HOP = 4
+CANDIDATE_K = 8
+RADIUS_RATIO = 0.3
+
+
+# ==================== Đếm số lần tính khoảng cách ====================
+# Hàm vector hóa đếm số phần tử kết quả, hàm tính một cặp đếm 1. Chỉ bọc trong tiến trình
+# benchmark nên mã chạy thật không tốn thêm gì.
+VECTOR_FUNCS = ("point_distances", "pairwise_block", "pair_distances")
+SCALAR_FUNCS = ("calculate_distance", "euclidean_distance", "calc_distance_2Dpoint", "distance_formula")
+_counts = {"dist_evals": 0}
+
+
+def _counting(func, vector):
+    def wrapper(*args, **kwargs):
+        out = func(*args, **kwargs)
+        _counts["dist_evals"] += getattr(out, "size", 1) if vector else 1
+        return out
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+def instrument_distances(modules):
+    """Thay các hàm khoảng cách (kể cả tên đã import bằng from ... import) bằng bản có đếm."""
+    import distance_engine
+    for mod in [distance_engine] + list(modules):
+        for names, vector in ((VECTOR_FUNCS, True), (SCALAR_FUNCS, False)):
+            for name in names:
+                func = getattr(mod, name, None)
+                if callable(func) and not hasattr(func, "__wrapped__"):
+                    setattr(mod, name, _counting(func, vector))
+
+
+# ==================== Các bài đo ====================
+# Mỗi bài nhận (n, seed), trả về dict số đếm riêng (ngoài dist_evals)
+def _bench_mentor(n, seed):
+    import MENTOR
+    MENTOR.NUM_NODES, MENTOR.SEED = n + 1, seed
+    _, backbones, _ = MENTOR.mentor_algorithm()
+    return {"backbones": len(backbones)}
+
+
+def _bench_y2(n, seed):
+    import Y2
+    Y2.NUM_NODES, Y2.SEED = n, seed
+    groups, _ = Y2.mentor_algorithm()
+    return {"backbones": len(groups)}
+
+
+def _bench_test(n, seed):
+    import Test
+    Test.NUM_NODES, Test.SEED, Test.DEBUG = n, seed, False
+    return {"backbones": len(Test.mentor_algorithm())}
+
+
+def _bench_planner(n, seed):
+    from instance_gen import load_instance
+    from mentor_planner import MentorPlanner
+    groups = MentorPlanner(load_instance(seed, n)).plan(radius_ratio=RADIUS_RATIO)
+    return {"backbones": len(groups)}
+
+
+def _bench_esau(n, seed):
+    import EsauWilliam
+    stats = {}
+    EsauWilliam.esau_williams_subtree(EsauWilliam.initialize_nodes_de6(n, seed=seed), W, MAX_HOP, stats=stats)
+    return stats
+
+
+def _one_group(n, seed):
+    from instance_gen import load_instance
+    nodes = load_instance(seed, n + 1).to_dicts()
+    return nodes[0], nodes[1:]
+
+
+def _bench_y3(n, seed):
+    from Y3 import build_access_tree
+    stats = {}
+    build_access_tree(*_one_group(n, seed), W, CANDIDATE_K, stats)
+    return {k: stats[k] for k in ("merges", "recomputes")}
+
+
+def _bench_y4(n, seed):
+    from Y4 import build_access_tree
+    stats = {}
+    build_access_tree(*_one_group(n, seed), W, MAX_HOP, CANDIDATE_K, stats)
+    return {k: stats[k] for k in ("merges", "recomputes", "iterations")}
+
+
+def _bench_edges_full(n, seed):
+    import Kieudanhsach
+    positions = Kieudanhsach.generate_positions(n, seed=seed)
+    rows, _ = Kieudanhsach.write_edge_binary(positions)
+    return {"edges": rows}
+
+
+def _bench_edges_knn(n, seed):
+    from instance_gen import load_instance
+    from sparse_graph import knn_graph
+    graph = knn_graph(load_instance(seed, n, profile="uniform").coords())
+    return {"edges": graph.num_edges // 2}
+
+
+# tên bài: (hàm, module cần đếm khoảng cách, số node tối đa - None là không giới hạn)
+CASES = {
+    "mentor": (_bench_mentor, ("MENTOR", "spatial_index", "reward"), None),
+    "y2": (_bench_y2, ("Y2", "spatial_index", "reward"), None),
+    "test": (_bench_test, ("Test", "spatial_index", "reward"), None),
+    "planner": (_bench_planner, ("mentor_planner", "spatial_index", "reward"), None),
+    "esau_williams": (_bench_esau, ("EsauWilliam", "spatial_index"), 10000),
+    "y3": (_bench_y3, ("Y3", "spatial_index"), 10000),
+    "y4": (_bench_y4, ("Y4", "spatial_index"), 10000),
+    "edges_full": (_bench_edges_full, ("Kieudanhsach",), 10000),
+    "edges_knn": (_bench_edges_knn, ("sparse_graph",), None),
+}
+
+
+# ==================== Chạy một bài trong tiến trình riêng ====================
+def _peak_rss_mb():
+    # ru_maxrss tính bằng KB trên Linux, byte trên macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def _run_case(name, n, seed):
+    import importlib
+    func, modules, _ = CASES[name]
+    instrument_distances([importlib.import_module(m) for m in modules])
+    base_rss = _peak_rss_mb()
+    # Chạy trong thư mục tạm, bỏ output in ra: các script ghi file kết quả vào thư mục hiện hành
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                counts = func(n, seed)
+                elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    counts = {"dist_evals": _counts["dist_evals"], **counts}
+    return {"case": name, "n": n, "time": round(elapsed, 4),
+            "peak_mb": round(_peak_rss_mb() - base_rss, 1), "counts": counts}
+
+
+def run_case(name, n, seed=SEED):
+    """Chạy một bài trong tiến trình mới (spawn) để đo bộ nhớ đỉnh không lẫn với bài khác."""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(_run_case, name, n, seed).result()
+
+
+def run_benchmarks(cases=None, sizes=SIZES, seed=SEED, output=OUTPUT_FILE):
+    """Chạy các bài trên các cỡ mạng đã seed, in bảng và ghi kết quả JSON. Trả về danh sách kết quả."""
+    cases = cases or list(CASES)
+    results = []
+    print(f"{'bài':<14} {'N':>7} {'thời gian (s)':>14} {'bộ nhớ đỉnh (MB)':>17}  số đếm")
+    for name in cases:
+        limit = CASES[name][2]
+        for n in sizes:
+            if limit is not None and n > limit:
+                continue
+            r = run_case(name, n, seed)
+            results.append(r)
+            print(f"{name:<14} {n:>7} {r['time']:>14.3f} {r['peak_mb']:>17.1f}  {r['counts']}")
+            sys.stdout.flush()
+
+    report = {"seed": seed, "python": platform.python_version(), "machine": platform.machine(),
+              "results": results}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Kết quả ghi vào {output}")
+    return results
+
+
+# ==================== So sánh với baseline ====================
+def compare(results, baseline_file=BASELINE_FILE, tolerance=TOLERANCE, count_tolerance=COUNT_TOLERANCE,
+            mem_tolerance=MEM_TOLERANCE):
+    """In các bài chậm hơn, tốn bộ nhớ hơn hoặc có số đếm lệch so với baseline; trả về danh sách hồi quy."""
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = {(r["case"], r["n"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get((r["case"], r["n"]))
+        if base is None:
+            continue
+        if r["time"] > base["time"] * tolerance and r["time"] - base["time"] > MIN_DELTA:
+            regressions.append(f"{r['case']} N={r['n']}: {base['time']:.3f}s -> {r['time']:.3f}s")
+        if r["peak_mb"] > base["peak_mb"] * mem_tolerance and r["peak_mb"] - base["peak_mb"] > MIN_DELTA_MB:
+            regressions.append(f"{r['case']} N={r['n']}: {base['peak_mb']:.1f} MB -> {r['peak_mb']:.1f} MB")
+        for key, value in r["counts"].items():
+            old = base["counts"].get(key)
+            if old and value > old * count_tolerance:
+                regressions.append(f"{r['case']} N={r['n']}: {key} {old} -> {value}")
+    for line in regressions:
+        print("  HỒI QUY:", line)
+    if not regressions:
+        print(f"Không có hồi quy so với {baseline_file}")
+    return regressions
+
+
+if __name__ == "__main__":
+    # Ví dụ: python benchmark.py                 (mọi bài, so với bench_baseline.json nếu có)
+    #        python benchmark.py y4,mentor 1000  (chọn bài và cỡ mạng; "all" là mọi bài)
+    #        python benchmark.py --save-baseline (ghi kết quả làm baseline mới)
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    cases = args[0].split(",") if len(args) > 0 and args[0] != "all" else None
+    sizes = [int(a) for a in args[1:]] or SIZES
+    if "--save-baseline" in sys.argv:
+        run_benchmarks(cases, sizes, output=BASELINE_FILE)
+    else:
+        results = run_benchmarks(cases, sizes)
+        if os.path.exists(BASELINE_FILE):
+            sys.exit(1 if compare(results) else 0)
@@ -0,0 +1,262 @@
+import math
+import numpy as np
+
+# ==================== Cài đặt mặc định ====================
+# Số hàng tối đa của mỗi khối khi tính ma trận khoảng cách (giới hạn bộ nhớ tạm)
+BLOCK_SIZE = 1024
+# Giữ nguyên ma trận N x N trong bộ nhớ khi N không vượt quá ngưỡng này (~128MB float64)
+MATRIX_LIMIT = 4096
+# Số phần tử tối đa của một khối khoảng cách khi tính moment (~32MB float64)
+BLOCK_ELEMENTS = 1 << 22
+METRICS = ("euclidean", "manhattan")
+
+
+# ==================== Chuyển đổi tọa độ ====================
+def _xy(node):
+    if isinstance(node, dict):
+        return node['x'], node['y']
+    if hasattr(node, 'x'):
+        return node.x, node.y
+    return node[0], node[1]
+
+
+def to_coords(nodes):
+    """Chuyển danh sách node (object có x/y, dict có 'x'/'y' hoặc cặp (x, y)) thành mảng (N, 2) float64 liên tục."""
+    if isinstance(nodes, np.ndarray):
+        return np.ascontiguousarray(nodes, dtype=np.float64).reshape(-1, 2)
+    coords = np.array([_xy(n) for n in nodes], dtype=np.float64)
+    return coords.reshape(-1, 2)
+
+
+# ==================== Hàm tính khoảng cách vector hóa ====================
+def pairwise_block(a, b, metric="euclidean"):
+    """Ma trận khoảng cách len(a) x len(b) giữa hai mảng tọa độ (broadcasting)."""
+    dx = a[:, 0, None] - b[None, :, 0]
+    dy = a[:, 1, None] - b[None, :, 1]
+    if metric == "manhattan":
+        return np.abs(dx) + np.abs(dy)
+    return np.sqrt(dx * dx + dy * dy)
+
+
+def point_distances(coords, x, y, metric="euclidean"):
+    """Khoảng cách từ điểm (x, y) tới mọi điểm trong coords."""
+    dx = coords[:, 0] - x
+    dy = coords[:, 1] - y
+    if metric == "manhattan":
+        return np.abs(dx) + np.abs(dy)
+    return np.sqrt(dx * dx + dy * dy)
+
+
+def pair_distances(a, b, metric="euclidean"):
+    """Khoảng cách giữa a[k] và b[k] theo từng cặp; tọa độ nguyên với manhattan cho kết quả nguyên."""
+    dx = b[:, 0] - a[:, 0]
+    dy = b[:, 1] - a[:, 1]
+    if metric == "manhattan":
+        return np.abs(dx) + np.abs(dy)
+    return np.sqrt(dx * dx + dy * dy)
+
+
+def iter_blocks(a, b=None, block_size=BLOCK_SIZE, metric="euclidean"):
+    """Sinh lần lượt (start, stop, block) với block là khoảng cách từ a[start:stop] tới toàn bộ b."""
+    if b is None:
+        b = a
+    for start in range(0, len(a), block_size):
+        stop = min(start + block_size, len(a))
+        yield start, stop, pairwise_block(a[start:stop], b, metric)
+
+
+# ==================== Bao lồi và đường kính (MaxCost) ====================
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(coords):
+    """
+    Chỉ số các đỉnh bao lồi (ngược chiều kim đồng hồ, bỏ điểm thẳng hàng) theo thuật toán
+    Andrew (monotone chain). Các điểm nằm trong tứ giác tạo bởi 4 điểm cực trị theo
+    x+y, x-y bị loại trước bằng phép tính vector hóa (Akl-Toussaint).
+    """
+    coords = to_coords(coords)
+    n = len(coords)
+    if n < 3:
+        return np.arange(n)
+
+    x, y = coords[:, 0], coords[:, 1]
+    extremes = coords[[np.argmin(x + y), np.argmin(y - x), np.argmax(x + y), np.argmax(y - x)]]
+    inside = np.ones(n, dtype=bool)
+    for k in range(4):
+        (ax, ay), (bx, by) = extremes[k], extremes[(k + 1) % 4]
+        inside &= (bx - ax) * (y - ay) - (by - ay) * (x - ax) > 0
+    cand = np.flatnonzero(~inside)
+
+    order = cand[np.lexsort((y[cand], x[cand]))]
+    pts = coords[order].tolist()
+    lower, upper = [], []
+    for k in range(len(pts)):
+        while len(lower) >= 2 and _cross(pts[lower[-2]], pts[lower[-1]], pts[k]) <= 0:
+            lower.pop()
+        lower.append(k)
+    for k in range(len(pts) - 1, -1, -1):
+        while len(upper) >= 2 and _cross(pts[upper[-2]], pts[upper[-1]], pts[k]) <= 0:
+            upper.pop()
+        upper.append(k)
+    hull = lower[:-1] + upper[:-1]
+    if not hull:  # Mọi điểm trùng nhau
+        hull = [0]
+    return order[hull]
+
+
+def diameter(coords, metric="euclidean"):
+    """
+    Khoảng cách lớn nhất giữa hai điểm (MaxCost), tính chính xác.
+    - euclidean: bao lồi + rotating calipers, O(N log N)
+    - manhattan: max(x+y) - min(x+y) hoặc max(x-y) - min(x-y), O(N)
+    """
+    coords = to_coords(coords)
+    if len(coords) < 2:
+        return 0
+    if metric == "manhattan":
+        # Cặp xa nhất nằm ở hai đầu của x+y hoặc x-y; tính lại theo công thức |dx| + |dy|
+        s = coords[:, 0] + coords[:, 1]
+        d = coords[:, 0] - coords[:, 1]
+        ends = [np.argmin(s), np.argmax(s), np.argmin(d), np.argmax(d)]
+        pts = coords[ends]
+        return float(max(pairwise_block(pts[0:1], pts[1:2], metric)[0, 0],
+                         pairwise_block(pts[2:3], pts[3:4], metric)[0, 0]))
+    if metric not in METRICS:
+        raise ValueError(f"Metric không hợp lệ: {metric!r} (chỉ hỗ trợ {METRICS})")
+
+    hull = coords[convex_hull(coords)].tolist()
+    m = len(hull)
+    if m == 1:
+        return 0.0
+
+    def d2(a, b):
+        dx, dy = a[0] - b[0], a[1] - b[1]
+        return dx * dx + dy * dy
+
+    if m == 2:
+        return math.sqrt(d2(hull[0], hull[1]))
+
+    # Rotating calipers: với mỗi cạnh (i, i+1) tiến j tới đỉnh xa cạnh đó nhất
+    best = 0.0
+    j = 1
+    for i in range(m):
+        a, b = hull[i], hull[(i + 1) % m]
+        while abs(_cross(a, b, hull[(j + 1) % m])) > abs(_cross(a, b, hull[j])):
+            j = (j + 1) % m
+        best = max(best, d2(a, hull[j]), d2(b, hull[j]))
+    return math.sqrt(best)
+
+
+# ==================== Moment và trung vị có trọng số ====================
+def weighted_moments(coords, weights, metric="euclidean"):
+    """
+    Moment Σ_j w_j · d(i, j) của mọi điểm i: O(N²) phép tính vector hóa, theo khối hàng
+    nên bộ nhớ tạm không vượt BLOCK_ELEMENTS phần tử.
+    """
+    coords = to_coords(coords)
+    weights = np.asarray(weights, dtype=np.float64)
+    out = np.empty(len(coords), dtype=np.float64)
+    block_size = max(1, min(BLOCK_SIZE, BLOCK_ELEMENTS // max(len(coords), 1)))
+    for start, stop, block in iter_blocks(coords, block_size=block_size, metric=metric):
+        out[start:stop] = block @ weights
+    return out
+
+
+def _weighted_median(values, weights):
+    order = np.argsort(values, kind="stable")
+    cum = np.cumsum(weights[order])
+    return float(values[order[np.searchsorted(cum, cum[-1] / 2)]])
+
+
+def geometric_median(coords, weights, metric="euclidean", max_iter=100, tol=1e-7):
+    """
+    Điểm p làm Σ w_j · d(p, x_j) nhỏ nhất (không bắt buộc trùng một điểm), O(N) mỗi vòng lặp.
+    - euclidean: lặp Weiszfeld bắt đầu từ trọng tâm; điểm trùng p tạm bỏ qua để tránh chia cho 0
+    - manhattan: trung vị có trọng số theo từng trục (nghiệm chính xác)
+    """
+    coords = to_coords(coords)
+    w = np.asarray(weights, dtype=np.float64)
+    if w.sum() <= 0:
+        w = np.ones(len(coords))
+    if metric == "manhattan":
+        return _weighted_median(coords[:, 0], w), _weighted_median(coords[:, 1], w)
+
+    p = w @ coords / w.sum()
+    eps = tol * max(float(np.ptp(coords, axis=0).max()) if len(coords) else 0.0, 1.0)
+    for _ in range(max_iter):
+        d = point_distances(coords, p[0], p[1])
+        keep = d > eps
+        if not keep.any():
+            break
+        inv = w[keep] / d[keep]
+        new = inv @ coords[keep] / inv.sum()
+        step = math.hypot(new[0] - p[0], new[1] - p[1])
+        p = new
+        if step <= eps:
+            break
+    return float(p[0]), float(p[1])
+
+
+# ==================== Bộ tính khoảng cách dùng chung ====================
+class DistanceEngine:
+    """
+    Giữ tọa độ các node dưới dạng mảng liên tục và cung cấp hàng/cột khoảng cách
+    cho MENTOR và Esau-Williams. Với N nhỏ, ma trận đầy đủ được tính một lần theo khối
+    và row()/col() trả về view; với N lớn, mỗi hàng được tính lại khi cần.
+    """
+
+    def __init__(self, coords, metric="euclidean", block_size=BLOCK_SIZE, matrix_limit=MATRIX_LIMIT):
+        if metric not in METRICS:
+            raise ValueError(f"Metric không hợp lệ: {metric!r} (chỉ hỗ trợ {METRICS})")
+        self.coords = to_coords(coords)
+        self.metric = metric
+        self.block_size = block_size
+        self._matrix = None
+        if len(self.coords) <= matrix_limit:
+            self._matrix = self.matrix()
+
+    @classmethod
+    def from_nodes(cls, nodes, **kwargs):
+        return cls(to_coords(nodes), **kwargs)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def blocks(self, block_size=None):
+        return iter_blocks(self.coords, block_size=block_size or self.block_size, metric=self.metric)
+
+    def matrix(self):
+        """Ma trận khoảng cách N x N, tính theo từng khối hàng."""
+        if self._matrix is not None:
+            return self._matrix
+        n = len(self.coords)
+        out = np.empty((n, n), dtype=np.float64)
+        for start, stop, block in self.blocks():
+            out[start:stop] = block
+        return out
+
+    def row(self, i):
+        """Khoảng cách từ node i tới mọi node (view nếu ma trận đã có sẵn)."""
+        if self._matrix is not None:
+            return self._matrix[i]
+        return point_distances(self.coords, self.coords[i, 0], self.coords[i, 1], self.metric)
+
+    def col(self, j):
+        """Khoảng cách từ mọi node tới node j."""
+        if self._matrix is not None:
+            return self._matrix[:, j]
+        return self.row(j)
+
+    def dist(self, i, j):
+        if self._matrix is not None:
+            return float(self._matrix[i, j])
+        return float(pairwise_block(self.coords[i:i + 1], self.coords[j:j + 1], self.metric)[0, 0])
+
+    def to_point(self, x, y):
+        return point_distances(self.coords, x, y, self.metric)
+
+    def max_distance(self):
+        """Khoảng cách lớn nhất giữa hai node bất kỳ (MaxCost)."""
+        return diameter(self.coords, self.metric)
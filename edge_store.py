@@ -0,0 +1,83 @@
+import struct
+import numpy as np
+
+# ==================== Định dạng file nhị phân ====================
+# Đồ thị đầy đủ N node lưu dạng tam giác trên rút gọn (condensed): khoảng cách (i, j), i < j,
+# xếp liền theo thứ tự hàng i rồi j tăng dần, giống danh sách cạnh CSV.
+#   [header 64 byte] [id các node: N phần tử] [đệm tới bội số 8] [khoảng cách: N(N-1)/2 phần tử]
+# Header: magic, phiên bản, N, metric, dtype của id và dtype của khoảng cách (chuỗi numpy, vd "<u4").
+MAGIC = b"EDGEBIN1"
+VERSION = 1
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sHHQ16s8s8s")
+
+
+def pack_header(n, metric, id_dtype, dist_dtype):
+    raw = _HEADER.pack(MAGIC, VERSION, HEADER_SIZE, n, metric.encode("ascii"),
+                       np.dtype(id_dtype).str.encode("ascii"), np.dtype(dist_dtype).str.encode("ascii"))
+    return raw.ljust(HEADER_SIZE, b"\0")
+
+
+def unpack_header(raw):
+    magic, version, header_size, n, metric, id_dtype, dist_dtype = _HEADER.unpack(raw[:_HEADER.size])
+    if magic != MAGIC:
+        raise ValueError("Không phải file danh sách cạnh nhị phân (sai magic)")
+    if version != VERSION:
+        raise ValueError(f"Phiên bản định dạng không hỗ trợ: {version}")
+    return (header_size, n, metric.rstrip(b"\0").decode("ascii"),
+            np.dtype(id_dtype.rstrip(b"\0").decode("ascii")), np.dtype(dist_dtype.rstrip(b"\0").decode("ascii")))
+
+
+def dist_offset(n, id_dtype):
+    end = HEADER_SIZE + n * np.dtype(id_dtype).itemsize
+    return (end + 7) // 8 * 8
+
+
+def condensed_index(i, j, n):
+    """Vị trí của cặp (i, j), i < j, trong mảng rút gọn."""
+    return i * n - i * (i + 1) // 2 + (j - i - 1)
+
+
+# ==================== Đọc file bằng memory map ====================
+class EdgeStore:
+    """
+    Đọc file danh sách cạnh nhị phân mà không nạp vào bộ nhớ: ids và dist là np.memmap
+    (zero-copy), distance(i, j) tra trực tiếp O(1) theo vị trí trong mảng rút gọn.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        header_size, self.n, self.metric, id_dtype, dist_dtype = unpack_header(header)
+        n = self.n
+        self.ids = np.memmap(path, dtype=id_dtype, mode="r", offset=header_size, shape=(n,))
+        self.dist = np.memmap(path, dtype=dist_dtype, mode="r", offset=dist_offset(n, id_dtype),
+                              shape=(n * (n - 1) // 2,))
+
+    def __len__(self):
+        return len(self.dist)
+
+    def distance(self, i, j):
+        if i == j:
+            return 0
+        if i > j:
+            i, j = j, i
+        return self.dist[condensed_index(i, j, self.n)].item()
+
+    def row(self, i):
+        """Khoảng cách từ i tới các node j > i (view trên memmap)."""
+        start = condensed_index(i, i + 1, self.n)
+        return self.dist[start:start + self.n - 1 - i]
+
+    def iter_edges(self, block_rows=256):
+        """Sinh (i, j, distance) theo từng khối hàng; distance là view trên memmap."""
+        n = self.n
+        for start in range(0, max(n - 1, 0), block_rows):
+            stop = min(start + block_rows, n - 1)
+            rows = np.arange(start, stop)
+            per_row = n - 1 - rows
+            ii = np.repeat(rows, per_row)
+            first = np.repeat(np.cumsum(per_row) - per_row, per_row)
+            jj = np.arange(len(ii)) - first + ii + 1
+            lo = condensed_index(start, start + 1, n)
+            yield ii, jj, self.dist[lo:lo + len(ii)]
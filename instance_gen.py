@@ -0,0 +1,70 @@
+import os
+import json
+import hashlib
+import numpy as np
+from node_store import COLUMNS, NodeTable
+
+# ==================== Cài đặt mặc định ====================
+CACHE_DIR = "instances"
+# Dưới ngưỡng này sinh lại (vector hóa) nhanh hơn đọc file, không ghi cache
+CACHE_MIN_NODES = 100000
+
+# Bộ trọng số đặc biệt theo id node; node không có trong bộ có trọng số 1
+PROFILES = {
+    "de6": {
+        3: 30, 12: 30, 69: 30, 29: 30,
+        17: 6, 22: 6, 49: 6,
+        77: 4, 63: 4, 6: 4,
+        37: 5, 42: 5, 47: 5,
+        57: 3, 45: 3, 8: 3
+    },
+    "uniform": {},
+}
+
+
+def _weights(profile):
+    return PROFILES[profile] if isinstance(profile, str) else profile
+
+
+def instance_key(seed, n, max_coord=1000, profile="de6"):
+    """Tên file cache duy nhất cho bộ tham số; bộ trọng số tự định nghĩa được băm."""
+    if isinstance(profile, str):
+        name = profile
+    else:
+        raw = json.dumps(sorted((int(k), v) for k, v in profile.items()))
+        name = "w" + hashlib.sha1(raw.encode("ascii")).hexdigest()[:12]
+    return f"n{n}_c{max_coord}_s{seed}_{name}"
+
+
+# ==================== Sinh mạng ====================
+def generate(seed, n, max_coord=1000, profile="de6"):
+    """
+    Mạng n node (id 1..n) với tọa độ nguyên đều trong [0, max_coord], trọng số theo profile
+    và traffic bằng trọng số. Cùng tham số luôn cho cùng một mạng (numpy Generator theo seed).
+    """
+    rng = np.random.default_rng(seed)
+    xy = rng.integers(0, max_coord, size=(n, 2), endpoint=True)
+    weight = np.ones(n, dtype=np.int64)
+    special = {int(k): v for k, v in _weights(profile).items() if 1 <= int(k) <= n}
+    if special:
+        weight[np.array(list(special)) - 1] = list(special.values())
+    return NodeTable(id=np.arange(1, n + 1), x=xy[:, 0], y=xy[:, 1], weight=weight, traffic=weight.copy())
+
+
+def load_instance(seed, n, max_coord=1000, profile="de6", cache_dir=CACHE_DIR, min_nodes=CACHE_MIN_NODES):
+    """Như generate() nhưng mạng từ min_nodes node trở lên được lưu/đọc lại từ cache_dir (.npz)."""
+    if cache_dir is None or n < min_nodes:
+        return generate(seed, n, max_coord, profile)
+    path = os.path.join(cache_dir, instance_key(seed, n, max_coord, profile) + ".npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return NodeTable(**{name: data[name] for name in COLUMNS})
+
+    table = generate(seed, n, max_coord, profile)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Ghi ra file tạm rồi đổi tên để tiến trình khác không đọc phải file dở dang
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **{name: getattr(table, name) for name in COLUMNS})
+    os.replace(tmp, path)
+    return table
@@ -0,0 +1,158 @@
+import os
+import io
+import json
+import time
+import atexit
+import pstats
+import cProfile
+import functools
+import contextlib
+
+# ==================== Cấu hình qua biến môi trường ====================
+# BTL_INSTRUMENT=1            bật đo thời gian các pha và bộ đếm
+# BTL_INSTRUMENT_FILE=x.json  file JSON ghi khi chương trình kết thúc (mặc định instrument.json)
+# BTL_PROFILE=1               chạy các hàm đánh dấu @traced dưới cProfile (kéo theo BTL_INSTRUMENT)
+ENV_ENABLE = "BTL_INSTRUMENT"
+ENV_FILE = "BTL_INSTRUMENT_FILE"
+ENV_PROFILE = "BTL_PROFILE"
+DEFAULT_FILE = "instrument.json"
+PROFILE_TOP = 25  # Số hàm tốn thời gian nhất (theo cumtime) giữ lại cho mỗi lần profile
+
+
+def _flag(name):
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no")
+
+
+profiling = _flag(ENV_PROFILE)
+enabled = profiling or _flag(ENV_ENABLE)
+
+# Khi tắt, phase() trả về cùng một context rỗng nên mỗi lần gọi chỉ tốn một phép kiểm tra cờ
+_NULL = contextlib.nullcontext()
+_phases = {}    # tên pha -> [số lần, tổng thời gian, thời gian lâu nhất]
+_counters = {}  # tên bộ đếm -> giá trị
+_profiles = {}  # tên hàm -> danh sách hàm tốn thời gian nhất
+_profiler_active = False
+
+
+# ==================== Bật / tắt ====================
+def enable(profile=False):
+    """Bật đo đạc trong chương trình (như đặt BTL_INSTRUMENT=1, hoặc BTL_PROFILE=1 khi profile=True)."""
+    global enabled, profiling
+    enabled = True
+    profiling = profiling or profile
+
+
+def disable():
+    global enabled, profiling
+    enabled = profiling = False
+
+
+def reset():
+    """Xóa mọi số liệu đã ghi."""
+    _phases.clear()
+    _counters.clear()
+    _profiles.clear()
+
+
+# ==================== Pha và bộ đếm ====================
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        rec = _phases.get(self.name)
+        if rec is None:
+            _phases[self.name] = [1, elapsed, elapsed]
+        else:
+            rec[0] += 1
+            rec[1] += elapsed
+            if elapsed > rec[2]:
+                rec[2] = elapsed
+        return False
+
+
+def phase(name):
+    """
+    Context đo thời gian một pha: with instrument.phase("merge_loop"): ...
+    Các pha có thể lồng nhau, thời gian của pha ngoài đã gồm cả pha trong.
+    """
+    if not enabled:
+        return _NULL
+    return _Phase(name)
+
+
+def count(name, k=1):
+    """Cộng k vào bộ đếm name (không làm gì khi đang tắt)."""
+    if enabled:
+        _counters[name] = _counters.get(name, 0) + k
+
+
+def _profile_rows(profiler):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({"function": f"{os.path.basename(filename)}:{line}({func})",
+                     "ncalls": nc, "primcalls": cc, "tottime": round(tt, 6), "cumtime": round(ct, 6)})
+    rows.sort(key=lambda r: r["cumtime"], reverse=True)
+    return rows[:PROFILE_TOP]
+
+
+def traced(name):
+    """
+    Decorator cho hàm điểm vào (mentor_algorithm, build_access_tree, ...): khi bật, thời gian mỗi
+    lần gọi được ghi thành pha name; khi profile, lần gọi ngoài cùng chạy dưới cProfile và các hàm
+    tốn thời gian nhất được giữ trong báo cáo.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            global _profiler_active
+            if not enabled:
+                return func(*args, **kwargs)
+            if not profiling or _profiler_active:
+                with _Phase(name):
+                    return func(*args, **kwargs)
+
+            profiler = cProfile.Profile()
+            _profiler_active = True
+            try:
+                with _Phase(name):
+                    return profiler.runcall(func, *args, **kwargs)
+            finally:
+                _profiler_active = False
+                _profiles[name] = _profile_rows(profiler)
+        return wrapper
+    return decorate
+
+
+# ==================== Báo cáo ====================
+def report():
+    """Số liệu hiện tại dạng dict (ghi được ra JSON)."""
+    phases = {name: {"calls": calls, "total": round(total, 6), "mean": round(total / calls, 6),
+                     "max": round(longest, 6)}
+              for name, (calls, total, longest) in _phases.items()}
+    return {"enabled": enabled, "profiling": profiling, "phases": phases,
+            "counters": dict(_counters), "profiles": dict(_profiles)}
+
+
+def dump(path=None):
+    """Ghi report() ra file JSON (mặc định theo BTL_INSTRUMENT_FILE). Trả về đường dẫn."""
+    path = path or os.environ.get(ENV_FILE) or DEFAULT_FILE
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(), f, indent=2, ensure_ascii=False)
+    return path
+
+
+def _dump_at_exit():
+    if enabled and (_phases or _counters):
+        dump()
+
+
+atexit.register(_dump_at_exit)
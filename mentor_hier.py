@@ -0,0 +1,279 @@
+import os
+import sys
+import time
+from multiprocessing import Pool
+import numpy as np
+import instrument
+from distance_engine import diameter, pair_distances
+from spatial_index import GridIndex, assign_balanced
+from node_store import NodeTable
+from mentor_planner import MentorPlanner, mass_field, W_THRESHOLD, C, LIMIT_ACCESS_NODES, BALANCED_ASSIGN
+
+# ==================== Cấu hình tham số ====================
+# Chia ô chỉ có ích khi bán kính truy nhập nhỏ so với mạng (0.3 như Y2 thì bán kính lớn hơn cả ô)
+RADIUS_RATIO = 0.02
+TILE_NODES = 20000      # Ô quadtree được chia tiếp khi có nhiều node hơn ngưỡng này
+TILE_MIN_RADII = 4      # ... và cạnh ô sau khi chia vẫn dài ít nhất từng này lần bán kính truy nhập
+BORDER_RATIO = 1.0      # Backbone theo thưởng cách cạnh ô trong khoảng BORDER_RATIO * bán kính được xét lại
+MAX_LEVELS = 3          # Số lần chia ô tối đa cho phần node còn lại sau hòa giải; lần cuối chạy phẳng
+WORKERS = None          # None: dùng mọi nhân CPU
+FLAT_COMPARE_LIMIT = 1000000  # CLI chỉ chạy thêm bản phẳng để so sánh khi mạng không lớn hơn ngưỡng này
+
+
+# ==================== Chia ô (quadtree) ====================
+def quadtree_tiles(coords, max_nodes=TILE_NODES, min_side=0.0):
+    """
+    Chia đệ quy hình chữ nhật bao thành 4 góc phần tư tới khi ô có không quá max_nodes node
+    hoặc chia nữa sẽ làm cạnh ô ngắn hơn min_side. Node nằm trên đường chia thuộc ô bên phải/trên.
+    Trả về danh sách (chỉ số node, (x0, y0, x1, y1)) của các ô khác rỗng.
+    """
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    stack = [(np.arange(len(coords)), (float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1])))]
+    tiles = []
+    while stack:
+        idx, (x0, y0, x1, y1) = stack.pop()
+        if len(idx) <= max_nodes or min(x1 - x0, y1 - y0) / 2 < min_side:
+            tiles.append((idx, (x0, y0, x1, y1)))
+            continue
+        xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+        right = coords[idx, 0] >= xm
+        top = coords[idx, 1] >= ym
+        for part, rect in ((~right & ~top, (x0, y0, xm, ym)), (right & ~top, (xm, y0, x1, ym)),
+                           (~right & top, (x0, ym, xm, y1)), (right & top, (xm, ym, x1, y1))):
+            if part.any():
+                stack.append((idx[part], rect))
+    tiles.reverse()
+    return tiles
+
+
+def border_distances(coords, tiles):
+    """Khoảng cách từ mỗi node tới cạnh gần nhất của ô chứa nó mà giáp ô khác (vô cùng nếu chỉ có một ô)."""
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    out = np.full(len(coords), np.inf)
+    for idx, (x0, y0, x1, y1) in tiles:
+        x, y = coords[idx, 0], coords[idx, 1]
+        d = out[idx]
+        # Cạnh trùng biên hình chữ nhật bao của cả mạng không phải ranh giới giữa hai ô
+        if x0 > lo[0]:
+            d = np.minimum(d, x - x0)
+        if y0 > lo[1]:
+            d = np.minimum(d, y - y0)
+        if x1 < hi[0]:
+            d = np.minimum(d, x1 - x)
+        if y1 < hi[1]:
+            d = np.minimum(d, y1 - y)
+        out[idx] = d
+    return out
+
+
+# ==================== MENTOR trên từng ô ====================
+def _plan_tile(task):
+    members, table, w_threshold, c, limit, balanced, radius, mass = task
+    groups = MentorPlanner(table, mass=mass).plan(w_threshold, c=c, limit=limit, balanced=balanced, radius=radius)
+    return [members[g] for g in groups]
+
+
+def _plan_tiles(table, tiles, params, pool):
+    tasks = [(idx, table.take(idx)) + params for idx, _ in tiles]
+    if pool is None or len(tasks) == 1:
+        results = [_plan_tile(t) for t in tasks]
+    else:
+        # Ô lớn gửi trước để các worker xong gần cùng lúc; kết quả giữ thứ tự ô
+        order = sorted(range(len(tasks)), key=lambda k: -len(tasks[k][0]))
+        results = [None] * len(tasks)
+        for k, groups in zip(order, pool.imap(_plan_tile, [tasks[k] for k in order])):
+            results[k] = groups
+    return [g for groups in results for g in groups]
+
+
+# ==================== Hòa giải ở biên ô ====================
+def _reach(coords, group, radius, limit):
+    # Nhóm đã đủ limit node chỉ phủ tới access node xa nhất: biên ô xa hơn không làm nhóm thay đổi
+    if limit > 0 and len(group) == limit + 1:
+        return float(pair_distances(coords[group[1:]], coords[np.full(limit, group[0])]).max())
+    return radius
+
+
+def _reconcile(coords, groups, droppable, radius, limit):
+    """
+    Bỏ các nhóm có backbone droppable, gán node của chúng về backbone còn lại gần nhất (trong
+    bán kính, còn sức chứa nếu có giới hạn). Trả về (nhóm giữ lại đã bổ sung, node chưa gán được).
+    """
+    keep = [g for g, drop in zip(groups, droppable) if not drop]
+    orphans = [g for g, drop in zip(groups, droppable) if drop]
+    if not orphans:
+        return keep, np.empty(0, dtype=np.intp)
+    orphans = np.sort(np.concatenate(orphans))
+    if not keep:
+        return keep, orphans
+
+    index = GridIndex(coords[orphans])
+    if limit > 0:
+        capacity = [max(limit + 1 - len(g), 0) for g in keep]
+    else:
+        capacity = len(orphans)
+    found = assign_balanced(index, coords[[g[0] for g in keep]], capacity, radius)
+    keep = [np.concatenate((g, orphans[members])) if len(members) else g
+            for g, (members, _) in zip(keep, found)]
+    return keep, orphans[index.alive]
+
+
+# ==================== MENTOR phân cấp ====================
+def hierarchical_plan(nodes, w_threshold=W_THRESHOLD, radius_ratio=RADIUS_RATIO, c=C, limit=LIMIT_ACCESS_NODES,
+                      balanced=BALANCED_ASSIGN, tile_nodes=TILE_NODES, border_ratio=BORDER_RATIO,
+                      max_levels=MAX_LEVELS, workers=WORKERS, mass=None):
+    """
+    MENTOR cho mạng rất lớn:
+    1) chia mặt phẳng thành các ô quadtree (cạnh ô không ngắn hơn TILE_MIN_RADII bán kính),
+       chạy MentorPlanner trên từng ô song song với cùng bán kính truy nhập R * MaxCost của cả mạng;
+    2) ở biên ô, MENTOR từng ô tạo các backbone sát nhau với nhóm bị cắt cụt: backbone theo thưởng
+       có vùng phủ (bán kính, hoặc access node xa nhất nếu nhóm đã đủ limit) chạm cạnh giáp ô khác
+       trong khoảng border_ratio lần bị bỏ, node của chúng về backbone giữ lại gần nhất;
+    3) node không về được backbone nào được lập kế hoạch lại như một mạng mới (chia ô lại theo
+       tập node đó nên ranh giới cũ nằm giữa ô mới; tới max_levels thì chạy phẳng).
+    mass: cột lưu lượng như MentorPlanner (None: traffic, hoặc weight nếu không có traffic), chọn
+    một lần trên cả mạng rồi dùng cho mọi ô để ô và bước hòa giải cùng một tiêu chí backbone loại 1.
+    Trả về (danh sách nhóm - mảng chỉ số node, phần tử đầu là backbone; dict thống kê).
+    """
+    table = nodes if isinstance(nodes, NodeTable) else NodeTable.from_nodes(nodes)
+    coords = table.coords()
+    mass = mass_field(table, mass)
+    type1 = np.asarray(getattr(table, mass)) / c > w_threshold
+    # Như MentorPlanner.max_cost: MaxCost trên các node không phải backbone loại 1
+    radius = radius_ratio * diameter(coords[~type1]) if (~type1).any() else 0.0
+    params = (w_threshold, c, limit, balanced, radius, mass)
+    stats = {"radius": radius, "levels": 0, "tiles": [], "dropped": 0, "reattached": 0, "replanned": 0}
+
+    workers = workers or os.cpu_count() or 1
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        groups = []
+        rest = np.arange(len(table))
+        while len(rest):
+            level = stats["levels"]
+            stats["levels"] += 1
+            sub = table.take(rest)
+            if level + 1 >= max_levels:
+                tiles = [(np.arange(len(rest)), None)]
+            else:
+                tiles = quadtree_tiles(coords[rest], tile_nodes, TILE_MIN_RADII * radius)
+            stats["tiles"].append(len(tiles))
+            with instrument.phase("tile_plans"):
+                level_groups = [rest[g] for g in _plan_tiles(sub, tiles, params, pool)]
+            if len(tiles) == 1:
+                groups += level_groups
+                break
+
+            with instrument.phase("border_reconcile"):
+                border = np.empty(len(coords))
+                border[rest] = border_distances(coords[rest], tiles)
+                droppable = [not type1[g[0]] and border[g[0]] < border_ratio * _reach(coords, g, radius, limit)
+                             for g in level_groups]
+                kept, rest = _reconcile(coords, level_groups, droppable, radius, limit)
+            dropped = int(sum(droppable))
+            stats["dropped"] += dropped
+            stats["reattached"] += sum(len(g) for g, d in zip(level_groups, droppable) if d) - len(rest)
+            stats["replanned"] += len(rest)
+            groups += kept
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    instrument.count("backbones", len(groups))
+    return groups, stats
+
+
+# ==================== Đánh giá và so sánh với bản phẳng ====================
+def design_cost(coords, groups):
+    """Số backbone, tổng chi phí truy nhập (Σ khoảng cách access node - backbone) và nhóm lớn nhất."""
+    if not groups:
+        return {"backbones": 0, "access_cost": 0.0, "max_group": 0}
+    members = np.concatenate([g[1:] for g in groups])
+    heads = np.concatenate([np.full(len(g) - 1, g[0]) for g in groups])
+    cost = float(pair_distances(coords[members], coords[heads]).sum()) if len(members) else 0.0
+    return {"backbones": len(groups), "access_cost": round(cost, 2), "max_group": max(len(g) for g in groups)}
+
+
+def _check_partition(n, groups):
+    seen = np.zeros(n, dtype=np.int64)
+    for g in groups:
+        seen[g] += 1
+    if not (seen == 1).all():
+        raise RuntimeError("Kết quả phân cấp không phủ mỗi node đúng một lần")
+
+
+def compare_with_flat(nodes, w_threshold=W_THRESHOLD, radius_ratio=RADIUS_RATIO, c=C, limit=LIMIT_ACCESS_NODES,
+                      balanced=BALANCED_ASSIGN, mass=None, **kwargs):
+    """Chạy cả MENTOR phẳng (MentorPlanner) và bản phân cấp, trả về chi phí, thời gian và độ chênh (%)."""
+    table = nodes if isinstance(nodes, NodeTable) else NodeTable.from_nodes(nodes)
+    coords = table.coords()
+    mass = mass_field(table, mass)
+
+    start = time.perf_counter()
+    flat = MentorPlanner(table, mass=mass).plan(w_threshold, radius_ratio, c, limit, balanced)
+    flat_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hier, stats = hierarchical_plan(table, w_threshold, radius_ratio, c, limit, balanced, mass=mass, **kwargs)
+    hier_time = time.perf_counter() - start
+    _check_partition(len(table), hier)
+
+    result = {"flat": design_cost(coords, flat), "hier": design_cost(coords, hier), "stats": stats}
+    result["flat"]["time"] = round(flat_time, 3)
+    result["hier"]["time"] = round(hier_time, 3)
+    result["gap"] = {key: round(100 * (result["hier"][key] - result["flat"][key]) / result["flat"][key], 2)
+                     for key in ("backbones", "access_cost") if result["flat"][key]}
+    return result
+
+
+# ==================== Kiểm tra ====================
+def check_mass(n=20000, seed=1, workers=1):
+    """
+    Mạng có traffic khác weight (1/4 số node có traffic vượt ngưỡng, weight thì không): với
+    mass="weight", một ô duy nhất phải cho đúng kết quả MentorPlanner(mass="weight"), còn khi chia
+    nhiều ô thì mọi backbone loại 1 theo weight được giữ và các ô không lấy traffic làm ngưỡng.
+    """
+    from instance_gen import generate
+    table = generate(seed, n)
+    rng = np.random.default_rng(seed)
+    table.traffic[:] = np.where(rng.random(n) < 0.25, C * W_THRESHOLD + 1, 0)
+    by_weight = table.weight / C > W_THRESHOLD
+    by_traffic_only = (table.traffic / C > W_THRESHOLD) & ~by_weight
+
+    flat = MentorPlanner(table, mass="weight").plan(radius_ratio=RADIUS_RATIO)
+    single, _ = hierarchical_plan(table, tile_nodes=n, workers=workers, mass="weight")
+    if [g.tolist() for g in single] != [g.tolist() for g in flat]:
+        raise AssertionError("Một ô với mass=\"weight\" khác MentorPlanner(mass=\"weight\")")
+
+    groups, stats = hierarchical_plan(table, tile_nodes=n // 16, workers=workers, mass="weight")
+    _check_partition(n, groups)
+    heads = np.array([g[0] for g in groups])
+    if stats["tiles"][0] < 2 or not np.isin(np.flatnonzero(by_weight), heads).all():
+        raise AssertionError("Backbone loại 1 theo weight bị bỏ khi chia ô")
+    if len(heads) >= by_traffic_only.sum():
+        raise AssertionError("Các ô vẫn chọn backbone loại 1 theo traffic khi mass=\"weight\"")
+    return stats
+
+
+if __name__ == "__main__":
+    # Ví dụ: python mentor_hier.py 1000000 8 1  (1 triệu node theo instance_gen với seed 1, 8 worker)
+    #        python mentor_hier.py --check        (kiểm tra chọn cột lưu lượng mass="weight")
+    if "--check" in sys.argv:
+        print(f"mass=\"weight\": ok {check_mass()}")
+        sys.exit(0)
+    from instance_gen import load_instance
+    args = sys.argv[1:]
+    n = int(args[0]) if len(args) > 0 else 200000
+    workers = int(args[1]) if len(args) > 1 else WORKERS
+    table = load_instance(int(args[2]) if len(args) > 2 else 1, n)
+    if n <= FLAT_COMPARE_LIMIT:
+        result = compare_with_flat(table, workers=workers)
+        for name in ("flat", "hier"):
+            print(f"{name:>5}: {result[name]}")
+        print(f"Chênh lệch so với bản phẳng (%): {result['gap']}")
+        print(f"Phân cấp: {result['stats']}")
+    else:
+        start = time.perf_counter()
+        groups, stats = hierarchical_plan(table, workers=workers)
+        print(design_cost(table.coords(), groups), f"{time.perf_counter() - start:.2f}s")
+        print(f"Phân cấp: {stats}")
@@ -0,0 +1,157 @@
+import numpy as np
+import instrument
+from distance_engine import to_coords, convex_hull, diameter
+from spatial_index import GridIndex, assign_balanced
+from reward import RewardPool
+from node_store import NodeTable
+
+# ==================== Tham số mặc định (như Y2.py) ====================
+W_THRESHOLD = 2
+RADIUS_RATIO = 0.3
+C = 14
+LIMIT_ACCESS_NODES = 0
+BALANCED_ASSIGN = False
+
+
+def mass_field(table, mass=None):
+    """
+    Cột dùng làm lưu lượng cho ngưỡng backbone và giá trị thưởng. Mặc định traffic như Y2.py; node
+    của MENTOR.py / Test.py không có traffic (bảng điền 0) nên khi cả cột bằng 0 thì dùng weight
+    như hai file đó, tránh trọng tâm không xác định (tổng khối lượng bằng 0).
+    """
+    if mass is not None:
+        return mass
+    return "traffic" if table.traffic.any() else "weight"
+
+
+# ==================== MENTOR trên một tập node cố định ====================
+class MentorPlanner:
+    """
+    Chạy MENTOR theo đúng các bước của Y2.py nhiều lần trên cùng một tập node. Tọa độ, lưu lượng,
+    chỉ mục không gian và bao lồi (MaxCost) được dựng một lần trong __init__; mỗi lần plan() chỉ
+    đặt lại mặt nạ node chưa gán nên quét hàng nghìn bộ tham số chỉ tốn một lần tiền xử lý.
+    """
+
+    def __init__(self, nodes, mass=None, metric="euclidean"):
+        self.table = nodes if isinstance(nodes, NodeTable) else NodeTable.from_nodes(nodes)
+        self.ids = self.table.id.copy()
+        self.coords = to_coords(self.table.coords())
+        self.mass_field = mass_field(self.table, mass)
+        self.mass = np.asarray(getattr(self.table, self.mass_field))
+        self.metric = metric
+        self.index = GridIndex(self.coords, metric=metric)
+        self._hull = np.zeros(len(self.coords), dtype=bool)
+        self._hull[convex_hull(self.coords)] = True
+        self._max_cost = {}
+
+    def __len__(self):
+        return len(self.coords)
+
+    def max_cost(self, backbones):
+        """
+        MaxCost của các node còn lại sau khi bỏ backbone loại 1. Đường kính chỉ đổi khi bỏ một
+        đỉnh bao lồi; kết quả được nhớ theo tập backbone (chỉ phụ thuộc ngưỡng w * c).
+        """
+        key = tuple(backbones.tolist()) if self._hull[backbones].any() else ()
+        if key not in self._max_cost:
+            keep = np.ones(len(self.coords), dtype=bool)
+            keep[list(key)] = False
+            self._max_cost[key] = diameter(self.coords[keep], self.metric)
+        return self._max_cost[key]
+
+    def _attach(self, center, radius, limit):
+        # Node chưa gán trong bán kính, sắp theo khoảng cách (hòa giữ thứ tự danh sách), backbone đứng đầu;
+        # khi có giới hạn chỉ lấy limit + 1 node gần nhất (có thể gồm chính backbone)
+        x, y = self.coords[center]
+        if limit > 0:
+            in_range, dist = self.index.query_knn(x, y, limit + 1, max_dist=radius)
+        else:
+            in_range, dist = self.index.query_radius(x, y, radius)
+        keep = in_range != center
+        members = np.concatenate(([center], in_range[keep]))
+        order = np.argsort(np.concatenate(([0.0], dist[keep])), kind="stable")
+        members = members[order]
+        if limit > 0:
+            members = members[:limit + 1]
+        self.index.remove(members)
+        return members
+
+    @instrument.traced("MentorPlanner.plan")
+    def plan(self, w_threshold=W_THRESHOLD, radius_ratio=RADIUS_RATIO, c=C, limit=LIMIT_ACCESS_NODES,
+             balanced=BALANCED_ASSIGN, radius=None):
+        """
+        Một lần chạy MENTOR, trả về danh sách nhóm: mảng chỉ số node (theo thứ tự trong tập),
+        phần tử đầu là backbone. limit > 0 giới hạn số access node của mỗi backbone; balanced
+        (như Y2.BALANCED_ASSIGN) gán các backbone loại 1 cùng lượt, node về backbone gần nhất còn chỗ.
+        radius: bán kính truy nhập cố định thay cho radius_ratio * MaxCost (vd. khi chạy theo từng ô).
+        """
+        self.index.reset()
+        # Bước 2.1: backbone do lưu lượng chuẩn hóa lớn hơn ngưỡng
+        with instrument.phase("backbone_threshold"):
+            backbones = np.flatnonzero(self.mass / c > w_threshold)
+            self.index.remove(backbones)
+        with instrument.phase("max_cost"):
+            if radius is None:
+                radius = radius_ratio * self.max_cost(backbones)
+        with instrument.phase("radius_assignment"):
+            if balanced and limit > 0:
+                found = assign_balanced(self.index, self.coords[backbones], limit, radius)
+                groups = [np.concatenate(([b], members)) for b, (members, _) in zip(backbones.tolist(), found)]
+            else:
+                groups = [self._attach(b, radius, limit) for b in backbones.tolist()]
+
+        # Bước 2.2: chọn backbone theo giá trị thưởng cho các node còn lại
+        pool = RewardPool(self.coords, self.mass, active=self.index.alive)
+        with instrument.phase("reward_rounds"):
+            while len(pool):
+                unassigned = pool.indices()
+                center = pool.center()
+                xtt, ytt = (0, 0) if center is None else center  # Tổng khối lượng còn lại bằng 0 (như Test.py)
+                dc = pool.distances(unassigned, xtt, ytt)
+                tr = self.mass[unassigned]
+                maxw = max(1, tr.max())
+                maxdc = max(1, pool.farthest(xtt, ytt)[1])
+                award = (0.5 * (maxdc - dc / maxdc)) + (0.5 * tr / maxw)
+                best = int(unassigned[np.argmax(award)])
+                with instrument.phase("radius_assignment"):
+                    groups.append(self._attach(best, radius, limit))
+                pool.sync(self.index.alive)
+                instrument.count("reward_rounds")
+        instrument.count("backbones", len(groups))
+        return groups
+
+    # ---------- Chuyển kết quả ----------
+    def group_ids(self, groups):
+        return [self.ids[g].tolist() for g in groups]
+
+    def to_mentor_groups(self, groups, fields=None):
+        """Dạng dict của mentor_groups.json, đưa thẳng vào Esau-Williams mà không cần ghi file."""
+        return [{"backbone": self.table.to_dicts(g[:1], fields)[0],
+                 "access_nodes": self.table.to_dicts(g[1:], fields)} for g in groups]
+
+
+# ==================== Kiểm tra ====================
+def check_traffic_less(seed=1):
+    """
+    Node của MENTOR.py / Test.py không có traffic: plan() phải chạy được, dùng weight, và cho đúng
+    kết quả như khi chỉ định mass="weight"; mass="traffic" (cả cột bằng 0) cũng không được lỗi.
+    """
+    import MENTOR
+    import Test
+    for module in (MENTOR, Test):
+        nodes = module.initialize_network(seed=seed)
+        planner = MentorPlanner(nodes)
+        groups = planner.group_ids(planner.plan())
+        expected = MentorPlanner(nodes, mass="weight")
+        if planner.mass_field != "weight" or groups != expected.group_ids(expected.plan()):
+            raise AssertionError(f"{module.__name__}: MentorPlanner không dùng weight khi thiếu traffic")
+        strict = MentorPlanner(nodes, mass="traffic")
+        covered = sorted(i for g in strict.group_ids(strict.plan()) for i in g)
+        if covered != sorted(planner.ids.tolist()):
+            raise AssertionError(f"{module.__name__}: mass=\"traffic\" không phủ mỗi node đúng một lần")
+    return True
+
+
+if __name__ == "__main__":
+    check_traffic_less()
+    print("MentorPlanner với node không có traffic (MENTOR.py, Test.py): ok")
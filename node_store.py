@@ -0,0 +1,343 @@
+import json
+import numpy as np
+
+# ==================== Cột dữ liệu và cờ ====================
+# Mỗi node là một hàng trong các mảng NumPy cùng độ dài (struct-of-arrays): khoảng 45 byte/node,
+# một triệu node chiếm vài chục MB thay vì vài GB object Python.
+COLUMNS = ("id", "x", "y", "weight", "traffic", "flags", "group")
+INT_COLUMNS = ("id", "flags", "group")
+FLAG_BACKBONE = 1
+NO_GROUP = -1
+# Các trường ghi ra mentor_groups.json như Y2.py. Test.py không ghi traffic nên bảng đọc từ file
+# (from_mentor_groups) nhớ các trường có trong file và mặc định ghi lại đúng các trường đó.
+JSON_FIELDS = ("id", "x", "y", "weight", "traffic")
+
+_DTYPES = {"flags": np.uint8, "group": np.int32}
+
+
+def _column(values, name):
+    """Mảng cho một cột: id/flags/group có kiểu cố định, tọa độ/trọng số giữ int nếu dữ liệu toàn số nguyên."""
+    if name in _DTYPES:
+        return np.asarray(values, dtype=_DTYPES[name])
+    if name == "id":
+        return np.asarray(values, dtype=np.int64)
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iub":
+        return arr.astype(np.int64)
+    return arr.astype(np.float64)
+
+
+def _field(node, *names, default=None):
+    for name in names:
+        if isinstance(node, dict):
+            if name in node:
+                return node[name]
+        elif hasattr(node, name):
+            return getattr(node, name)
+    return default
+
+
+def _node_id(node, index):
+    """Id của node: 'id', 'name' (EsauWilliam) hoặc số trong tên 'P<i>' (Node.py); không có thì lấy index + 1."""
+    value = _field(node, "id", "name", "ten")
+    if isinstance(value, str):
+        digits = value.lstrip("Pp")
+        return int(digits) if digits.isdigit() else index + 1
+    return index + 1 if value is None else value
+
+
+# ==================== View gọn cho từng node ====================
+def _view_property(name):
+    def getter(self):
+        return self.table._cols[name][self.index].item()
+
+    def setter(self, value):
+        self.table.set(self.index, name, value)
+
+    return property(getter, setter)
+
+
+class NodeView:
+    """
+    View mỏng trỏ tới một hàng của NodeTable (chỉ giữ bảng và chỉ số), có các thuộc tính
+    và getter giống các lớp Node cũ nên dùng được cho to_coords, GridIndex, hàm vẽ...
+    """
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    id = _view_property("id")
+    x = _view_property("x")
+    y = _view_property("y")
+    weight = _view_property("weight")
+    traffic = _view_property("traffic")
+    group = _view_property("group")
+
+    @property
+    def is_backbone(self):
+        return bool(self.table._cols["flags"][self.index] & FLAG_BACKBONE)
+
+    @is_backbone.setter
+    def is_backbone(self, value):
+        self.table.set_flag(self.index, FLAG_BACKBONE, value)
+
+    def get_id(self): return self.id
+    def get_position_x(self): return self.x
+    def get_position_y(self): return self.y
+    def get_weight(self): return self.weight
+    def get_traffic(self): return self.traffic
+
+    def to_dict(self, fields=None):
+        return {name: getattr(self, name) for name in fields or self.table.json_fields}
+
+    def __repr__(self):
+        return f"NodeView(id={self.id}, x={self.x}, y={self.y}, weight={self.weight})"
+
+
+# ==================== Bảng node dạng cột ====================
+class NodeTable:
+    """
+    Bảng node chung cho mọi module: các cột id, x, y, weight, traffic, flags (bit FLAG_BACKBONE)
+    và group (số thứ tự nhóm MENTOR, NO_GROUP nếu chưa có) là mảng NumPy. Thuộc tính cột trả
+    về view độ dài len(table); table[i] trả về NodeView; append() tăng dung lượng gấp đôi khi đầy.
+    """
+
+    def __init__(self, id=(), x=(), y=(), weight=None, traffic=None, flags=None, group=None):
+        n = len(id)
+        data = {
+            "id": id, "x": x, "y": y,
+            "weight": np.ones(n, dtype=np.int64) if weight is None else weight,
+            "traffic": np.zeros(n, dtype=np.int64) if traffic is None else traffic,
+            "flags": np.zeros(n, dtype=np.uint8) if flags is None else flags,
+            "group": np.full(n, NO_GROUP, dtype=np.int32) if group is None else group,
+        }
+        self._cols = {name: _column(data[name], name) for name in COLUMNS}
+        for name in COLUMNS:
+            if len(self._cols[name]) != n:
+                raise ValueError(f"Cột {name} có {len(self._cols[name])} phần tử, cần {n}")
+        self.n = n
+        self.json_fields = JSON_FIELDS  # Trường mặc định của to_dicts / to_mentor_groups / save_json
+
+    id = property(lambda self: self._cols["id"][:self.n])
+    x = property(lambda self: self._cols["x"][:self.n])
+    y = property(lambda self: self._cols["y"][:self.n])
+    weight = property(lambda self: self._cols["weight"][:self.n])
+    traffic = property(lambda self: self._cols["traffic"][:self.n])
+    flags = property(lambda self: self._cols["flags"][:self.n])
+    group = property(lambda self: self._cols["group"][:self.n])
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        return NodeView(self, i)
+
+    def __iter__(self):
+        return (NodeView(self, i) for i in range(self.n))
+
+    @property
+    def nbytes(self):
+        return sum(self._cols[name][:self.n].nbytes for name in COLUMNS)
+
+    def coords(self):
+        """Mảng tọa độ (N, 2) float64 cho distance_engine / spatial_index."""
+        return np.column_stack((self.x, self.y)).astype(np.float64)
+
+    def backbone_mask(self):
+        return (self.flags & FLAG_BACKBONE) != 0
+
+    def index_of(self):
+        """Dict id -> chỉ số hàng."""
+        return dict(zip(self.id.tolist(), range(self.n)))
+
+    # ---------- Ghi dữ liệu ----------
+    def set(self, i, name, value):
+        col = self._cols[name]
+        # Cột số nguyên nhận giá trị thực (vd tọa độ làm tròn 2 chữ số) thì chuyển cả cột sang float
+        if col.dtype.kind in "iu" and name not in INT_COLUMNS and value != int(value):
+            col = self._cols[name] = col.astype(np.float64)
+        col[i] = value
+
+    def set_flag(self, i, flag, on=True):
+        flags = self._cols["flags"]
+        flags[i] = flags[i] | flag if on else flags[i] & ~flag
+
+    def append(self, id, x, y, weight=1, traffic=0, flags=0, group=NO_GROUP):
+        """Thêm một node, trả về NodeView của nó."""
+        if self.n == len(self._cols["id"]):
+            capacity = max(16, 2 * self.n)
+            for name in COLUMNS:
+                col = self._cols[name]
+                grown = np.empty(capacity, dtype=col.dtype)
+                grown[:self.n] = col[:self.n]
+                self._cols[name] = grown
+        i = self.n
+        self.n += 1
+        for name, value in zip(COLUMNS, (id, x, y, weight, traffic, flags, group)):
+            self.set(i, name, value)
+        return NodeView(self, i)
+
+    # ---------- Chuyển đổi từ dạng cũ ----------
+    @classmethod
+    def from_nodes(cls, nodes, group=NO_GROUP):
+        """
+        Dựng bảng từ danh sách node bất kỳ: dict kiểu mentor_groups.json, Node của MENTOR / Y2 /
+        EsauWilliam / Node.py hoặc NodeView. Trường thiếu lấy mặc định (weight 1, traffic 0).
+        """
+        nodes = list(nodes)
+        return cls(
+            id=[_node_id(nd, i) for i, nd in enumerate(nodes)],
+            x=[_field(nd, "x") for nd in nodes],
+            y=[_field(nd, "y") for nd in nodes],
+            weight=_column([_field(nd, "weight", default=1) for nd in nodes], "weight"),
+            traffic=_column([_field(nd, "traffic", default=0) for nd in nodes], "traffic"),
+            flags=[FLAG_BACKBONE if _field(nd, "is_backbone", default=False) else 0 for nd in nodes],
+            group=np.full(len(nodes), group, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_mentor_groups(cls, groups):
+        """
+        Từ danh sách nhóm {'backbone': {...}, 'access_nodes': [...]}: nhóm thứ g (từ 0) ghi vào cột group.
+        Bảng nhớ các trường có trong dữ liệu (luôn gồm id, x, y) để ghi ra lại đúng như vậy.
+        """
+        parts = []
+        present = {"id", "x", "y"}
+        for g, group in enumerate(groups):
+            nodes = [group["backbone"]] + group["access_nodes"]
+            part = cls.from_nodes(nodes, group=g)
+            part.flags[0] |= FLAG_BACKBONE
+            parts.append(part)
+            for nd in nodes:
+                present.update(nd)
+        table = cls.concat(parts)
+        table.json_fields = tuple(name for name in JSON_FIELDS if name in present)
+        return table
+
+    @classmethod
+    def load_json(cls, filename="mentor_groups.json"):
+        with open(filename, "r", encoding="utf-8") as f:
+            return cls.from_mentor_groups(json.load(f))
+
+    @classmethod
+    def concat(cls, tables):
+        if not tables:
+            return cls()
+        return cls(**{name: np.concatenate([t._cols[name][:t.n] for t in tables]) for name in COLUMNS})
+
+    def take(self, indices):
+        """Bảng con gồm các hàng indices (theo đúng thứ tự đó)."""
+        indices = np.asarray(indices, dtype=np.intp)
+        table = type(self)(**{name: self._cols[name][:self.n][indices] for name in COLUMNS})
+        table.json_fields = self.json_fields
+        return table
+
+    # ---------- Chuyển đổi sang dạng cũ ----------
+    def to_dicts(self, indices=None, fields=None):
+        indices = range(self.n) if indices is None else indices
+        fields = fields or self.json_fields
+        columns = [self._cols[name] for name in fields]
+        return [dict(zip(fields, (col[i].item() for col in columns))) for i in indices]
+
+    def to_mentor_groups(self, fields=None):
+        """Ngược với from_mentor_groups: mỗi nhóm gồm backbone (node có cờ) và các access node theo thứ tự hàng."""
+        result = []
+        order = np.argsort(self.group, kind="stable")
+        groups, starts = np.unique(self.group[order], return_index=True)
+        for g, members in zip(groups.tolist(), np.split(order, starts[1:])):
+            if g == NO_GROUP:
+                continue
+            is_backbone = self.backbone_mask()[members]
+            backbone = members[is_backbone][:1]
+            access = np.setdiff1d(members, backbone, assume_unique=True)
+            result.append({"backbone": self.to_dicts(backbone, fields)[0] if len(backbone) else None,
+                           "access_nodes": self.to_dicts(access, fields)})
+        return result
+
+    def save_json(self, filename="mentor_groups.json", fields=None):
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.to_mentor_groups(fields), f, indent=2)
+
+    def to_objects(self, factory):
+        """Danh sách object tạo bởi factory(view) cho từng node."""
+        return [factory(NodeView(self, i)) for i in range(self.n)]
+
+
+# ==================== Chuyển sang các lớp Node cũ ====================
+def to_mentor_nodes(table):
+    from MENTOR import Node
+
+    def make(v):
+        node = Node(v.id, v.x, v.y, v.weight)
+        node.is_backbone = v.is_backbone
+        return node
+    return table.to_objects(make)
+
+
+def to_y2_nodes(table):
+    from Y2 import Node
+
+    def make(v):
+        node = Node(v.id, v.x, v.y, v.weight, v.traffic)
+        node.is_backbone = v.is_backbone
+        return node
+    return table.to_objects(make)
+
+
+def to_ew_nodes(table):
+    from EsauWilliam import Node
+
+    def make(v):
+        node = Node()
+        node.create_name(v.id)
+        node.set_position(v.x, v.y)
+        node.set_weight(v.weight)
+        node.traffic = v.traffic
+        return node
+    return table.to_objects(make)
+
+
+def to_point_nodes(table):
+    from Node import Node
+    return table.to_objects(lambda v: Node(f"P{v.id}", v.x, v.y))
+
+
+# ==================== Kiểm tra đọc / ghi ====================
+def _round_trip(groups, name):
+    again = NodeTable.from_mentor_groups(groups).to_mentor_groups()
+    if again != groups:
+        raise AssertionError(f"{name}: dữ liệu đọc vào rồi ghi lại không khớp với bản gốc")
+    return len(groups)
+
+
+def check_round_trip(filename="mentor_groups.json"):
+    """Đọc file mentor_groups rồi chuyển ngược lại: kết quả phải trùng khớp với nội dung file."""
+    with open(filename, "r", encoding="utf-8") as f:
+        return _round_trip(json.load(f), filename)
+
+
+def check_writers(seed=1, group_size=10):
+    """Như check_round_trip cho dữ liệu do Test.py (không có traffic) và Y2.py (có traffic) sinh ra."""
+    import Test
+    import Y2
+    nodes = Test.initialize_network(seed=seed)
+    groups = [nodes[i:i + group_size] for i in range(0, len(nodes), group_size)]
+    _round_trip(Test.prepare_for_esau_williams(groups), "Test.prepare_for_esau_williams")
+    table = NodeTable.from_nodes(Y2.initialize_network(seed=seed))
+    table.group[:] = np.arange(len(table)) // group_size
+    table.flags[::group_size] |= FLAG_BACKBONE
+    return _round_trip(table.to_mentor_groups(), "Y2 (id, x, y, weight, traffic)")
+
+
+if __name__ == "__main__":
+    import sys
+    check_writers()
+    print("Test.py / Y2.py: đọc/ghi khớp")
+    for name in sys.argv[1:] or ["mentor_groups.json"]:
+        print(f"{name}: {check_round_trip(name)} nhóm, đọc/ghi khớp")
@@ -0,0 +1,237 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Lớp vẽ hình tách khỏi phần tính toán: matplotlib (và networkx) chỉ được nạp khi thật sự vẽ.
+# Mỗi hàm vẽ nhận thêm out: None thì hiện cửa sổ như trước, còn đường dẫn thì ghi hình ra file
+# qua một Figure riêng gắn canvas Agg (không cần màn hình), không đổi backend chung của pyplot
+# nên các lần vẽ out=None sau đó vẫn hiện cửa sổ bình thường.
+
+
+# ==================== Nạp matplotlib khi cần ====================
+def _figure(out=None, figsize=None):
+    """
+    Trả về (fig, ax). out=None: figure của pyplot để plt.show() hiện cửa sổ.
+    Có out: Figure độc lập với canvas Agg, không đi qua pyplot nên không đổi backend và
+    vẽ được từ luồng nền.
+    """
+    if out is None:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=figsize)
+        return fig, fig.add_subplot()
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def _finish(fig, out):
+    if out is None:
+        import matplotlib.pyplot as plt
+        plt.show()
+        return None
+    fig.savefig(out, dpi=120)
+    return out
+
+
+# ==================== Ghi hình ở luồng nền ====================
+class FigureWriter:
+    """
+    Ghi hình ra file trong một luồng nền: các hình được vẽ tuần tự trong luồng đó trên Figure
+    Agg riêng (không dùng pyplot), luồng chính chỉ gửi dữ liệu rồi tính tiếp. close() chờ ghi xong và báo lỗi (nếu có).
+    """
+
+    def __init__(self, out_dir="."):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._futures = []
+
+    def submit(self, draw, *args, filename, **kwargs):
+        path = os.path.join(self.out_dir, filename)
+        self._futures.append(self._pool.submit(draw, *args, out=path, **kwargs))
+        return path
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        for future in self._futures:
+            future.result()
+        self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ==================== Vẽ kết quả MENTOR ====================
+def draw_topology(nodes, backbones, access_map, out=None):
+    fig, ax = _figure(out)
+
+    for node in nodes:
+        color = "red" if node.is_backbone else "blue"
+        ax.scatter(node.x, node.y, c=color)
+        ax.text(node.x, node.y, str(node.id), fontsize=8)
+    for bb in backbones:
+        for acc_id in access_map.get(bb.id, []):
+            acc = next(n for n in nodes if n.id == acc_id)
+            ax.plot([bb.x, acc.x], [bb.y, acc.y], 'gray', linestyle="--", linewidth=0.5)
+    ax.set_title("Backbone and Access Nodes")
+    return _finish(fig, out)
+
+
+# ==================== Vẽ kết quả Y2 (MENTOR) ====================
+def matplot_mentor(mentor_list, max_coord, out=None):
+    fig, ax = _figure(out, figsize=(10, 10))
+    for group in mentor_list:
+        if group:
+            backbone = group[0]
+            ax.scatter(backbone.x, backbone.y, color='red', s=100, label='Backbone' if group == mentor_list[0] else "")
+            ax.text(backbone.x, backbone.y, str(backbone.id), fontsize=9)
+            for i in range(1, len(group)):
+                terminal_node = group[i]
+                ax.scatter(terminal_node.x, terminal_node.y, color='blue', s=50, label='Access Node' if group == mentor_list[0] and i == 1 else "")
+                ax.plot([backbone.x, terminal_node.x], [backbone.y, terminal_node.y], 'gray', linestyle='--')
+                ax.text(terminal_node.x, terminal_node.y, str(terminal_node.id), fontsize=8)
+    ax.set_xlim(0, max_coord)
+    ax.set_ylim(0, max_coord)
+    ax.set_xlabel("X Coordinate")
+    ax.set_ylabel("Y Coordinate")
+    ax.set_title("MENTOR Algorithm Result")
+    ax.legend()
+    ax.grid(True)
+    return _finish(fig, out)
+
+
+# ==================== Vẽ kết quả Test (MENTOR) ====================
+def visualize_mentor(groups, max_coord, out=None):
+    import matplotlib
+    fig, ax = _figure(out, figsize=(12, 12))
+    colors = matplotlib.colormaps["tab20"].colors
+
+    for i, group in enumerate(groups):
+        if not group:
+            continue
+
+        backbone = group[0]
+        color = colors[i % len(colors)]
+
+        # Vẽ backbone node
+        ax.scatter(backbone.x, backbone.y, s=400, c=[color], marker="s", edgecolors="black", zorder=5)
+        ax.text(backbone.x, backbone.y, f"B{backbone.id}", fontsize=10, ha="center", va="center", fontweight="bold")
+
+        # Vẽ access nodes và đường kết nối
+        for node in group[1:]:
+            ax.scatter(node.x, node.y, s=200, c=[color], marker="o", edgecolors="black", alpha=0.8)
+            ax.text(node.x, node.y, f"A{node.id}", fontsize=9, ha="center", va="center")
+            ax.plot([backbone.x, node.x], [backbone.y, node.y], color=color, linestyle="--", alpha=0.6)
+
+    ax.set_title("MENTOR ALGORITHM RESULTS", fontsize=14)
+    ax.set_xlabel("X Coordinate")
+    ax.set_ylabel("Y Coordinate")
+    ax.grid(True, linestyle="--", alpha=0.7)
+    ax.set_xlim(0, max_coord)
+    ax.set_ylim(0, max_coord)
+    fig.tight_layout()
+    return _finish(fig, out)
+
+
+# ==================== Vẽ kết quả Y3 (Esau-Williams) ====================
+def plot_tree(edges, nodes, hub_id, out=None):
+    import networkx as nx
+
+    G = nx.DiGraph()
+    pos = {nid: (node['x'], node['y']) for nid, node in nodes.items()}
+
+    # Thêm node vào đồ thị với thuộc tính màu
+    for nid, node in nodes.items():
+        G.add_node(nid)
+
+    # Thêm các cạnh vào đồ thị
+    for src, dst, cost in edges:
+        G.add_edge(src, dst, weight=round(cost, 2))
+
+    fig, ax = _figure(out, figsize=(10, 8))
+    ax.set_title("Cây truy nhập Esau-Williams", fontsize=14, fontweight='bold')
+    ax.set_xlabel("X")
+    ax.set_ylabel("Y")
+    ax.grid(True, linestyle='--', alpha=0.5)
+
+    # Màu và kích cỡ node
+    node_colors = ['red' if nid == hub_id else 'skyblue' for nid in G.nodes()]
+    node_sizes = [200 if nid == hub_id else 200 for nid in G.nodes()]
+    node_border_colors = ['black' if nid == hub_id else 'gray' for nid in G.nodes()]
+
+    # Vẽ nodes
+    nx.draw_networkx_nodes(G, pos, node_size=node_sizes, node_color=node_colors, edgecolors=node_border_colors, linewidths=1.5,
+                           ax=ax)
+    nx.draw_networkx_labels(G, pos, font_size=9, font_weight='bold', ax=ax)
+
+    # Vẽ edges
+    nx.draw_networkx_edges(G, pos, edge_color='gray', arrows=False, width=2, alpha=0.7, ax=ax)
+
+    # Vẽ trọng số cạnh
+    edge_labels = nx.get_edge_attributes(G, 'weight')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8, ax=ax)
+
+    fig.tight_layout()
+    return _finish(fig, out)
+
+
+# ==================== Vẽ kết quả Y4 (Esau-Williams giới hạn hop) ====================
+def draw_access_tree(nodes, edges, hop_count, hub_id, max_hop=4, out=None):
+    import networkx as nx
+
+    G = nx.Graph()
+    pos = {}
+    node_colors = []
+    labels = {}
+
+    for node_id, node in nodes.items():
+        G.add_node(node_id)
+        pos[node_id] = (node['x'], node['y'])
+        if node_id == hub_id:
+            node_colors.append('red')
+            labels[node_id] = f"Hub {node_id}"
+        else:
+            hop = hop_count.get(node_id, '?')
+            labels[node_id] = f"{node_id} (h={hop})"
+            node_colors.append('lightgreen' if hop <= max_hop else 'salmon')
+
+    for src, dst, cost in edges:
+        G.add_edge(src, dst, weight=round(cost, 2))
+
+    fig, ax = _figure(out, figsize=(8, 6))
+    nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=500, ax=ax)
+    nx.draw_networkx_labels(G, pos, labels=labels, font_size=9, ax=ax)
+    nx.draw_networkx_edges(G, pos, width=1.5, alpha=0.7, edge_color='gray', ax=ax)
+    edge_labels = nx.get_edge_attributes(G, 'weight')
+    nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=8, ax=ax)
+
+    ax.set_title(f"Cây truy nhập (giới hạn hop = {max_hop})")
+    ax.set_xlabel("X"); ax.set_ylabel("Y")
+    ax.axis('equal'); ax.grid(True)
+    return _finish(fig, out)
+
+
+# ==================== Vẽ kết quả EsauWilliam ====================
+def draw_esau_tree(subnet_nodes, MAX, out=None):
+    fig, ax = _figure(out)
+
+    xpos = [n.get_position_x() for n in subnet_nodes]
+    ypos = [n.get_position_y() for n in subnet_nodes]
+
+    for node in subnet_nodes:
+        ax.text(node.get_position_x(), node.get_position_y(), str(node.get_name()), fontsize=8,
+                bbox=dict(facecolor='yellow' if node == subnet_nodes[0] else 'white', edgecolor='black', boxstyle='round'))
+        for conn_id in node.get_list_connect():
+            conn_node = next(n for n in subnet_nodes if n.get_name() == conn_id)
+            ax.plot([node.get_position_x(), conn_node.get_position_x()],
+                    [node.get_position_y(), conn_node.get_position_y()], 'k-')
+
+    ax.plot(xpos, ypos, 'ro')
+    ax.set_title(f"Cay Esau-Williams: Backbone {subnet_nodes[0].get_name()}")
+    ax.axis([-0.05*MAX, 1.05*MAX, -0.05*MAX, 1.05*MAX])
+    ax.grid(True)
+    return _finish(fig, out)
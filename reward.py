@@ -0,0 +1,78 @@
+import numpy as np
+from distance_engine import to_coords, point_distances, convex_hull
+
+# Số node bị bỏ tối đa trước khi các tổng được tính lại chính xác từ mặt nạ (chống sai số float tích lũy)
+REFRESH_EVERY = 1024
+
+
+# ==================== Tập node chưa gán cho vòng chọn theo thưởng ====================
+class RewardPool:
+    """
+    Các node chưa gán của pha chọn backbone theo thưởng (MENTOR, Y2, Test): mặt nạ boolean trên
+    mảng tọa độ và khối lượng (weight hoặc traffic) của toàn mạng, chỉ số theo thứ tự danh sách node.
+    Các tổng Σw·x, Σw·y, Σw được trừ dần khi node rời tập nên trọng tâm không phải tính lại;
+    node xa trọng tâm nhất luôn là một đỉnh bao lồi của tập, bao lồi chỉ dựng lại khi mất đỉnh.
+    """
+
+    def __init__(self, nodes, mass, active=None):
+        self.coords = to_coords(nodes)
+        self.mass = np.asarray(mass, dtype=np.float64)
+        n = len(self.coords)
+        self.active = np.ones(n, dtype=bool) if active is None else np.array(active, dtype=bool)
+        self._hull = None
+        self.refresh()
+
+    def refresh(self):
+        """Tính lại chính xác số node và các tổng từ mặt nạ."""
+        self.count = int(self.active.sum())
+        m = self.mass * self.active
+        self.sum_wx = float(np.dot(m, self.coords[:, 0]))
+        self.sum_wy = float(np.dot(m, self.coords[:, 1]))
+        self.sum_w = float(m.sum())
+        self._removed = 0
+
+    def __len__(self):
+        return self.count
+
+    def remove(self, idx):
+        """Bỏ các node (chỉ số hoặc mảng chỉ số) khỏi tập; node đã bỏ trước đó được bỏ qua."""
+        idx = np.atleast_1d(np.asarray(idx, dtype=np.int64))
+        idx = np.unique(idx[self.active[idx]])
+        if len(idx) == 0:
+            return
+        self.active[idx] = False
+        self.count -= len(idx)
+        m = self.mass[idx]
+        self.sum_wx -= float(np.dot(m, self.coords[idx, 0]))
+        self.sum_wy -= float(np.dot(m, self.coords[idx, 1]))
+        self.sum_w -= float(m.sum())
+        self._removed += len(idx)
+        if self._hull is not None and not self.active[self._hull].all():
+            self._hull = None
+
+    def sync(self, alive):
+        """Đồng bộ với mặt nạ alive của một GridIndex dùng chung tập node chưa gán."""
+        self.remove(np.flatnonzero(self.active & ~alive))
+
+    def indices(self):
+        return np.flatnonzero(self.active)
+
+    def center(self):
+        """Trọng tâm (Σw·x / Σw, Σw·y / Σw); None khi tổng khối lượng bằng 0."""
+        if self._removed >= REFRESH_EVERY:
+            self.refresh()
+        if self.sum_w == 0:
+            return None
+        return self.sum_wx / self.sum_w, self.sum_wy / self.sum_w
+
+    def distances(self, idx, cx, cy):
+        return point_distances(self.coords[idx], cx, cy)
+
+    def farthest(self, cx, cy):
+        """(chỉ số, khoảng cách) của node còn lại xa (cx, cy) nhất, chỉ xét các đỉnh bao lồi."""
+        if self._hull is None:
+            idx = self.indices()
+            self._hull = idx[convex_hull(self.coords[idx])]
+        d = self.distances(self._hull, cx, cy)
+        k = int(np.argmax(d))
+        return int(self._hull[k]), float(d[k])
@@ -0,0 +1,183 @@
+import math
+import numpy as np
+
+from distance_engine import to_coords, pairwise_block, pair_distances
+from spatial_index import GridIndex, POINTS_PER_CELL, auto_cell_size
+
+# ==================== Cài đặt mặc định ====================
+MODES = ("knn", "radius", "delaunay")
+DEFAULT_K = 8
+
+
+# ==================== Đồ thị thưa dạng CSR ====================
+class CSRGraph:
+    """
+    Danh sách kề dạng CSR: láng giềng của node i là indices[indptr[i]:indptr[i + 1]] (tăng dần),
+    trọng số cạnh tương ứng nằm ở data. Đồ thị vô hướng lưu cả hai chiều của mỗi cạnh.
+    """
+
+    def __init__(self, n, indptr, indices, data, metric="euclidean"):
+        self.n = n
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.metric = metric
+
+    @classmethod
+    def from_edges(cls, n, src, dst, weight, symmetric=True, metric="euclidean"):
+        """Dựng CSR từ các mảng cạnh (src, dst, weight); symmetric thêm chiều ngược, cạnh trùng chỉ giữ một."""
+        if symmetric:
+            src, dst = np.concatenate((src, dst)), np.concatenate((dst, src))
+            weight = np.concatenate((weight, weight))
+        # Sắp theo một khóa ghép src * n + dst (nhanh hơn lexsort hai cột)
+        key = src.astype(np.int64) * n + dst
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        keep = np.ones(len(key), dtype=bool)
+        keep[1:] = key[1:] != key[:-1]
+        src, dst, weight = src[order][keep], dst[order][keep], weight[order][keep]
+
+        index_dtype = np.int32 if n < 2 ** 31 else np.int64
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(n, indptr, dst.astype(index_dtype), weight.astype(np.float64), metric)
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def num_edges(self):
+        """Số mục trong danh sách kề (đồ thị vô hướng: gấp đôi số cạnh)."""
+        return len(self.indices)
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def neighbors(self, i):
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.indices[lo:hi], self.data[lo:hi]
+
+    def edges(self):
+        """Các cạnh (i, j, trọng số) với i < j, theo thứ tự i rồi j tăng dần."""
+        src = np.repeat(np.arange(self.n), self.degree())
+        keep = src < self.indices
+        return src[keep], self.indices[keep].astype(np.int64), self.data[keep]
+
+
+# ==================== k láng giềng gần nhất ====================
+def knn_graph(nodes, k=DEFAULT_K, metric="euclidean", symmetric=True):
+    """
+    Nối mỗi node với k node gần nhất (hòa thì chỉ số nhỏ hơn). Tìm theo từng ô lưới: các node
+    trong một ô được so với khối ô xung quanh, khối được mở rộng cho tới khi láng giềng thứ k
+    gần hơn biên khối - nên kết quả chính xác như quét mọi cặp.
+    """
+    coords = to_coords(nodes)
+    n = len(coords)
+    k = min(k, n - 1)
+    if k <= 0:
+        return CSRGraph.from_edges(n, *_no_edges(), symmetric, metric)
+
+    # Ô lưới chứa khoảng k node: khối 3 x 3 ô thường đã đủ, số ô phải duyệt bằng Python ít hơn
+    cell_size = auto_cell_size(coords) * math.sqrt(max(k, POINTS_PER_CELL) / POINTS_PER_CELL)
+    grid = GridIndex(coords, cell_size=cell_size, metric=metric)
+    cs = grid.cell_size
+    ox, oy = grid._origin_xy
+    src, dst, weight = [], [], []
+    for row, col, members in grid.iter_cells():
+        pending = members
+        ring = 1
+        while len(pending):
+            r0, r1, c0, c1 = row - ring, row + ring, col - ring, col + ring
+            cand = np.sort(grid.cell_block(r0, r1, c0, c1))
+            whole = r0 <= 0 and c0 <= 0 and r1 >= grid.n_rows - 1 and c1 >= grid.n_cols - 1
+            if len(cand) > k or whole:
+                d = pairwise_block(coords[pending], coords[cand], metric)
+                d[pending[:, None] == cand[None, :]] = math.inf
+                nearest = np.argsort(d, axis=1, kind="stable")[:, :k]
+                dk = np.take_along_axis(d, nearest, axis=1)
+                if whole:
+                    done = np.ones(len(pending), dtype=bool)
+                else:
+                    # Node ngoài khối cách node ít nhất bằng khoảng cách tới cạnh khối (cạnh trùng biên lưới thì không có)
+                    px, py = coords[pending, 0], coords[pending, 1]
+                    gaps = [px - (ox + c0 * cs) if c0 > 0 else np.full(len(pending), math.inf),
+                            (ox + (c1 + 1) * cs) - px if c1 < grid.n_cols - 1 else np.full(len(pending), math.inf),
+                            py - (oy + r0 * cs) if r0 > 0 else np.full(len(pending), math.inf),
+                            (oy + (r1 + 1) * cs) - py if r1 < grid.n_rows - 1 else np.full(len(pending), math.inf)]
+                    done = dk[:, -1] < np.minimum.reduce(gaps)
+                src.append(np.repeat(pending[done], k))
+                dst.append(cand[nearest[done]].ravel())
+                weight.append(dk[done].ravel())
+                pending = pending[~done]
+            ring *= 2
+
+    return CSRGraph.from_edges(n, np.concatenate(src), np.concatenate(dst), np.concatenate(weight),
+                               symmetric, metric)
+
+
+# ==================== Đồ thị bán kính ====================
+def radius_graph(nodes, radius, metric="euclidean"):
+    """Nối mọi cặp node có khoảng cách <= radius."""
+    coords = to_coords(nodes)
+    n = len(coords)
+    if n < 2:
+        return CSRGraph.from_edges(n, *_no_edges(), False, metric)
+
+    # Ô lưới không nhỏ hơn radius thì mọi láng giềng nằm trong khối 3 x 3 ô
+    grid = GridIndex(coords, cell_size=max(radius, auto_cell_size(coords)), metric=metric)
+    ring = max(1, math.ceil(radius / grid.cell_size))
+    src, dst, weight = [], [], []
+    for row, col, members in grid.iter_cells():
+        cand = grid.cell_block(row - ring, row + ring, col - ring, col + ring)
+        d = pairwise_block(coords[members], coords[cand], metric)
+        hit = (d <= radius) & (members[:, None] != cand[None, :])
+        mi, ci = np.nonzero(hit)
+        src.append(members[mi])
+        dst.append(cand[ci])
+        weight.append(d[mi, ci])
+
+    # Mỗi node đã tự tìm láng giềng của nó nên cả hai chiều đều có sẵn
+    return CSRGraph.from_edges(n, np.concatenate(src), np.concatenate(dst), np.concatenate(weight),
+                               False, metric)
+
+
+# ==================== Tam giác phân Delaunay ====================
+def delaunay_graph(nodes, metric="euclidean"):
+    """Các cạnh của tam giác phân Delaunay (cần scipy)."""
+    coords = to_coords(nodes)
+    n = len(coords)
+    if n < 3:
+        src, dst = np.triu_indices(n, 1)
+    else:
+        try:
+            from scipy.spatial import Delaunay
+        except ImportError as e:
+            raise ImportError("Chế độ delaunay cần thư viện scipy (pip install scipy)") from e
+        tri = Delaunay(coords).simplices
+        src = np.concatenate((tri[:, 0], tri[:, 1], tri[:, 2]))
+        dst = np.concatenate((tri[:, 1], tri[:, 2], tri[:, 0]))
+    src, dst = src.astype(np.int64), dst.astype(np.int64)
+    weight = pair_distances(coords[src], coords[dst], metric)
+    return CSRGraph.from_edges(n, src, dst, weight, True, metric)
+
+
+def _no_edges():
+    empty = np.empty(0, dtype=np.int64)
+    return empty, empty, np.empty(0)
+
+
+# ==================== Chọn chế độ ====================
+def build_sparse_graph(nodes, mode="knn", k=DEFAULT_K, radius=None, metric="euclidean"):
+    """
+    Đồ thị thưa trên danh sách node (object có x/y, dict hoặc cặp tọa độ), trả về CSRGraph
+    với chỉ số node theo thứ tự trong danh sách.
+    """
+    if mode == "knn":
+        return knn_graph(nodes, k, metric)
+    if mode == "radius":
+        if radius is None:
+            raise ValueError("Chế độ radius cần tham số radius")
+        return radius_graph(nodes, radius, metric)
+    if mode == "delaunay":
+        return delaunay_graph(nodes, metric)
+    raise ValueError(f"Chế độ không hợp lệ: {mode!r} (chỉ hỗ trợ {MODES})")
@@ -0,0 +1,288 @@
+import math
+import heapq
+import numpy as np
+
+from distance_engine import to_coords, point_distances
+
+# ==================== Cài đặt mặc định ====================
+# Số node trung bình mỗi ô lưới khi tự chọn kích thước ô
+POINTS_PER_CELL = 4
+# Khi tỉ lệ node còn sống xuống dưới ngưỡng này thì nén lại lưới
+COMPACT_RATIO = 0.5
+
+
+def auto_cell_size(coords):
+    """Kích thước ô để mỗi ô có trung bình POINTS_PER_CELL node."""
+    n = len(coords)
+    if n == 0:
+        return 1.0
+    extent = coords.max(axis=0) - coords.min(axis=0)
+    area = max(extent[0], 1.0) * max(extent[1], 1.0)
+    return math.sqrt(area * POINTS_PER_CELL / n)
+
+
+# ==================== Lưới đều (uniform grid) ====================
+class GridIndex:
+    """
+    Chỉ mục không gian dạng lưới đều, dựng một lần trên tọa độ node.
+
+    Các node được sắp theo khóa ô (hàng * số cột + cột) nên một hàng ô liên tiếp là một
+    đoạn liền trong mảng; truy vấn bán kính chỉ duyệt các hàng ô giao với hình tròn.
+    Node đã gán được xóa bằng mặt nạ alive, lưới được nén lại khi quá nhiều node đã xóa.
+    """
+
+    def __init__(self, coords, cell_size=None, metric="euclidean"):
+        self.coords = to_coords(coords)
+        self.metric = metric
+        n = len(self.coords)
+        self.alive = np.ones(n, dtype=bool)
+        self.n_alive = n
+
+        if n:
+            self.origin = self.coords.min(axis=0)
+            extent = self.coords.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            extent = np.zeros(2)
+        if cell_size is None:
+            cell_size = auto_cell_size(self.coords)
+        self.cell_size = max(float(cell_size), 1e-9)
+        self._origin_xy = (float(self.origin[0]), float(self.origin[1]))
+        self.n_cols = int(extent[0] // self.cell_size) + 1
+        self.n_rows = int(extent[1] // self.cell_size) + 1
+        self._build(np.arange(n))
+        self._full = (self._order, self._cell_start)
+
+    def reset(self):
+        """Đưa mọi node trở lại chỉ mục (dùng lại lưới đã dựng cho một lần chạy mới)."""
+        self.alive[:] = True
+        self.n_alive = len(self.alive)
+        self._order, self._cell_start = self._full
+
+    def _build(self, members):
+        cells = self._cell_rc(self.coords[members])
+        keys = cells[:, 1] * self.n_cols + cells[:, 0]
+        order = np.argsort(keys, kind="stable")
+        self._order = members[order]
+        self._cell_start = np.searchsorted(keys[order], np.arange(self.n_rows * self.n_cols + 1))
+
+    def _cell_rc(self, pts):
+        rc = np.floor((pts - self.origin) / self.cell_size).astype(np.int64)
+        rc[:, 0] = np.clip(rc[:, 0], 0, self.n_cols - 1)
+        rc[:, 1] = np.clip(rc[:, 1], 0, self.n_rows - 1)
+        return rc
+
+    def __len__(self):
+        return self.n_alive
+
+    def __contains__(self, idx):
+        return bool(self.alive[idx])
+
+    def remove(self, idx):
+        """Xóa một hoặc nhiều node (theo chỉ số) khỏi chỉ mục."""
+        idx = np.atleast_1d(np.asarray(idx, dtype=np.intp))
+        if len(idx) == 0:
+            return
+        idx = idx[self.alive[idx]]
+        self.alive[idx] = False
+        self.n_alive -= len(np.unique(idx))
+        if self.n_alive < COMPACT_RATIO * len(self._order):
+            self._build(np.flatnonzero(self.alive))
+
+    def _cell_range(self, lo, hi, axis, n):
+        a = math.floor((lo - self._origin_xy[axis]) / self.cell_size)
+        b = math.floor((hi - self._origin_xy[axis]) / self.cell_size)
+        return min(max(a, 0), n - 1), min(max(b, 0), n - 1)
+
+    def _candidates(self, x, y, r):
+        # Các hàng ô giao với hình vuông bao quanh hình tròn bán kính r
+        c0, c1 = self._cell_range(x - r, x + r, 0, self.n_cols)
+        r0, r1 = self._cell_range(y - r, y + r, 1, self.n_rows)
+        return self.cell_block(r0, r1, c0, c1)
+
+    def cell_block(self, r0, r1, c0, c1):
+        """Các node còn trong chỉ mục thuộc khối ô hàng r0..r1, cột c0..c1 (tự cắt theo biên lưới)."""
+        r0, r1 = max(r0, 0), min(r1, self.n_rows - 1)
+        c0, c1 = max(c0, 0), min(c1, self.n_cols - 1)
+        parts = []
+        for row in range(r0, r1 + 1):
+            lo = self._cell_start[row * self.n_cols + c0]
+            hi = self._cell_start[row * self.n_cols + c1 + 1]
+            if hi > lo:
+                parts.append(self._order[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        cand = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        if self.n_alive < len(self._order):
+            cand = cand[self.alive[cand]]
+        return cand
+
+    def iter_cells(self):
+        """Sinh (hàng ô, cột ô, các node trong ô) cho mọi ô còn node."""
+        counts = np.diff(self._cell_start)
+        for key in np.flatnonzero(counts).tolist():
+            members = self._order[self._cell_start[key]:self._cell_start[key + 1]]
+            if self.n_alive < len(self._order):
+                members = members[self.alive[members]]
+                if len(members) == 0:
+                    continue
+            row, col = divmod(key, self.n_cols)
+            yield row, col, members
+
+    def query_radius(self, x, y, r, sort=True):
+        """
+        Các node còn trong chỉ mục có khoảng cách tới (x, y) <= r.
+        Trả về (chỉ số, khoảng cách tương ứng); chỉ số tăng dần nếu sort=True.
+        """
+        cand = self._candidates(x, y, r)
+        dist = point_distances(self.coords[cand], x, y, self.metric)
+        keep = dist <= r
+        cand, dist = cand[keep], dist[keep]
+        if not sort:
+            return cand, dist
+        order = np.argsort(cand)
+        return cand[order], dist[order]
+
+    def query_knn(self, x, y, k, max_dist=None):
+        """
+        k node còn trong chỉ mục gần (x, y) nhất, sắp theo khoảng cách tăng dần (hòa thì theo chỉ số).
+        Bán kính tìm được nhân đôi tới khi chứa đủ k node, nên kết quả là chính xác; chỉ k node
+        được chọn ra (partition) mới được sắp xếp. max_dist: chỉ lấy node trong bán kính này
+        (có thể ít hơn k node), vòng tìm dừng khi bán kính chạm max_dist.
+        """
+        k = min(k, self.n_alive)
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        # Bán kính ban đầu chứa khoảng k node nếu mật độ đều như lúc dựng lưới
+        r = self.cell_size * max(1.0, math.sqrt(k / (math.pi * POINTS_PER_CELL)))
+        if max_dist is not None:
+            r = min(r, max_dist)
+        while True:
+            cand, dist = self.query_radius(x, y, r, sort=False)
+            if len(cand) >= k or (max_dist is not None and r >= max_dist):
+                break
+            r = r * 2 if max_dist is None else min(r * 2, max_dist)
+        return _top_k(cand, dist, k)
+
+
+def _top_k(cand, dist, k):
+    # k phần tử nhỏ nhất theo (khoảng cách, chỉ số): partition giữ mọi node hòa ở biên rồi mới sắp
+    if len(cand) > k:
+        keep = dist <= np.partition(dist, k - 1)[k - 1]
+        cand, dist = cand[keep], dist[keep]
+    order = np.lexsort((cand, dist))[:k]
+    return cand[order], dist[order]
+
+
+# ==================== Gán có giới hạn sức chứa ====================
+def assign_balanced(index, centers, capacity, radius):
+    """
+    Gán cùng lúc cho nhiều tâm, mỗi tâm nhận tối đa capacity node trong bán kính radius: mỗi node
+    về tâm gần nhất còn chỗ. Các cặp (khoảng cách, node, tâm) được lấy ra theo khoảng cách tăng dần
+    qua một hàng đợi ưu tiên chứa ứng viên kế tiếp của từng tâm; ứng viên được lấy dần bằng
+    query_knn nên không phải duyệt cả hình tròn. Hòa thì node chỉ số nhỏ, rồi tâm đứng trước.
+    capacity là một số hoặc mảng sức chứa theo từng tâm. Node được gán bị xóa khỏi index.
+    Trả về [(chỉ số, khoảng cách)] cho từng tâm, theo thứ tự nhận.
+    """
+    centers = to_coords(centers)
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=np.int64), len(centers)).tolist()
+    members = [[] for _ in range(len(centers))]
+    dists = [[] for _ in range(len(centers))]
+    streams = [None] * len(centers)
+    heap = []
+
+    def fetch(c):
+        need = capacity[c] - len(members[c])
+        cand, dist = index.query_knn(centers[c, 0], centers[c, 1], need, max_dist=radius)
+        # Nhận ít hơn need node nghĩa là đã lấy hết các node chưa gán trong bán kính
+        streams[c] = [cand.tolist(), dist.tolist(), 0, len(cand) == need]
+
+    def advance(c):
+        # Đưa ứng viên chưa gán kế tiếp của tâm c vào hàng đợi (lấy thêm từ chỉ mục khi hết)
+        while True:
+            cand, dist, pos, more = streams[c]
+            while pos < len(cand) and not index.alive[cand[pos]]:
+                pos += 1
+            if pos < len(cand):
+                streams[c][2] = pos + 1
+                heapq.heappush(heap, (dist[pos], cand[pos], c))
+                return
+            if not more:
+                return
+            fetch(c)
+
+    for c in range(len(centers)):
+        if capacity[c] > 0:
+            fetch(c)
+            advance(c)
+    while heap:
+        d, k, c = heapq.heappop(heap)
+        if index.alive[k]:
+            members[c].append(k)
+            dists[c].append(d)
+            index.remove(k)
+            if len(members[c]) >= capacity[c]:
+                continue
+        advance(c)
+    return [(np.array(m, dtype=np.intp), np.array(d, dtype=np.float64)) for m, d in zip(members, dists)]
+
+
+# ==================== Tìm ứng viên tradeoff ====================
+class NeighborSearch:
+    """
+    Tìm j làm cực đại reach - dist(i, j) > 0 (tradeoff Esau-Williams, reach = dist(i, hub)) mà
+    không quét mọi node. Chỉ j nằm trong hình tròn tâm i bán kính reach mới cho giá trị dương,
+    và j càng gần thì giá trị càng lớn, nên:
+    - xét trước k láng giềng gần nhất dựng sẵn; nếu ứng viên hợp lệ tốt nhất trong đó lớn hơn
+      mọi giá trị có thể của node ngoài danh sách thì đó là kết quả;
+    - nếu không (ràng buộc loại hết láng giềng, hoặc có thể hòa với node ngoài danh sách) thì
+      quét toàn bộ hình tròn bằng lưới, tương đương quét đầy đủ.
+    Kết quả luôn trùng với cách quét đầy đủ; stats đếm số lần dùng mỗi nhánh.
+    """
+
+    def __init__(self, coords, k, metric="euclidean"):
+        self.grid = GridIndex(coords, metric=metric)
+        self.k = k
+        self.idx, self.dist = [], []
+        for i, (x, y) in enumerate(self.grid.coords.tolist()):
+            idx, dist = self.grid.query_knn(x, y, k + 1)
+            keep = idx != i
+            self.idx.append(idx[keep][:k])
+            self.dist.append(dist[keep][:k])
+        self.stats = {"knn": 0, "disc": 0, "ties": 0}
+
+    def best(self, i, reach, feasible, first_of):
+        """
+        (giá trị, chỉ số j) tốt nhất hoặc (None, None).
+        feasible(cand) trả về mặt nạ các ứng viên thỏa ràng buộc (phải tự loại j == i);
+        first_of(ties) chọn một trong các chỉ số hòa nhau, theo thứ tự duyệt của cách quét đầy đủ.
+        """
+        cand, dist = self.idx[i], self.dist[i]
+        exhaustive = len(cand) < self.k
+        val = reach - dist
+        ok = feasible(cand) & (val > 0)
+        if ok.any():
+            top = val[ok].max()
+            # Node ngoài danh sách có khoảng cách >= láng giềng thứ k nên giá trị <= reach - dist[-1]
+            if exhaustive or top > reach - dist[-1]:
+                self.stats["knn"] += 1
+                return self._pick(cand, val, ok, top, first_of)
+        elif exhaustive:
+            self.stats["knn"] += 1
+            return None, None
+
+        self.stats["disc"] += 1
+        x, y = self.grid.coords[i]
+        cand, dist = self.grid.query_radius(x, y, reach, sort=False)
+        val = reach - dist
+        ok = feasible(cand) & (val > 0)
+        if not ok.any():
+            return None, None
+        return self._pick(cand, val, ok, val[ok].max(), first_of)
+
+    def _pick(self, cand, val, ok, top, first_of):
+        ties = cand[ok & (val == top)]
+        if len(ties) > 1:
+            self.stats["ties"] += 1
+            return float(top), int(first_of(ties))
+        return float(top), int(ties[0])
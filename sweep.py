@@ -0,0 +1,144 @@
+import os
+import sys
+import csv
+import time
+import itertools
+from multiprocessing import Pool
+from node_store import NodeTable
+from mentor_planner import MentorPlanner
+
+# ==================== Cấu hình tham số ====================
+OUTPUT_FILE = "sweep_results.csv"
+W_THRESHOLDS = [1, 2, 3]
+RADIUS_RATIOS = [0.2, 0.3, 0.4]
+CS = [10, 14]
+WS = [10, 15, 20]
+MAX_HOPS = [3, 4, 5]
+LIMIT_ACCESS_NODES = 0
+VARIANT = "y4"      # "y3": Esau-Williams thường, "y4": có giới hạn hop
+CANDIDATE_K = 8     # k-NN cho tradeoff (kết quả trùng quét đầy đủ), None: quét mọi active root
+WORKERS = None      # None: dùng mọi nhân CPU
+CHUNKSIZE = 1       # Số điểm MENTOR gửi cho worker mỗi lần
+
+COLUMNS = ["w_threshold", "radius_ratio", "c", "W", "max_hop",
+           "backbones", "access_cost", "hop_violations", "time"]
+
+
+def columns(variant=VARIANT):
+    """Cột của file kết quả: y4 đã ép giới hạn hop khi dựng cây nên không có cột hop_violations."""
+    return COLUMNS if variant == "y3" else [name for name in COLUMNS if name != "hop_violations"]
+
+
+# ==================== Worker ====================
+# Mỗi worker dựng MentorPlanner một lần (chỉ mục không gian, MaxCost) rồi dùng cho mọi điểm lưới
+_planner = None
+
+
+def _init_worker(table):
+    global _planner
+    _planner = MentorPlanner(table)
+
+
+def _hop_depths(parent, hub_id):
+    """Số hop từ mỗi access node về hub, đi theo parent của cây Esau-Williams (không cần dựng đồ thị)."""
+    depth = {hub_id: 0}
+    for nid in parent:
+        path = []
+        while nid not in depth:
+            path.append(nid)
+            nid = parent[nid]
+        d = depth[nid]
+        for p in reversed(path):
+            d += 1
+            depth[p] = d
+    del depth[hub_id]
+    return list(depth.values())
+
+
+def evaluate(mentor_params, ew_params, variant=VARIANT, candidate_k=CANDIDATE_K, limit=LIMIT_ACCESS_NODES):
+    """
+    Một điểm MENTOR (w_threshold, radius_ratio, c) chạy một lần, các nhóm được đưa thẳng
+    (trong bộ nhớ) vào Esau-Williams cho từng cặp (W, max_hop). Trả về danh sách hàng kết quả.
+    Với y3, cây không phụ thuộc max_hop nên mỗi W chỉ dựng một lần rồi đếm số node vượt từng max_hop.
+    """
+    w_threshold, radius_ratio, c = mentor_params
+    start = time.perf_counter()
+    groups = _planner.plan(w_threshold, radius_ratio, c, limit)
+    ew_groups = [g for g in _planner.to_mentor_groups(groups) if g['access_nodes']]
+    mentor_time = time.perf_counter() - start
+
+    rows = []
+    y3_trees = {}  # W -> (tổng chi phí, số hop của mọi access node, thời gian dựng cây)
+    for W, max_hop in ew_params:
+        head = [w_threshold, radius_ratio, c, W, max_hop, len(groups)]
+        if variant == "y3":
+            if W not in y3_trees:
+                from Y3 import build_access_tree
+                start = time.perf_counter()
+                total_cost, depths = 0, []
+                for group in ew_groups:
+                    cost, _, parent, _ = build_access_tree(group['backbone'], group['access_nodes'], W, candidate_k)
+                    total_cost += cost
+                    depths.extend(_hop_depths(parent, group['backbone']['id']))
+                y3_trees[W] = (total_cost, depths, time.perf_counter() - start)
+            total_cost, depths, ew_time = y3_trees[W]
+            violations = sum(1 for h in depths if h > max_hop)
+            rows.append(head + [round(total_cost, 2), violations, round(mentor_time + ew_time, 4)])
+        else:
+            from Y4 import build_access_tree
+            start = time.perf_counter()
+            total_cost = 0
+            for group in ew_groups:
+                cost, _, _, _, _ = build_access_tree(group['backbone'], group['access_nodes'], W, max_hop, candidate_k)
+                total_cost += cost
+            rows.append(head + [round(total_cost, 2), round(mentor_time + time.perf_counter() - start, 4)])
+    return rows
+
+
+def _evaluate_star(args):
+    return evaluate(*args)
+
+
+# ==================== Chạy lưới tham số ====================
+def run_sweep(nodes, w_thresholds=W_THRESHOLDS, radius_ratios=RADIUS_RATIOS, cs=CS, ws=WS, max_hops=MAX_HOPS,
+              output=OUTPUT_FILE, variant=VARIANT, candidate_k=CANDIDATE_K, limit=LIMIT_ACCESS_NODES,
+              workers=WORKERS, chunksize=CHUNKSIZE):
+    """
+    Chạy MENTOR -> Esau-Williams cho mọi điểm của lưới (w_threshold, radius_ratio, c, W, max_hop)
+    trên một process pool. Mỗi task là một điểm MENTOR kèm mọi cặp (W, max_hop) để phân nhóm chỉ
+    chạy một lần; kết quả ghi ngay vào file CSV theo thứ tự hoàn thành. Trả về số hàng đã ghi.
+    """
+    table = nodes if isinstance(nodes, NodeTable) else NodeTable.from_nodes(nodes)
+    ew_params = list(itertools.product(ws, max_hops))
+    tasks = [(p, ew_params, variant, candidate_k, limit)
+             for p in itertools.product(w_thresholds, radius_ratios, cs)]
+    workers = workers or os.cpu_count() or 1
+    print(f"{len(table)} node, {len(tasks)} điểm MENTOR x {len(ew_params)} cặp (W, max_hop), {workers} worker")
+
+    start = time.perf_counter()
+    done = 0
+    header = columns(variant)
+    print(" ".join(f"{name:>14}" for name in header))
+    with open(output, "w", newline="", encoding="utf-8") as f, \
+            Pool(workers, initializer=_init_worker, initargs=(table,)) as pool:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for rows in pool.imap_unordered(_evaluate_star, tasks, chunksize):
+            writer.writerows(rows)
+            f.flush()
+            for row in rows:
+                print(" ".join(f"{v:>14}" for v in row))
+            done += len(rows)
+
+    print(f"Xong {done} cấu hình trong {time.perf_counter() - start:.2f}s, kết quả ghi vào {output}")
+    return done
+
+
+if __name__ == "__main__":
+    # Ví dụ: python sweep.py 500 8 1  (500 node theo Y2.initialize_network với seed 1, 8 worker)
+    import Y2
+    args = sys.argv[1:]
+    if len(args) > 0:
+        Y2.NUM_NODES = int(args[0])
+    nodes = Y2.initialize_network(seed=int(args[2]) if len(args) > 2 else None)
+    run_sweep(nodes, workers=int(args[1]) if len(args) > 1 else WORKERS)